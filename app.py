@@ -1,145 +1,559 @@
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for
-from flask_sqlalchemy import SQLAlchemy
+from flask import Blueprint, Flask, Response, abort, current_app, request, jsonify, render_template, session, stream_with_context
 from flask_cors import CORS
-from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-from datetime import datetime, timezone
+from flask_login import LoginManager, login_user, logout_user, login_required, current_user
+from datetime import datetime, timedelta, timezone
+import io
+import json
 import os
-import bcrypt
-import uuid
+import time
+import zlib
+import click
+import functools
 
-app = Flask(__name__)
-CORS(app)
-app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
+from sqlalchemy.exc import IntegrityError
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from models import db, User, Goal, GoalTombstone, RecurringGoal
+import migrations
+import retention
+import storage
+import hashing
+import revisions
+import stats
+import guests
+import replicas
+import sessions
+import writebehind
+import assets
+import events
+import recurring
+import search
+import transfer
+import ratelimit
+from identity import IdentityCache
+from cache import TTLCache
+
+# Routes and CLI commands; create_app() registers them on an application
+bp = Blueprint('goals', __name__, cli_group=None)
 
-# Initialize Flask-Login
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'goals.login'
+
+# Identity snapshots for the user loader and guest token lookups
+identities = IdentityCache(
+    maxsize=int(os.environ.get('IDENTITY_CACHE_SIZE', 4096)),
+    ttl=float(os.environ.get('IDENTITY_CACHE_TTL', 60)),
+)
+
+# Guest activity, written to user.last_seen in batches for guest expiry
+last_seen = guests.LastSeenTracker(
+    flush_interval=float(os.environ.get('LAST_SEEN_FLUSH_INTERVAL', 60)),
+)
 
-# Database configuration
 basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'instance', 'goals.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-db = SQLAlchemy(app)
+
+def create_app(config=None):
+    """
+    Build the Flask application. Settings come from the environment, then
+    from `config`. Nothing heavy happens at import time: the engine is
+    created here, and matplotlib is only imported by the first progress
+    image request.
+    """
+    app = Flask(__name__)
+    CORS(app)
+    app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
+
+    # Database configuration: the primary takes every write; an optional
+    # replica serves the read-only routes (see replicas.py)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+        'DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'instance', 'goals.db')
+    )
+    app.config['DATABASE_REPLICA_URI'] = os.environ.get('DATABASE_REPLICA_URL') or None
+    app.config['REPLICA_LAG_SECONDS'] = float(
+        os.environ.get('REPLICA_LAG_SECONDS', replicas.DEFAULT_LAG_SECONDS))
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Storage profile: SQLite pragmas applied to every connection, and a pool
+    # sized for the number of request threads per worker process
+    app.config['SQLITE_PRAGMAS'] = storage.STORAGE_PROFILES[
+        os.environ.get('STORAGE_PROFILE', storage.DEFAULT_PROFILE)
+    ]
+    app.config['WORKER_THREADS'] = int(os.environ.get('WORKER_THREADS', 8))
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', app.config['WORKER_THREADS']))
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', app.config['DB_POOL_SIZE']))
+    app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+    app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', -1))
+
+    # Goal retention: {goal_type: days after completion}, e.g. "daily=7,weekly=28"
+    # Tombstones of deleted goals older than this are purged by purge-goals;
+    # clients that synced before that get a full resync
+    app.config['TOMBSTONE_RETENTION_DAYS'] = float(os.environ.get(
+        'TOMBSTONE_RETENTION_DAYS', revisions.DEFAULT_TOMBSTONE_RETENTION_DAYS))
+    app.config['GOAL_RETENTION_DAYS'] = retention.parse_retention_days(
+        os.environ.get('GOAL_RETENTION_DAYS', 'daily=7')
+    )
+
+    # Password hashing: bcrypt cost, and a bounded pool so bursts of logins
+    # cannot take every request thread (BCRYPT_WORKERS=0 hashes inline)
+    app.config['BCRYPT_ROUNDS'] = int(os.environ.get('BCRYPT_ROUNDS', hashing.DEFAULT_ROUNDS))
+    app.config['BCRYPT_WORKERS'] = int(os.environ.get('BCRYPT_WORKERS', 2))
+    app.config['BCRYPT_QUEUE_SIZE'] = int(os.environ.get('BCRYPT_QUEUE_SIZE', 16))
+
+    # Guest expiry: guests unseen for GUEST_TTL_DAYS are deleted by the
+    # reap-guests command, or every GUEST_REAPER_INTERVAL seconds by a
+    # background thread when that is set
+    app.config['GUEST_TTL_DAYS'] = float(os.environ.get('GUEST_TTL_DAYS', guests.DEFAULT_TTL_DAYS))
+    app.config['GUEST_REAPER_INTERVAL'] = float(os.environ.get('GUEST_REAPER_INTERVAL', 0))
+
+    # Write-behind goal updates: acknowledged from memory, written in one
+    # transaction every WRITE_BEHIND_INTERVAL seconds (see writebehind.py)
+    app.config['WRITE_BEHIND'] = os.environ.get('WRITE_BEHIND', '0') == '1'
+    app.config['WRITE_BEHIND_INTERVAL'] = float(os.environ.get('WRITE_BEHIND_INTERVAL', 0.5))
+    app.config['WRITE_BEHIND_MAX_PENDING'] = int(os.environ.get('WRITE_BEHIND_MAX_PENDING', 500))
+
+    # Goal change events for /api/goals/stream: delivered within this process
+    # ('local') or relayed between workers through the database ('table')
+    app.config['EVENT_BROKER'] = os.environ.get('EVENT_BROKER', 'local')
+    app.config['EVENT_QUEUE_SIZE'] = int(os.environ.get('EVENT_QUEUE_SIZE', 100))
+    app.config['EVENT_POLL_INTERVAL'] = float(os.environ.get('EVENT_POLL_INTERVAL', 0.2))
+    app.config['STREAM_KEEPALIVE'] = float(os.environ.get('STREAM_KEEPALIVE', 15))
+    app.config['STREAM_MAX_SECONDS'] = float(os.environ.get('STREAM_MAX_SECONDS', 300))
+
+    # Goals inserted per transaction by /api/goals/import
+    app.config['IMPORT_BATCH_SIZE'] = int(os.environ.get('IMPORT_BATCH_SIZE', transfer.DEFAULT_BATCH_SIZE))
+
+    # Token-bucket limits on guest creation, logins and registrations
+    # ("login=10/minute,..."; "" turns them off), kept per worker ('memory')
+    # or shared through the database ('table'); see ratelimit.py
+    app.config['RATE_LIMITS'] = ratelimit.parse_limits(
+        os.environ.get('RATE_LIMITS', ratelimit.DEFAULT_LIMITS))
+    app.config['RATE_LIMIT_STORE'] = os.environ.get('RATE_LIMIT_STORE', 'memory')
+    # Reverse proxies in front of the app whose X-Forwarded-For is trusted
+    app.config['TRUSTED_PROXIES'] = int(os.environ.get('TRUSTED_PROXIES', 0))
+
+    # Sessions: Flask's signed cookie ('cookie'), or server-side in this
+    # process ('memory') or in the user_session table ('table')
+    app.config['SESSION_STORE'] = os.environ.get('SESSION_STORE', 'cookie')
+
+    # Opt-in request metrics on /metrics, and cProfile dumps for a sample
+    # of requests slower than PROFILE_SLOW_MS (see metrics.py)
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '0') == '1'
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    app.config['PROFILE_SLOW_MS'] = float(os.environ.get('PROFILE_SLOW_MS', 500))
+
+    app.config.update(config or {})
+    pool = {
+        'pool_size': app.config['DB_POOL_SIZE'],
+        'max_overflow': app.config['DB_MAX_OVERFLOW'],
+        'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+        'pool_recycle': app.config['DB_POOL_RECYCLE'],
+    }
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', storage.engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI'], **pool))
+
+    hashing.configure(
+        rounds=app.config['BCRYPT_ROUNDS'],
+        workers=app.config['BCRYPT_WORKERS'],
+        queue_size=app.config['BCRYPT_QUEUE_SIZE'],
+    )
+    login_manager.init_app(app)
+    db.init_app(app)
+    sessions.init_app(app, app.config['SESSION_STORE'])
+    assets.init_app(app)
+    ratelimit.init_app(app)
+    if app.config['TRUSTED_PROXIES']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'])
+    with app.app_context():
+        engines = [db.engine]
+    replica_uri = app.config['DATABASE_REPLICA_URI']
+    if replica_uri:
+        engines.append(replicas.init_app(app, replica_uri, storage.engine_options(replica_uri, **pool)))
+    for engine in engines:
+        storage.apply_pragmas(engine, app.config['SQLITE_PRAGMAS'])
+    events.init_app(app, engines[0])
+    if app.config['METRICS_ENABLED']:
+        from metrics import metrics
+        metrics.init_app(app, *engines, caches={
+            'identity_by_id': identities.by_id,
+            'identity_by_guest_token': identities.by_guest_token,
+            'progress_images': progress_images,
+        })
+    app.register_blueprint(bp)
+    if app.config['WRITE_BEHIND']:
+        app.extensions['write_behind'] = writebehind.WriteBehindQueue(
+            app, app.config['WRITE_BEHIND_INTERVAL'], app.config['WRITE_BEHIND_MAX_PENDING'],
+        ).start()
+    if app.config['GUEST_REAPER_INTERVAL'] > 0:
+        app.extensions['guest_reaper'] = guests.GuestReaper(
+            app, last_seen, app.config['GUEST_REAPER_INTERVAL'],
+            timedelta(days=app.config['GUEST_TTL_DAYS']), on_deleted=forget_guests,
+        ).start()
+    return app
+
+
+def __getattr__(name):
+    # `from app import app` and `flask --app app` build the application on
+    # first use rather than when the module is imported
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def forget_guests(rows):
+    """Drop reaped guests from the identity cache"""
+    for row in rows:
+        identities.invalidate(user_id=row.id, guest_token=row.guest_token)
+
+
+def load_identity_row(user_id):
+    # Plain columns rather than a User instance, so a replica read never
+    # leaves a possibly stale User in the session for a later write
+    with replicas.reading_replica():
+        return db.session.execute(db.select(
+            User.id, User.username, User.display_name, User.timezone,
+            User.is_guest, User.guest_token, User.created_at,
+        ).filter_by(id=user_id)).first()
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(user_id)
-
-# User model
-class User(UserMixin, db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    email = db.Column(db.String(120), unique=True, nullable=True)  # Optional for now
-    password_hash = db.Column(db.String(128), nullable=False)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
-    is_guest = db.Column(db.Boolean, default=False)
-    guest_token = db.Column(db.String(36), unique=True, nullable=True)  # For guest sessions
-    
-    # Profile fields (basic with room for expansion)
-    display_name = db.Column(db.String(100), nullable=True)
-    timezone = db.Column(db.String(50), default='UTC')
-    
-    # Relationships
-    goals = db.relationship('Goal', backref='user', lazy=True, cascade='all, delete-orphan')
-    
-    def set_password(self, password):
-        """Hash and set password"""
-        password_bytes = password.encode('utf-8')
-        self.password_hash = bcrypt.hashpw(password_bytes, bcrypt.gensalt()).decode('utf-8')
-    
-    def check_password(self, password):
-        """Check if provided password matches hash"""
-        password_bytes = password.encode('utf-8')
-        return bcrypt.checkpw(password_bytes, self.password_hash.encode('utf-8'))
-    
-    @classmethod
-    def create_guest(cls):
-        """Create a guest user with a unique token"""
-        guest_token = str(uuid.uuid4())
-        guest_user = cls(
-            username=f'guest_{guest_token[:8]}',
-            password_hash='',  # Guests don't have passwords
-            is_guest=True,
-            guest_token=guest_token
-        )
-        return guest_user
-    
-    def to_dict(self, include_sensitive=False):
-        data = {
-            'id': self.id,
-            'username': self.username,
-            'display_name': self.display_name or self.username,
-            'timezone': self.timezone,
-            'is_guest': self.is_guest,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
-        if include_sensitive and self.is_guest:
-            data['guest_token'] = self.guest_token
-        return data
-
-# Goal model
-class Goal(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    text = db.Column(db.String(500), nullable=False)
-    goal_type = db.Column(db.String(20), nullable=False)  # daily, weekly, monthly, yearly
-    done = db.Column(db.Boolean, default=False)
-    created = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
-    completed = db.Column(db.DateTime, nullable=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'text': self.text,
-            'goal_type': self.goal_type,
-            'done': self.done,
-            'created': self.created.isoformat() if self.created else None,
-            'completed': self.completed.isoformat() if self.completed else None,
-            'user_id': self.user_id
-        }
+    user_id = int(user_id)
+    identity = sessions.cached_identity(user_id)
+    if identity is None:
+        identity = identities.get_user(user_id, load_identity_row)
+        if identity is not None:
+            sessions.cache_identity(identity)
+    return identity
+
+@bp.cli.command('init-db')
+def init_db_command():
+    """Create missing tables and apply pending schema migrations"""
+    applied = migrations.upgrade()
+    print(f"✓ Database ready ({applied} migration(s) applied)")
+
+@bp.cli.command('build-assets')
+@click.option('--docs', type=click.Path(file_okay=False), default=None,
+              help='Also render the GitHub Pages site into this directory')
+def build_assets_command(docs):
+    """Minify, fingerprint and precompress the static assets"""
+    manifest = assets.build(current_app.static_folder)
+    current_app.extensions['asset_manifest'] = manifest
+    print(f"✓ {len(manifest)} asset(s) built into static/{assets.DIST}")
+    if docs:
+        assets.publish_docs(current_app._get_current_object(), docs)
+        print(f"✓ Pages written to {docs}")
+
+@bp.cli.command('purge-sessions')
+def purge_sessions_command():
+    """Delete expired server-side sessions"""
+    store = current_app.extensions.get('session_store')
+    if store is None:
+        print("✓ Nothing to purge (SESSION_STORE=cookie)")
+        return
+    print(f"✓ {store.purge_expired()} expired session(s) deleted")
+
+@bp.cli.command('purge-rate-limits')
+def purge_rate_limits_command():
+    """Delete refilled rate limit buckets"""
+    store = current_app.extensions['rate_limit_store']
+    if not isinstance(store, ratelimit.TableStore):
+        print("✓ Nothing to purge (RATE_LIMIT_STORE=memory)")
+        return
+    print(f"✓ {store.purge_expired()} refilled bucket(s) deleted")
+
+@bp.cli.command('purge-goals')
+@click.option('--chunk-size', default=retention.DEFAULT_CHUNK_SIZE, show_default=True,
+              help='Rows deleted per transaction')
+@click.option('--pause', default=0.05, show_default=True,
+              help='Seconds to sleep between chunks so writers can get the lock')
+def purge_goals_command(chunk_size, pause):
+    """Delete expired completed goals, then expired tombstones, for all users"""
+    policies = retention.policies_from_config(current_app.config)
+    deleted = retention.purge_expired_goals(policies, chunk_size=chunk_size, pause=pause)
+    for goal_type, count in deleted.items():
+        print(f"✓ {goal_type}: {count} goal(s) deleted")
+    days = current_app.config['TOMBSTONE_RETENTION_DAYS']
+    count = revisions.purge_tombstones(timedelta(days=days), chunk_size=chunk_size, pause=pause)
+    print(f"✓ {count} tombstone(s) older than {days:g} days deleted")
+
+@bp.cli.command('rebuild-stats')
+@click.option('--user-id', type=int, multiple=True,
+              help='Only rebuild these users (default: everyone)')
+def rebuild_stats_command(user_id):
+    """Recompute goal statistics from the goal table"""
+    stats.rebuild(user_ids=list(user_id) or None)
+    db.session.commit()
+    print("✓ Goal statistics rebuilt")
+
+@bp.cli.command('rebuild-search')
+def rebuild_search_command():
+    """Recreate the goal search index from the goal table"""
+    with db.engine.begin() as conn:
+        search.rebuild(conn)
+    print("✓ Goal search index rebuilt")
+
+def transfer_user_id(username, all_users):
+    """User id for --user, or None for --all-users"""
+    if all_users == (username is not None):
+        raise click.UsageError('Pass either --user or --all-users')
+    if all_users:
+        return None
+    user_id = db.session.execute(
+        db.select(User.id).filter_by(username=username)).scalar_one_or_none()
+    if user_id is None:
+        raise click.BadParameter(f'No user {username!r}', param_hint='--user')
+    return user_id
+
+@bp.cli.command('export-goals')
+@click.option('--user', 'username', default=None, help='Export this user\'s goals')
+@click.option('--all-users', is_flag=True, help='Export every user\'s goals, with usernames')
+@click.option('--format', 'fmt', type=click.Choice(transfer.FORMATS), default='ndjson', show_default=True)
+@click.option('--output', type=click.Path(dir_okay=False, allow_dash=True), default='-',
+              help='File to write [default: stdout]')
+def export_goals_command(username, all_users, fmt, output):
+    """Stream goals to NDJSON or CSV, for backups and moving instances"""
+    user_id = transfer_user_id(username, all_users)
+    with click.open_file(output, 'wb') as f:
+        for line in transfer.export_lines(fmt, user_id):
+            f.write(line.encode('utf-8'))
+    if output != '-':
+        print(f"✓ Goals exported to {output}")
+
+@bp.cli.command('import-goals')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--user', 'username', default=None, help='Add every goal to this user')
+@click.option('--all-users', is_flag=True, help='Add each goal to the user named in its username field')
+@click.option('--format', 'fmt', type=click.Choice(transfer.FORMATS), default=None,
+              help='File format [default: from the extension, else ndjson]')
+@click.option('--batch-size', default=transfer.DEFAULT_BATCH_SIZE, show_default=True,
+              help='Goals inserted per transaction')
+@click.option('--dry-run', is_flag=True, help='Validate the file without writing anything')
+def import_goals_command(path, username, all_users, fmt, batch_size, dry_run):
+    """Import goals from an NDJSON or CSV export"""
+    user_id = transfer_user_id(username, all_users)
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    with click.open_file(path, 'rb') as f:
+        lines = io.TextIOWrapper(f, encoding='utf-8', errors='replace', newline='')
+        result = transfer.import_goals(transfer.parse(lines, fmt), user_id,
+                                       batch_size=max(batch_size, 1), dry_run=dry_run)
+    for user in result.user_ids:
+        publish(user, events.RESYNC)
+    for error in result.errors:
+        print(f"  line {error['line']}: {error['error']}")
+    verb = 'would be imported' if dry_run else 'imported'
+    print(f"✓ {result.imported} goal(s) {verb}, {result.rejected} rejected")
+
+@bp.cli.command('reap-guests')
+@click.option('--ttl-days', type=float, default=None,
+              help='Delete guests unseen for this many days [default: GUEST_TTL_DAYS]')
+@click.option('--chunk-size', default=guests.DEFAULT_CHUNK_SIZE, show_default=True,
+              help='Guests deleted per transaction')
+@click.option('--pause', default=0.05, show_default=True,
+              help='Seconds to sleep between chunks so writers can get the lock')
+def reap_guests_command(ttl_days, chunk_size, pause):
+    """Delete inactive guest users and their goals"""
+    ttl_days = current_app.config['GUEST_TTL_DAYS'] if ttl_days is None else ttl_days
+    last_seen.flush(db.engine)
+    deleted = guests.reap_guests(timedelta(days=ttl_days), chunk_size, pause,
+                                 exclude=last_seen.pending(), on_deleted=forget_guests)
+    print(f"✓ {deleted} inactive guest(s) deleted")
+
+@bp.app_errorhandler(hashing.HasherBusy)
+def hasher_busy(error):
+    response = jsonify({'error': 'Server busy, please retry'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+@bp.app_errorhandler(ratelimit.RateLimited)
+def rate_limited(error):
+    response = jsonify({'error': 'Too many requests, please retry later'})
+    response.status_code = 429
+    response.headers['Retry-After'] = ratelimit.retry_after(error)
+    return response
+
+# Rendered progress images by (local date, period, format, size); a day's
+# image never changes, so entries only age out of the LRU
+progress_images = TTLCache(
+    maxsize=int(os.environ.get('PROGRESS_CACHE_SIZE', 256)),
+    ttl=2 * 24 * 3600,
+)
+
+# /api/progress.<format>?size=: figure size in inches and resolution
+PROGRESS_SIZES = {
+    'small': ((5, 1), 100),
+    'medium': ((10, 2), 100),
+    'large': ((10, 2), 200),
+}
+
+# Largest batch accepted by /api/goals/batch
+MAX_BATCH_OPERATIONS = int(os.environ.get('MAX_BATCH_OPERATIONS', 500))
+
+# Goal listing: columns clients may select with ?fields=, and the largest page
+GOAL_FIELDS = ('id', 'text', 'goal_type', 'done', 'created', 'completed', 'user_id')
+MAX_PAGE_SIZE = 500
+DEFAULT_SEARCH_LIMIT = 20
 
 # Helper functions
+def find_guest(guest_token):
+    return User.query.filter_by(guest_token=guest_token, is_guest=True).first()
+
 def get_current_user_id():
-    """Get current user ID, handling both logged-in and guest users"""
+    """
+    Get current user ID, handling both logged-in and guest users.
+
+    None for visitors without a user row, including guests that only exist
+    in the session so far; answering that needs no database access.
+    """
     if current_user.is_authenticated:
         return current_user.id
     
     # Handle guest users via session
     guest_token = session.get('guest_token')
-    if guest_token:
-        guest_user = User.query.filter_by(guest_token=guest_token, is_guest=True).first()
-        if guest_user:
-            return guest_user.id
+    if guest_token and not session.get('guest_pending'):
+        guest = identities.get_guest(guest_token, find_guest)
+        if guest:
+            last_seen.touch(guest.id, db.engine)
+            return guest.id
     
     return None
 
+def start_guest_session():
+    """
+    Give an anonymous visitor a guest identity held only in the signed
+    session. The guest row is inserted by ensure_user on the first write,
+    so read-only visitors never touch the database.
+    """
+    if not current_user.is_authenticated and 'guest_token' not in session:
+        session['guest_token'] = User.new_guest_token()
+        session['guest_pending'] = True
+
 def ensure_user():
-    """Ensure we have a user (create guest if needed)"""
+    """Ensure we have a user (persisting the session's guest if needed)"""
     user_id = get_current_user_id()
     if user_id:
         return user_id
     
-    # Create guest user
-    guest_user = User.create_guest()
+    # Create guest user, keeping the token of a session-only guest
+    ratelimit.check('guest', ratelimit.client_ip())
+    pending_token = session.get('guest_token') if session.get('guest_pending') else None
+    guest_user = User.create_guest(pending_token)
     db.session.add(guest_user)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request from the same session persisted it first
+        db.session.rollback()
+        guest_user = find_guest(pending_token) if pending_token else None
+        if guest_user is None:
+            raise
+    guest = identities.remember(guest_user)
+    session['guest_token'] = guest.guest_token
+    session.pop('guest_pending', None)
+    return guest.id
+
+def retry_reaped_guest(view):
+    """
+    Run a write view once more when its guest was reaped under it.
+
+    The identity cache is per process, so a guest that the reaper of
+    another process deleted can still be returned for up to
+    IDENTITY_CACHE_TTL; its first revisions.bump() raises UserGone. The
+    entry is dropped and the view runs again, which finds no guest row and
+    lets ensure_user() create a new one.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            return view(*args, **kwargs)
+        except revisions.UserGone as error:
+            db.session.rollback()
+            if current_user.is_authenticated:
+                raise
+            identities.invalidate(user_id=error.user_id)
+            return view(*args, **kwargs)
+    return wrapper
+
+def settle_writes(user_id):
+    """Write user_id's queued goal updates, so this request sees them in the database"""
+    queue = current_app.extensions.get('write_behind')
+    if queue is not None:
+        queue.settle(user_id)
+
+def roll_recurring(user_id):
+    """Start the new period of the user's recurring goals once recurring.due() says so"""
+    settle_writes(user_id)
+    with replicas.reading_primary():
+        reset = recurring.roll_over(user_id, current_zone())
     db.session.commit()
-    session['guest_token'] = guest_user.guest_token
-    return guest_user.id
+    for goal in reset:
+        publish(user_id, {'type': 'updated', 'revision': goal.revision, 'goal': goal.to_dict()})
+
+def publish(user_id, event):
+    """Send a goal change event to the user's open streams; call after committing"""
+    current_app.extensions['event_broker'].publish(user_id, event)
+
+def with_pending(goal, pending_goals):
+    """Overlay a queued update on a serialized goal, keeping only its fields"""
+    queued = pending_goals.get(goal['id'])
+    if queued:
+        goal.update((name, queued[name]) for name in list(goal) if name in queued)
+    return goal
+
+def empty_goal_listing():
+    """/api/goals response for a visitor with no goals, in the requested shape"""
+    if request.args.get('format') == 'ndjson':
+        return Response('', mimetype='application/x-ndjson')
+    if request.args.get('limit') is not None:
+        return jsonify({'goals': [], 'next_cursor': None})
+    return jsonify([])
+
+def current_zone():
+    """Timezone of the current user, for bucketing completions by local day"""
+    if current_user.is_authenticated:
+        return stats.user_zone(current_user.timezone)
+    guest_token = session.get('guest_token')
+    if session.get('guest_pending'):
+        guest_token = None  # not in the database yet; guests start in UTC
+    guest = identities.get_guest(guest_token, find_guest) if guest_token else None
+    return stats.user_zone(guest.timezone if guest else None)
+
+def goal_changes(data):
+    """Column values for an update payload such as {'text': ..., 'done': ...}"""
+    changes = {}
+    if 'text' in data:
+        changes['text'] = data['text']
+    if 'done' in data:
+        changes['done'] = data['done']
+        changes['completed'] = datetime.now(timezone.utc) if data['done'] else None
+    return changes
+
+def conditional_response(response, etag):
+    """Tag a goal listing so clients can revalidate it with If-None-Match"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def goal_row_to_dict(row):
+    """Serialize a selected goal row the same way Goal.to_dict does"""
+    return {name: value.isoformat() if isinstance(value, datetime) else value
+            for name, value in row._mapping.items()}
 
 # Routes
-@app.route('/')
+@bp.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/calendar')
+@bp.route('/calendar')
 def calendar():
     return render_template('calendar.html')
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
+        ratelimit.check('register', ratelimit.client_ip())
         data = request.get_json()
         username = data.get('username', '').strip()
         password = data.get('password', '')
@@ -158,38 +572,56 @@ def register():
         # Create user
         user = User(username=username, email=email)
         user.set_password(password)
-        
-        # Migrate guest goals if any
+        db.session.add(user)
+        db.session.flush()  # Assign user.id before goals are moved onto it
+
+        # Migrate guest goals if any; a session-only guest has none
         guest_token = session.get('guest_token')
+        if session.pop('guest_pending', None):
+            session.pop('guest_token', None)
+            guest_token = None
         if guest_token:
-            guest_user = User.query.filter_by(guest_token=guest_token, is_guest=True).first()
+            guest_user = find_guest(guest_token)
             if guest_user:
+                settle_writes(guest_user.id)
                 # Transfer goals to new user
-                Goal.query.filter_by(user_id=guest_user.id).update({'user_id': user.id})
+                revision = revisions.bump(user.id)
+                Goal.query.filter_by(user_id=guest_user.id).update(
+                    {'user_id': user.id, 'revision': revision})
+                stats.move(guest_user.id, user.id)
+                recurring.move(guest_user.id, user.id)
                 db.session.delete(guest_user)
                 session.pop('guest_token', None)
         
-        db.session.add(user)
         db.session.commit()
+        if guest_token:
+            identities.invalidate(guest_token=guest_token)
         
         login_user(user)
         return jsonify(user.to_dict()), 201
     
     return render_template('auth.html', mode='register')
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
+        ratelimit.check('login', ratelimit.client_ip())
         data = request.get_json()
         username = data.get('username', '').strip()
         password = data.get('password', '')
         
         if not username or not password:
             return jsonify({'error': 'Username and password required'}), 400
+        ratelimit.check('login_username', username.lower())
         
         user = User.query.filter_by(username=username, is_guest=False).first()
         if user and user.check_password(password):
+            if user.password_needs_rehash():
+                # Upgrade to the configured cost while we have the plaintext
+                user.set_password(password)
+                db.session.commit()
             login_user(user)
+            identities.remember(user)
             
             # Clear any guest session
             session.pop('guest_token', None)
@@ -200,39 +632,298 @@ def login():
     
     return render_template('auth.html', mode='login')
 
-@app.route('/logout', methods=['POST'])
+@bp.route('/logout', methods=['POST'])
 def logout():
+    if current_user.is_authenticated:
+        identities.invalidate(user_id=current_user.id)
     logout_user()
-    session.pop('guest_token', None)
+    session.pop('_identity', None)
+    guest_token = session.pop('guest_token', None)
+    if session.pop('guest_pending', None):
+        guest_token = None
+    if guest_token:
+        identities.invalidate(guest_token=guest_token)
     return '', 204
 
-@app.route('/api/user/current')
+@bp.route('/api/user/current')
+@replicas.replica_reads
 def get_current_user():
     """Get current user info (logged in or guest)"""
     if current_user.is_authenticated:
         return jsonify(current_user.to_dict())
     
     guest_token = session.get('guest_token')
+    if guest_token and session.get('guest_pending'):
+        guest = User.create_guest(guest_token)
+        guest.timezone = 'UTC'
+        return jsonify(guest.to_dict(include_sensitive=True))
     if guest_token:
-        guest_user = User.query.filter_by(guest_token=guest_token, is_guest=True).first()
-        if guest_user:
-            return jsonify(guest_user.to_dict(include_sensitive=True))
+        guest = identities.get_guest(guest_token, find_guest)
+        if guest:
+            return jsonify(guest.to_dict(include_sensitive=True))
     
     return jsonify({'is_anonymous': True})
 
-@app.route('/api/goals', methods=['GET'])
+@bp.route('/api/goals', methods=['GET'])
+@replicas.replica_reads
 def get_goals():
-    user_id = ensure_user()
+    """
+    List the current user's goals, oldest first.
+
+    Optional query parameters:
+      type    only goals of this goal_type
+      fields  comma-separated columns to return (id is always included)
+      limit   page size; the response becomes {"goals": [...], "next_cursor": ...}
+      cursor  next_cursor of the previous page
+      format  "ndjson" streams one goal per line as rows come off the cursor
+    """
+    user_id = get_current_user_id()
+    if user_id is None:
+        start_guest_session()
+        return empty_goal_listing()
     goal_type = request.args.get('type')
+    revision, next_rollover = db.session.execute(
+        db.select(User.goal_revision, User.next_rollover).filter_by(id=user_id)
+    ).one_or_none() or (0, None)
+    if recurring.is_due(next_rollover):
+        roll_recurring(user_id)
+        revision = revisions.current(user_id)
+    queue = current_app.extensions.get('write_behind')
+    sequence, pending_goals = (queue and queue.pending(user_id)) or (None, {})
+    
+    # The revision changes with every goal mutation, so together with the
+    # query string it identifies the response body; queued updates that
+    # are not written yet add their own sequence number
+    etag = f'{user_id}-{revision}-{zlib.crc32(request.query_string):08x}'
+    if sequence is not None:
+        etag += f'-q{sequence}'
+    if etag in request.if_none_match:
+        return conditional_response(Response(status=304), etag)
     
-    query = Goal.query.filter_by(user_id=user_id)
+    fields = GOAL_FIELDS
+    if request.args.get('fields'):
+        requested = [name.strip() for name in request.args['fields'].split(',')]
+        unknown = set(requested) - set(GOAL_FIELDS)
+        if unknown:
+            return jsonify({'error': f"Unknown fields: {', '.join(sorted(unknown))}"}), 400
+        fields = ['id'] + [name for name in requested if name != 'id']
+    
+    # Keyset pagination on id: ids only grow, so "id > cursor" resumes exactly
+    # where the previous page stopped without an OFFSET scan
+    query = db.select(*(getattr(Goal, name) for name in fields)).filter_by(user_id=user_id)
     if goal_type:
         query = query.filter_by(goal_type=goal_type)
+    cursor = request.args.get('cursor', type=int)
+    if cursor is not None:
+        query = query.where(Goal.id > cursor)
+    query = query.order_by(Goal.id)
+    limit = request.args.get('limit', type=int)
+    
+    if request.args.get('format') == 'ndjson':
+        if limit is not None:
+            query = query.limit(max(limit, 0))
+        
+        def generate():
+            rows = db.session.execute(query.execution_options(yield_per=MAX_PAGE_SIZE))
+            for row in rows:
+                yield json.dumps(with_pending(goal_row_to_dict(row), pending_goals)) + '\n'
+        
+        response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        return conditional_response(response, etag)
+    
+    if limit is None:
+        response = jsonify([with_pending(goal_row_to_dict(row), pending_goals)
+                            for row in db.session.execute(query)])
+        return conditional_response(response, etag)
+    
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    response = jsonify({
+        'goals': [with_pending(goal_row_to_dict(row), pending_goals) for row in rows[:limit]],
+        'next_cursor': next_cursor,
+    })
+    return conditional_response(response, etag)
+
+@bp.route('/api/goals/changes', methods=['GET'])
+def get_goal_changes():
+    """
+    Goals changed since a revision, for incremental sync.
+
+    Returns {"revision": <current>, "goals": [...], "deleted": [ids]}; pass
+    "revision" back as ?since= on the next call. since=0 returns every goal,
+    including goals that predate revision tracking. When since is older
+    than the retained tombstones, the response is every goal plus
+    "resync": true, and the client replaces its copy instead of merging.
+    """
+    user_id = get_current_user_id()
+    since = request.args.get('since', type=int)
+    if since is None or since < 0:
+        return jsonify({'error': 'since must be a revision number'}), 400
+    if user_id is None:
+        start_guest_session()
+        if since > 0:
+            return jsonify({'error': 'since is ahead of the current revision'}), 400
+        return jsonify({'revision': 0, 'goals': [], 'deleted': []})
+    
+    settle_writes(user_id)
+    if recurring.due(user_id):
+        roll_recurring(user_id)
+    changes = changes_since(user_id, since)
+    if changes is None:
+        return jsonify({'error': 'since is ahead of the current revision'}), 400
+    return jsonify(changes)
+
+def changes_since(user_id, since):
+    """The /api/goals/changes payload, or None if since is ahead of the user's revision"""
+    revision, floor = revisions.state(user_id)
+    if since > revision:
+        return None
+    
+    # Tombstones up to the floor are purged, so a delta from before it
+    # could miss deletions; a full listing (since=0) needs none
+    resync = 0 < since < floor
+    full = since == 0 or resync
+    changed = db.select(*(getattr(Goal, name) for name in GOAL_FIELDS)).filter_by(user_id=user_id)
+    if not full:
+        changed = changed.where(Goal.revision > since)
+    changed = changed.order_by(Goal.id)
+    changes = {
+        'revision': revision,
+        'goals': [goal_row_to_dict(row) for row in db.session.execute(changed)],
+        'deleted': [],
+    }
+    if not full:
+        changes['deleted'] = list(db.session.scalars(
+            db.select(GoalTombstone.goal_id).filter_by(user_id=user_id)
+            .where(GoalTombstone.revision > since).order_by(GoalTombstone.goal_id)))
+    if resync:
+        changes['resync'] = True
+    return changes
+
+@bp.route('/api/goals/search', methods=['GET'])
+def search_goals():
+    """
+    The current user's goals matching every word of ?q= as a prefix, best first.
+
+    Returns {"goals": [...]}, at most ?limit= goals (default 20).
+    """
+    words = search.terms(request.args.get('q'))
+    if not words:
+        return jsonify({'error': 'q must contain at least one word'}), 400
+    user_id = get_current_user_id()
+    if user_id is None:
+        start_guest_session()
+        return jsonify({'goals': []})
+    
+    limit = max(1, min(request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int), MAX_PAGE_SIZE))
+    settle_writes(user_id)
+    columns = [getattr(Goal, name) for name in GOAL_FIELDS]
+    rows = db.session.execute(search.search_query(user_id, words, columns, limit))
+    return jsonify({'goals': [goal_row_to_dict(row) for row in rows]})
+
+@bp.route('/api/goals/export')
+def export_goals():
+    """
+    Download the current user's goals as ?format=ndjson (default) or csv.
+
+    The export is streamed from a server-side cursor, so it takes the same
+    memory for ten goals as for a million.
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in transfer.FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(transfer.FORMATS)}"}), 400
+    user_id = get_current_user_id()
+    if user_id is None:
+        start_guest_session()
+        lines = transfer.to_csv([], transfer.FIELDS) if fmt == 'csv' else []
+    else:
+        settle_writes(user_id)
+        lines = stream_with_context(transfer.export_lines(fmt, user_id))
+    response = Response(lines, mimetype=transfer.MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=goals.{fmt}'
+    return response
+
+@bp.route('/api/goals/import', methods=['POST'])
+@retry_reaped_guest
+def import_goals():
+    """
+    Add the goals of an export in the request body to the current user.
+
+    The body is NDJSON, or CSV with ?format=csv or Content-Type: text/csv.
+    It is parsed as it arrives and inserted in batches of IMPORT_BATCH_SIZE
+    goals, one transaction each. Invalid lines are skipped and reported:
+    {"imported": n, "rejected": n, "dry_run": false, "errors": [{"line": n, "error": ...}]}.
+    With ?dry_run=1 the body is only validated.
+    """
+    fmt = request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else 'ndjson')
+    if fmt not in transfer.FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(transfer.FORMATS)}"}), 400
+    dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    user_id = ensure_user()
+    settle_writes(user_id)
+    if not current_user.is_authenticated and db.session.get(User, user_id) is None:
+        # Retried before any of the body is read (see retry_reaped_guest)
+        raise revisions.UserGone(user_id)
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8', errors='replace', newline='')
+    result = transfer.import_goals(transfer.parse(lines, fmt), user_id,
+                                   batch_size=current_app.config['IMPORT_BATCH_SIZE'],
+                                   dry_run=dry_run)
+    if result.user_ids:
+        publish(user_id, events.RESYNC)
+    return jsonify(result.to_dict())
+
+@bp.route('/api/goals/stream')
+def goal_stream():
+    """
+    Server-Sent Events with the current user's goal changes, from every device.
+
+    Events are "created" and "updated" (data has the goal), "deleted" (data
+    has its id) and "resync" (events were missed: fetch /api/goals/changes).
+    Event ids are goal revisions; a reconnecting EventSource sends the last
+    one as Last-Event-ID and first gets a "changes" event with everything
+    since, shaped like /api/goals/changes. Visitors without a user row get
+    204, which tells EventSource not to reconnect; open the stream again
+    after the first write. Streams end after STREAM_MAX_SECONDS, and the
+    client reconnects.
+    """
+    user_id = get_current_user_id()
+    if user_id is None:
+        return '', 204
     
-    goals = query.all()
-    return jsonify([goal.to_dict() for goal in goals])
+    backlog = None
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is not None and last_id >= 0:
+        settle_writes(user_id)
+        backlog = changes_since(user_id, last_id) or changes_since(user_id, 0)
+    db.session.remove()  # the stream holds no connection while it waits
+    
+    broker = current_app.extensions['event_broker']
+    subscription = broker.subscribe(user_id)
+    keepalive = current_app.config['STREAM_KEEPALIVE']
+    deadline = time.monotonic() + current_app.config['STREAM_MAX_SECONDS']
+    
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            if backlog is not None:
+                yield events.format_event(dict(backlog, type='changes'), backlog['revision'])
+            while time.monotonic() < deadline:
+                event = subscription.get(timeout=min(keepalive, max(deadline - time.monotonic(), 0)))
+                if event is None:
+                    yield ': keepalive\n\n'
+                else:
+                    yield events.format_event(event, event.get('revision'))
+        finally:
+            subscription.close()
+    
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx: pass events through unbuffered
+    return response
 
-@app.route('/api/goals', methods=['POST'])
+@bp.route('/api/goals', methods=['POST'])
+@retry_reaped_guest
 def create_goal():
     user_id = ensure_user()
     data = request.get_json()
@@ -243,64 +934,293 @@ def create_goal():
     goal = Goal(
         text=data['text'],
         goal_type=data['goal_type'],
-        user_id=user_id
+        user_id=user_id,
+        revision=revisions.bump(user_id)
     )
     
     db.session.add(goal)
+    delta = stats.StatsDelta(user_id, current_zone())
+    delta.created(goal.goal_type)
+    delta.apply()
     db.session.commit()
     
-    return jsonify(goal.to_dict()), 201
+    goal_dict = goal.to_dict()
+    publish(user_id, {'type': 'created', 'revision': goal.revision, 'goal': goal_dict})
+    return jsonify(goal_dict), 201
 
-@app.route('/api/goals/<int:goal_id>', methods=['PUT'])
-def update_goal(goal_id):
+@bp.route('/api/goals/recurring', methods=['GET'])
+def get_recurring_goals():
+    """The current user's recurring goals, each with its instance goal and completed periods"""
+    user_id = get_current_user_id()
+    if user_id is None:
+        start_guest_session()
+        return jsonify([])
+    settle_writes(user_id)
+    if recurring.due(user_id):
+        roll_recurring(user_id)
+    rows = db.session.execute(
+        db.select(RecurringGoal, Goal).join(Goal, Goal.id == RecurringGoal.goal_id)
+        .filter(RecurringGoal.user_id == user_id).order_by(RecurringGoal.id)
+    )
+    return jsonify([recurring.to_dict(template, goal) for template, goal in rows])
+
+@bp.route('/api/goals/recurring', methods=['POST'])
+@retry_reaped_guest
+def create_recurring_goal():
+    """
+    Add a goal that comes back every period: {"text": ..., "period": "daily"}.
+
+    Its instance is an ordinary goal (goal_type is the period) that is
+    reset at the start of every period; deleting it ends the recurrence.
+    """
     user_id = ensure_user()
-    goal = Goal.query.filter_by(id=goal_id, user_id=user_id).first_or_404()
     data = request.get_json()
     
-    if 'text' in data:
-        goal.text = data['text']
-    if 'done' in data:
-        goal.done = data['done']
-        goal.completed = datetime.now(timezone.utc) if data['done'] else None
+    if not data or 'text' not in data or 'period' not in data:
+        return jsonify({'error': 'Missing required fields'}), 400
+    if data['period'] not in recurring.PERIODS:
+        return jsonify({'error': f"period must be one of {', '.join(recurring.PERIODS)}"}), 400
     
+    template, goal = recurring.create(user_id, data['text'], data['period'],
+                                      current_zone(), revisions.bump(user_id))
+    delta = stats.StatsDelta(user_id, current_zone())
+    delta.created(goal.goal_type)
+    delta.apply()
     db.session.commit()
-    return jsonify(goal.to_dict())
+    
+    publish(user_id, {'type': 'created', 'revision': goal.revision, 'goal': goal.to_dict()})
+    return jsonify(recurring.to_dict(template, goal)), 201
 
-@app.route('/api/goals/<int:goal_id>', methods=['DELETE'])
+@bp.route('/api/goals/<int:goal_id>', methods=['PUT'])
+@retry_reaped_guest
+def update_goal(goal_id):
+    user_id = get_current_user_id() or abort(404)
+    data = request.get_json()
+    
+    queue = current_app.extensions.get('write_behind')
+    if queue is not None:
+        def load():
+            goal = Goal.query.filter_by(id=goal_id, user_id=user_id).first()
+            return goal.to_dict() if goal else None
+        goal = queue.update(user_id, goal_id, goal_changes(data), current_zone(), load)
+        if goal is None:
+            abort(404)
+        # The revision is assigned when the queue is written
+        publish(user_id, {'type': 'updated', 'goal': goal})
+        return jsonify(goal)
+    
+    goal = Goal.query.filter_by(id=goal_id, user_id=user_id).first_or_404()
+    changes = goal_changes(data)
+    if 'done' in changes:
+        delta = stats.StatsDelta(user_id, current_zone())
+        delta.changed(goal.goal_type, goal.done, goal.completed,
+                      changes['done'], changes['completed'])
+        delta.apply()
+    for name, value in changes.items():
+        setattr(goal, name, value)
+    goal.revision = revisions.bump(user_id)
+    
+    db.session.commit()
+    goal_dict = goal.to_dict()
+    publish(user_id, {'type': 'updated', 'revision': goal.revision, 'goal': goal_dict})
+    return jsonify(goal_dict)
+
+@bp.route('/api/goals/<int:goal_id>', methods=['DELETE'])
+@retry_reaped_guest
 def delete_goal(goal_id):
-    user_id = ensure_user()
+    user_id = get_current_user_id() or abort(404)
+    settle_writes(user_id)
     goal = Goal.query.filter_by(id=goal_id, user_id=user_id).first_or_404()
+    revision = revisions.bump(user_id)
+    revisions.record_deletes([goal.id])
+    delta = stats.StatsDelta(user_id, current_zone())
+    delta.deleted(goal.goal_type, goal.done, goal.completed)
+    delta.apply()
+    recurring.forget(user_id, [goal.id])
     db.session.delete(goal)
     db.session.commit()
+    publish(user_id, {'type': 'deleted', 'revision': revision, 'id': goal_id})
     return '', 204
 
-@app.route('/api/goals/cleanup', methods=['POST'])
-def cleanup_old_goals():
-    """Clean up old completed daily goals (older than 7 days)"""
+@bp.route('/api/goals/batch', methods=['POST'])
+@retry_reaped_guest
+def batch_goals():
+    """
+    Apply many create/update/delete operations in one transaction.
+
+    Body: {"operations": [{"op": "create", "text": ..., "goal_type": ...},
+                          {"op": "update", "id": ..., "text"/"done": ...},
+                          {"op": "delete", "id": ...}]}
+    Returns one result per operation, in order, each with its own status.
+    Invalid operations are reported and skipped; the rest are applied with
+    one INSERT, one UPDATE per set of changed columns and one DELETE.
+    """
     user_id = ensure_user()
-    from datetime import timedelta
-    
-    cutoff_date = datetime.now(timezone.utc) - timedelta(days=7)
-    old_goals = Goal.query.filter_by(
-        goal_type='daily', 
-        done=True, 
-        user_id=user_id
-    ).filter(Goal.completed < cutoff_date).all()
-    
-    for goal in old_goals:
-        db.session.delete(goal)
-    
+    settle_writes(user_id)
+    data = request.get_json()
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list):
+        return jsonify({'error': 'Missing operations list'}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'error': f'At most {MAX_BATCH_OPERATIONS} operations per batch'}), 400
+
+    # One query for every goal the batch refers to
+    referenced = {op['id'] for op in operations
+                  if isinstance(op, dict) and isinstance(op.get('id'), int)}
+    owned = {row.id: row for row in db.session.execute(
+        db.select(Goal.id, Goal.goal_type, Goal.done, Goal.completed)
+        .filter_by(user_id=user_id).where(Goal.id.in_(referenced))
+    )} if referenced else {}
+
+    results = [None] * len(operations)
+    creates, updates, deletes = [], {}, set()
+    for index, op in enumerate(operations):
+        kind = op.get('op') if isinstance(op, dict) else None
+        if kind == 'create':
+            if 'text' not in op or 'goal_type' not in op:
+                results[index] = {'op': kind, 'status': 400, 'error': 'Missing required fields'}
+                continue
+            creates.append((index, {'text': op['text'], 'goal_type': op['goal_type'],
+                                    'user_id': user_id}))
+        elif kind in ('update', 'delete'):
+            goal_id = op['id'] if isinstance(op.get('id'), int) else None
+            if goal_id not in owned or goal_id in deletes:
+                results[index] = {'op': kind, 'id': goal_id, 'status': 404, 'error': 'Goal not found'}
+            elif kind == 'update':
+                updates.setdefault(goal_id, {'id': goal_id}).update(goal_changes(op))
+                results[index] = {'op': kind, 'id': goal_id, 'status': 200}
+            else:
+                deletes.add(goal_id)
+                updates.pop(goal_id, None)
+                results[index] = {'op': kind, 'id': goal_id, 'status': 204}
+        else:
+            results[index] = {'op': kind, 'status': 400, 'error': 'Unknown operation'}
+
+    revision = revisions.bump(user_id) if creates or updates or deletes else None
+    delta = stats.StatsDelta(user_id, current_zone())
+    for _, values in creates:
+        delta.created(values['goal_type'])
+    for goal_id, values in updates.items():
+        if 'done' in values:
+            goal = owned[goal_id]
+            delta.changed(goal.goal_type, goal.done, goal.completed,
+                          values['done'], values['completed'])
+    for goal_id in deletes:
+        goal = owned[goal_id]
+        delta.deleted(goal.goal_type, goal.done, goal.completed)
+    delta.apply()
+    if creates:
+        for _, values in creates:
+            values['revision'] = revision
+        created = db.session.scalars(
+            db.insert(Goal).returning(Goal, sort_by_parameter_order=True),
+            [values for _, values in creates],
+        ).all()
+        for (index, _), goal in zip(creates, created):
+            results[index] = {'op': 'create', 'status': 201, 'goal': goal.to_dict()}
+    if updates:
+        for values in updates.values():
+            values['revision'] = revision
+        db.session.execute(db.update(Goal), list(updates.values()))
+    if deletes:
+        revisions.record_deletes(deletes)
+        recurring.forget(user_id, deletes)
+        db.session.execute(db.delete(Goal).where(Goal.id.in_(deletes)),
+                           execution_options={'synchronize_session': False})
     db.session.commit()
-    return jsonify({'deleted': len(old_goals)})
 
-@app.route('/api/user/profile', methods=['PUT'])
+    if updates:
+        updated = {goal.id: goal.to_dict() for goal in
+                   Goal.query.filter(Goal.id.in_(updates.keys()))}
+        for result in results:
+            if result['op'] == 'update' and result['id'] in updated:
+                result['goal'] = updated[result['id']]
+
+    for result in results:
+        if result['status'] == 201:
+            publish(user_id, {'type': 'created', 'revision': revision, 'goal': result['goal']})
+        elif result['status'] == 204:
+            publish(user_id, {'type': 'deleted', 'revision': revision, 'id': result['id']})
+    for goal_id in updates:
+        if goal_id in updated:
+            publish(user_id, {'type': 'updated', 'revision': revision, 'goal': updated[goal_id]})
+
+    return jsonify({'results': results})
+
+@bp.route('/api/goals/cleanup', methods=['POST'])
+def cleanup_old_goals():
+    """Clean up old completed goals according to the retention policies"""
+    user_id = get_current_user_id()
+    if user_id is None:
+        start_guest_session()
+        return jsonify({'deleted': 0})
+    settle_writes(user_id)
+    policies = retention.policies_from_config(current_app.config)
+    deleted = sum(retention.purge_expired_goals(policies, user_id=user_id).values())
+    if deleted:
+        publish(user_id, events.RESYNC)
+    return jsonify({'deleted': deleted})
+
+@bp.route('/api/stats')
+def get_stats():
+    """Completion rates, daily streaks and completions per week/month for ?year="""
+    user_id = get_current_user_id()
+    if user_id is None:
+        start_guest_session()
+    year = request.args.get('year', type=int)
+    settle_writes(user_id)
+    if year is not None and not 1 <= year <= 9999:
+        return jsonify({'error': 'Invalid year'}), 400
+    return jsonify(stats.summary(user_id, current_zone(), year))
+
+@bp.route('/api/progress.<fmt>')
+def progress_image(fmt):
+    """
+    Year/month/week progress bar for today in the caller's timezone.
+
+    ?period=year|month|week, ?size=small|medium|large, and ?tz= to override
+    the user's timezone. The image only depends on the local date, so it is
+    served from progress_images and is cacheable until local midnight.
+    """
+    import year_progress  # matplotlib is only loaded once an image is requested
+
+    period = request.args.get('period', 'year')
+    size = request.args.get('size', 'medium')
+    if fmt not in year_progress.FORMATS or period not in year_progress.PERIODS \
+            or size not in PROGRESS_SIZES:
+        return jsonify({'error': 'Unknown format, period or size'}), 404
+
+    zone = stats.user_zone(request.args['tz']) if 'tz' in request.args else current_zone()
+    now = datetime.now(zone)
+    today = now.date()
+    key = (today, period, fmt, size)
+    etag = f'progress-{today.isoformat()}-{period}-{size}-{fmt}'
+    midnight = datetime.combine(today + timedelta(days=1), datetime.min.time(), zone)
+    cache_control = f'private, max-age={max(1, int((midnight - now).total_seconds()))}'
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        image = progress_images.get(key)
+        if image is None:
+            figsize, dpi = PROGRESS_SIZES[size]
+            image = year_progress.render(today, period, fmt, dpi=dpi, size=figsize)
+            progress_images.set(key, image)
+        response = Response(image, mimetype='image/svg+xml' if fmt == 'svg' else 'image/png')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    response.headers['Vary'] = 'Cookie'
+    return response
+
+@bp.route('/api/user/profile', methods=['PUT'])
 def update_profile():
     """Update user profile (logged-in users only)"""
     if not current_user.is_authenticated:
         return jsonify({'error': 'Authentication required'}), 401
     
     data = request.get_json()
-    user = current_user
+    # current_user is a cached snapshot; edit the row itself
+    user = db.session.get(User, current_user.id)
     
     if 'display_name' in data:
         user.display_name = data['display_name'][:100]  # Limit length
@@ -310,14 +1230,36 @@ def update_profile():
         user.email = data['email'][:120] if data['email'] else None
     
     db.session.commit()
+    identities.invalidate(user_id=user.id)
+    sessions.forget_identity(user.id)
     return jsonify(user.to_dict())
 
-@app.route('/api/user/convert-guest', methods=['POST'])
+@bp.route('/api/user/password', methods=['PUT'])
+def change_password():
+    """Change the password (logged-in users only); other sessions are logged out"""
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    data = request.get_json()
+    new_password = data.get('new_password', '')
+    if not new_password or len(new_password) < 6:
+        return jsonify({'error': 'Password must be at least 6 characters'}), 400
+    
+    user = db.session.get(User, current_user.id)
+    if not user.check_password(data.get('current_password', '')):
+        return jsonify({'error': 'Current password is incorrect'}), 403
+    user.set_password(new_password)
+    db.session.commit()
+    sessions.end_other_sessions(user.id)
+    return '', 204
+
+@bp.route('/api/user/convert-guest', methods=['POST'])
 def convert_guest():
     """Convert current guest session to registered user"""
     guest_token = session.get('guest_token')
     if not guest_token:
         return jsonify({'error': 'No guest session found'}), 400
+    ratelimit.check('register', ratelimit.client_ip())
     
     data = request.get_json()
     username = data.get('username', '').strip()
@@ -333,8 +1275,10 @@ def convert_guest():
     if User.query.filter_by(username=username).first():
         return jsonify({'error': 'Username already exists'}), 409
     
-    # Find guest user
-    guest_user = User.query.filter_by(guest_token=guest_token, is_guest=True).first()
+    # Find guest user, persisting a session-only guest first
+    if session.get('guest_pending'):
+        ensure_user()
+    guest_user = find_guest(guest_token)
     if not guest_user:
         return jsonify({'error': 'Guest session not found'}), 404
     
@@ -345,6 +1289,7 @@ def convert_guest():
     guest_user.set_password(password)
     
     db.session.commit()
+    identities.invalidate(user_id=guest_user.id, guest_token=guest_token)
     
     # Log in the converted user
     login_user(guest_user)
@@ -353,8 +1298,9 @@ def convert_guest():
     return jsonify(guest_user.to_dict()), 200
 
 if __name__ == '__main__':
-    # Create database tables if they don't exist
+    app = create_app()
+    # Create database tables and apply pending migrations
     with app.app_context():
-        db.create_all()
+        migrations.upgrade()
     port = int(os.environ.get('PORT', 5000))
     app.run(debug=False, host='0.0.0.0', port=port)
\ No newline at end of file
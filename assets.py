@@ -0,0 +1,132 @@
+"""
+Static asset pipeline.
+
+build() minifies the stylesheets and scripts under static/, names each
+copy after a hash of its content (css/style.css -> css/style.1f3a9c0b2e.css)
+under static/dist/, and writes .gz and .br siblings next to it. The
+mapping from source to fingerprinted name is saved in
+static/dist/manifest.json:
+
+    flask --app app build-assets              # static/dist only
+    flask --app app build-assets --docs docs  # also the GitHub Pages copy
+
+Templates keep calling url_for('static', filename='css/style.css'); once a
+manifest exists, init_app() rewrites those URLs to the fingerprinted
+names. The static route then serves the Brotli or gzip sibling the client
+accepts, with Cache-Control: immutable for a year, since a changed file
+gets a new name. Without a build the sources are served as before.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import current_app, render_template, request
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+SOURCES = ('css/style.css', 'css/auth.css', 'js/index.js', 'js/calendar.js')
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))  # in order of preference
+IMMUTABLE = 'public, max-age=31536000, immutable'
+HASH_LENGTH = 10
+
+# Pages published to GitHub Pages, rendered with relative asset URLs
+DOCS_PAGES = {'index.html': 'index.html'}
+
+
+def fingerprint(content):
+    return hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+
+
+def build(static_folder, sources=SOURCES):
+    """Minify, fingerprint and precompress sources into static/dist; returns the manifest"""
+    # Only needed at build time, so the app does not import them
+    import brotli
+    import rcssmin
+    import rjsmin
+
+    minifiers = {'.css': rcssmin.cssmin, '.js': rjsmin.jsmin}
+    dist = os.path.join(static_folder, DIST)
+    if os.path.isdir(dist):
+        shutil.rmtree(dist)
+    manifest = {}
+    for source in sources:
+        root, ext = os.path.splitext(source)
+        with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+            content = minifiers[ext](f.read()).encode('utf-8')
+        name = f'{root}.{fingerprint(content)}{ext}'
+        path = os.path.join(dist, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        with open(path + '.gz', 'wb') as f:
+            f.write(gzip.compress(content, compresslevel=9, mtime=0))
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(content, quality=11))
+        manifest[source] = f'{DIST}/{name}'
+    with open(os.path.join(dist, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def publish_docs(app, docs_dir):
+    """
+    Render DOCS_PAGES into docs_dir with their fingerprinted assets, for
+    static hosting. URLs are relative, so the site works under any path.
+    """
+    manifest = app.extensions['asset_manifest']
+    for name in set(manifest.values()):
+        for suffix in ('', '.gz', '.br'):
+            target = os.path.join(docs_dir, 'static', name + suffix)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(os.path.join(app.static_folder, name + suffix), target)
+    # url_for('static', ...) returns "/static/..." here; the pages sit next
+    # to docs/static, so the leading slash is dropped
+    with app.test_request_context('/'):
+        for template, page in DOCS_PAGES.items():
+            html = render_template(template).replace('"/static/', '"static/')
+            with open(os.path.join(docs_dir, page), 'w', encoding='utf-8') as f:
+                f.write(html)
+
+
+def init_app(app):
+    """Fingerprinted static URLs and the precompressed static route"""
+    app.extensions['asset_manifest'] = load_manifest(app.static_folder)
+
+    @app.url_defaults
+    def fingerprinted_static(endpoint, values):
+        if endpoint == 'static':
+            manifest = current_app.extensions['asset_manifest']
+            values['filename'] = manifest.get(values.get('filename'), values.get('filename'))
+
+    app.view_functions['static'] = send_static
+
+
+def send_static(filename):
+    """Static route; fingerprinted files are sent precompressed and cached for good"""
+    app = current_app._get_current_object()
+    if not filename.startswith(DIST + '/'):
+        return app.send_static_file(filename)
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.isfile(
+                os.path.join(app.static_folder, filename + suffix)):
+            response = app.send_static_file(filename + suffix)
+            # Typed after the uncompressed file, not as .br/.gz
+            response.mimetype = mimetypes.guess_type(filename)[0]
+            response.content_encoding = encoding
+            break
+    else:
+        response = app.send_static_file(filename)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
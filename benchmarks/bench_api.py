@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Mixed-workload load test of the goals API.
+
+Seeds --users users with --goals goals each in a scratch database, then
+runs --clients concurrent clients. Each client performs --operations
+requests drawn from a fixed mix: goal listing, creation, toggling done,
+cleanup, guest creation and login. The random seed fixes every client's
+sequence, so runs with the same arguments issue the same requests.
+
+Clients go through Flask's test client (--mode client) or over HTTP to a
+threaded local WSGI server (--mode server). Reports throughput and
+p50/p95/p99 latency per endpoint as JSON. With --compare, the run is
+checked against an earlier report and exits non-zero if any endpoint's
+p95 or throughput is worse by more than --tolerance.
+
+    python -m benchmarks.bench_api --users 20 --goals 200 --clients 8 --operations 200 \\
+        --output before.json
+    python -m benchmarks.bench_api ... --compare before.json
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+import http.cookiejar
+import json
+import logging
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.common import latency_summary, use_scratch_database
+
+use_scratch_database()
+
+from app import create_app, db, User, Goal  # noqa: E402
+import hashing  # noqa: E402
+import migrations  # noqa: E402
+import stats  # noqa: E402
+
+PASSWORD = 'secret123'
+
+# Relative weight of each operation in the workload
+MIX = {
+    'list': 50,
+    'create': 15,
+    'toggle': 15,
+    'cleanup': 5,
+    'guest': 10,
+    'login': 5,
+}
+
+
+def seed(app, user_count, goals_per_user, rng):
+    """users bench_1..bench_N, each with goals; a fifth are done, some long ago"""
+    password_hash = hashing.hasher.hash(PASSWORD)
+    now = datetime.now(timezone.utc)
+    with app.app_context():
+        migrations.upgrade()
+        db.session.execute(db.insert(User), [
+            {'username': f'bench_{i}', 'password_hash': password_hash, 'is_guest': False}
+            for i in range(1, user_count + 1)
+        ])
+        user_ids = db.session.scalars(db.select(User.id).order_by(User.id)).all()
+        rows = []
+        for user_id in user_ids:
+            for n in range(goals_per_user):
+                done = rng.random() < 0.2
+                rows.append({
+                    'text': f'goal {n}', 'goal_type': rng.choice(('daily', 'weekly', 'monthly')),
+                    'user_id': user_id, 'done': done,
+                    'completed': now - timedelta(days=rng.randint(0, 30)) if done else None,
+                })
+            if len(rows) >= 10000:
+                db.session.execute(db.insert(Goal), rows)
+                rows = []
+        if rows:
+            db.session.execute(db.insert(Goal), rows)
+        stats.rebuild()
+        db.session.commit()
+
+
+class TestClientSession:
+    """Requests through Flask's test client, with its own cookie jar"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, payload=None):
+        response = self.client.open(path, method=method, json=payload)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HTTPSession:
+    """Requests over HTTP to a local server, with its own cookie jar"""
+
+    def __init__(self, base):
+        self.base = base
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(self.base + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with self.opener.open(request) as response:
+                body = response.read()
+                status = response.status
+        except urllib.error.HTTPError as error:
+            return error.code, None
+        try:
+            return status, json.loads(body)
+        except ValueError:
+            return status, None
+
+
+def run_client(index, new_session, args, seed_value, timings, errors, lock):
+    rng = random.Random(seed_value * 1000 + index)
+    username = f'bench_{index % args.users + 1}'
+    session = new_session()
+    session.request('POST', '/login', {'username': username, 'password': PASSWORD})
+    _, goals = session.request('GET', '/api/goals')
+    goal_ids = [goal['id'] for goal in goals or []]
+    operations, weights = zip(*MIX.items())
+    local = {name: [] for name in operations}
+    failed = {name: 0 for name in operations}
+
+    for _ in range(args.operations):
+        operation = rng.choices(operations, weights)[0]
+        start = time.perf_counter()
+        if operation == 'list':
+            status, _ = session.request('GET', '/api/goals')
+        elif operation == 'create':
+            status, goal = session.request('POST', '/api/goals', {
+                'text': f'new goal {rng.random():.6f}', 'goal_type': 'daily'})
+            if goal and 'id' in goal:
+                goal_ids.append(goal['id'])
+        elif operation == 'toggle':
+            goal_id = rng.choice(goal_ids) if goal_ids else 0
+            status, _ = session.request('PUT', f'/api/goals/{goal_id}', {'done': rng.random() < 0.5})
+            if status == 404 and goal_id in goal_ids:
+                goal_ids.remove(goal_id)  # purged by cleanup
+        elif operation == 'cleanup':
+            status, _ = session.request('POST', '/api/goals/cleanup')
+        elif operation == 'guest':
+            # A new visitor: reads stay in the session, the first goal
+            # creates the guest user
+            visitor = new_session()
+            visitor.request('GET', '/api/goals')
+            status, _ = visitor.request('POST', '/api/goals', {'text': 'first', 'goal_type': 'daily'})
+        else:
+            status, _ = new_session().request(
+                'POST', '/login', {'username': username, 'password': PASSWORD})
+        local[operation].append(time.perf_counter() - start)
+        if status >= 400 and not (operation == 'toggle' and status == 404):
+            failed[operation] += 1
+
+    with lock:
+        for name in operations:
+            timings[name].extend(local[name])
+            errors[name] += failed[name]
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    # Every simulated client shares one IP, so rate limits would turn most
+    # guest creations and logins away
+    app = create_app({'BCRYPT_ROUNDS': args.bcrypt_rounds, 'RATE_LIMITS': {}})
+    seed(app, args.users, args.goals, rng)
+
+    server = None
+    if args.mode == 'server':
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{server.server_port}'
+
+        def new_session():
+            return HTTPSession(base)
+    else:
+        def new_session():
+            return TestClientSession(app)
+
+    timings = {name: [] for name in MIX}
+    errors = {name: 0 for name in MIX}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=run_client,
+                                args=(i, new_session, args, args.seed, timings, errors, lock))
+               for i in range(args.clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        server.shutdown()
+
+    total = sum(len(values) for values in timings.values())
+    return {
+        'config': {name: getattr(args, name) for name in
+                   ('mode', 'users', 'goals', 'clients', 'operations', 'seed', 'bcrypt_rounds')},
+        'seconds': round(elapsed, 3),
+        'requests': total,
+        'throughput_rps': round(total / elapsed, 1),
+        'endpoints': {
+            name: dict(latency_summary(values), errors=errors[name],
+                       throughput_rps=round(len(values) / elapsed, 1))
+            for name, values in timings.items()
+        },
+    }
+
+
+def compare(baseline, current, tolerance):
+    """Endpoints whose p95 or throughput got worse by more than tolerance"""
+    regressions = []
+    for name, now in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if not before or not before.get('count') or not now.get('count'):
+            continue
+        if now['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']} ms -> {now['p95_ms']} ms")
+        if now['throughput_rps'] < before['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> "
+                               f"{now['throughput_rps']} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--mode', choices=('client', 'server'), default='client')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--goals', type=int, default=200, help='Goals seeded per user')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent clients')
+    parser.add_argument('--operations', type=int, default=200, help='Requests per client')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--bcrypt-rounds', type=int, default=4,
+                        help='Cost for seeded passwords and logins (production uses 12)')
+    parser.add_argument('--output', help='Also write the report to this file')
+    parser.add_argument('--compare', help='Earlier report to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    args = parser.parse_args()
+
+    results = run(args)
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        for line in regressions:
+            print(f"✗ {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Per-item goal endpoints versus /api/goals/batch.
+
+Creates, toggles and deletes the same number of goals once through the
+single-goal routes and once through the batch endpoint, against a scratch
+database, and reports wall time and requests for each phase.
+
+    python -m benchmarks.bench_batch --goals 200
+"""
+import argparse
+import json
+import time
+
+from benchmarks.common import use_scratch_database
+
+use_scratch_database()
+
+from app import app  # noqa: E402
+import migrations  # noqa: E402
+
+
+def timed(func):
+    start = time.perf_counter()
+    requests = func()
+    return {'seconds': round(time.perf_counter() - start, 4), 'requests': requests}
+
+
+def per_item(client, count):
+    ids = []
+
+    def create():
+        for i in range(count):
+            ids.append(client.post('/api/goals', json={'text': f'goal {i}', 'goal_type': 'daily'})
+                       .get_json()['id'])
+        return count
+
+    def toggle():
+        for goal_id in ids:
+            client.put(f'/api/goals/{goal_id}', json={'done': True})
+        return count
+
+    def delete():
+        for goal_id in ids:
+            client.delete(f'/api/goals/{goal_id}')
+        return count
+
+    return {'create': timed(create), 'toggle': timed(toggle), 'delete': timed(delete)}
+
+
+def batched(client, count):
+    ids = []
+
+    def send(operations):
+        return client.post('/api/goals/batch', json={'operations': operations}).get_json()['results']
+
+    def create():
+        results = send([{'op': 'create', 'text': f'goal {i}', 'goal_type': 'daily'}
+                        for i in range(count)])
+        ids.extend(result['goal']['id'] for result in results)
+        return 1
+
+    def toggle():
+        send([{'op': 'update', 'id': goal_id, 'done': True} for goal_id in ids])
+        return 1
+
+    def delete():
+        send([{'op': 'delete', 'id': goal_id} for goal_id in ids])
+        return 1
+
+    return {'create': timed(create), 'toggle': timed(toggle), 'delete': timed(delete)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--goals', type=int, default=200)
+    args = parser.parse_args()
+
+    with app.app_context():
+        migrations.upgrade()
+    results = {
+        'goals': args.goals,
+        'per_item': per_item(app.test_client(), args.goals),
+        'batch': batched(app.test_client(), args.goals),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+/api/goals latency while /login is being hammered.
+
+Starts the app on a threaded local WSGI server with a scratch database, then
+runs login threads against /login while a single reader measures
+/api/goals. Each bcrypt worker setting is measured in turn; workers=0
+hashes inline on the request thread, as the app did before the hashing pool.
+
+    python -m benchmarks.bench_login --workers 0 2 --login-threads 16 --seconds 5
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.common import latency_summary, use_scratch_database
+
+use_scratch_database()
+os.environ['RATE_LIMITS'] = ''  # measure the hashing pool, not the login limits
+
+from werkzeug.serving import make_server  # noqa: E402
+
+from app import app, db, User, Goal  # noqa: E402
+import hashing  # noqa: E402
+import migrations  # noqa: E402
+
+
+def seed(rounds):
+    hashing.configure(rounds=rounds, workers=0)
+    with app.app_context():
+        migrations.upgrade()
+        user = User(username='bench_login')
+        user.set_password('secret123')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all(Goal(text=f'goal {i}', goal_type='daily', user_id=user.id)
+                           for i in range(50))
+        db.session.commit()
+
+
+def opener():
+    return urllib.request.build_opener(
+        urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+
+def post_json(client, url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with client.open(request) as response:
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+
+def login_loop(base, deadline, statuses, lock):
+    client = opener()
+    while time.perf_counter() < deadline:
+        status = post_json(client, base + '/login',
+                           {'username': 'bench_login', 'password': 'secret123'})
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+
+
+def read_loop(base, deadline, latencies):
+    client = opener()
+    post_json(client, base + '/login', {'username': 'bench_login', 'password': 'secret123'})
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        with client.open(base + '/api/goals') as response:
+            response.read()
+        latencies.append(time.perf_counter() - start)
+
+
+def run(base, rounds, workers, queue_size, login_threads, seconds):
+    hashing.configure(rounds=rounds, workers=workers, queue_size=queue_size)
+    statuses, latencies, lock = {}, [], threading.Lock()
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=login_loop, args=(base, deadline, statuses, lock))
+               for _ in range(login_threads)]
+    threads.append(threading.Thread(target=read_loop, args=(base, deadline, latencies)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        'bcrypt_workers': workers,
+        'api_goals': latency_summary(latencies),
+        'login_status_counts': {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2])
+    parser.add_argument('--queue-size', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=hashing.DEFAULT_ROUNDS)
+    parser.add_argument('--login-threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    seed(args.rounds)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    try:
+        results = [run(base, args.rounds, workers, args.queue_size,
+                       args.login_threads, args.seconds)
+                   for workers in args.workers]
+    finally:
+        server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+/api/goals latency while guest creation and /login are flooded, with and without rate limits.
+
+Starts the app on a threaded local WSGI server with a scratch database.
+Flood threads act as a crawler and a credential stuffer: cookieless
+POST /api/goals (a new guest row each) and /login with wrong passwords.
+Meanwhile a logged-in user lists goals. Each setting of RATE_LIMITS is
+measured in turn; "" is no limits. The cost of one admitted take() is
+timed for each store as well.
+
+    python -m benchmarks.bench_ratelimit --flood-threads 16 --seconds 5
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.common import latency_summary, use_scratch_database
+
+use_scratch_database()
+
+from werkzeug.serving import make_server  # noqa: E402
+
+from app import create_app, db, User, Goal  # noqa: E402
+import hashing  # noqa: E402
+import migrations  # noqa: E402
+import ratelimit  # noqa: E402
+
+
+def seed(app):
+    with app.app_context():
+        migrations.upgrade()
+        user = User(username='bench_victim')
+        user.set_password('secret123')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all(Goal(text=f'goal {i}', goal_type='daily', user_id=user.id)
+                           for i in range(50))
+        db.session.commit()
+
+
+def opener():
+    return urllib.request.build_opener(
+        urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+
+def post_json(client, url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with client.open(request) as response:
+            return response.status
+    except urllib.error.HTTPError as error:
+        return error.code
+
+
+def flood_loop(base, deadline, statuses, lock, n):
+    while time.perf_counter() < deadline:
+        if n % 2:
+            status = post_json(opener(), base + '/api/goals', {'text': 'spam', 'goal_type': 'daily'})
+        else:
+            status = post_json(opener(), base + '/login', {'username': 'bench_victim', 'password': 'wrong'})
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+
+
+def read_loop(base, deadline, latencies):
+    client = opener()
+    post_json(client, base + '/login', {'username': 'bench_victim', 'password': 'secret123'})
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        with client.open(base + '/api/goals') as response:
+            response.read()
+        latencies.append(time.perf_counter() - start)
+
+
+def run(limits, rounds, flood_threads, seconds):
+    app = create_app({'RATE_LIMITS': ratelimit.parse_limits(limits), 'BCRYPT_ROUNDS': rounds})
+    with app.app_context():
+        db.drop_all()
+    seed(app)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+    statuses, latencies, lock = {}, [], threading.Lock()
+    deadline = time.perf_counter() + seconds
+    reader = threading.Thread(target=read_loop, args=(base, deadline, latencies))
+    reader.start()
+    time.sleep(0.2)  # logged in before the flood starts
+    threads = [threading.Thread(target=flood_loop, args=(base, deadline, statuses, lock, n))
+               for n in range(flood_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads + [reader]:
+        thread.join()
+    server.shutdown()
+    with app.app_context():
+        guests = User.query.filter_by(is_guest=True).count()
+    return {
+        'rate_limits': limits,
+        'api_goals': latency_summary(latencies),
+        'flood_status_counts': {str(k): v for k, v in sorted(statuses.items())},
+        'guests_created': guests,
+    }
+
+
+def take_cost(store, takes):
+    """Microseconds per admitted take() from a bucket that never runs dry"""
+    limit = ratelimit.Limit(10 ** 9, 1.0)
+    start = time.perf_counter()
+    for _ in range(takes):
+        store.take('bench', limit)
+    return round((time.perf_counter() - start) / takes * 1e6, 2)
+
+
+def take_costs(takes):
+    app = create_app({'RATE_LIMIT_STORE': 'table'})
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+        table = take_cost(app.extensions['rate_limit_store'], takes // 10)
+    return {'memory': take_cost(ratelimit.MemoryStore(), takes), 'table': table}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--limits', nargs='+', default=['', ratelimit.DEFAULT_LIMITS])
+    parser.add_argument('--rounds', type=int, default=hashing.DEFAULT_ROUNDS)
+    parser.add_argument('--flood-threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--takes', type=int, default=20000)
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    results = {
+        'take_us': take_costs(args.takes),
+        'floods': [run(limits, args.rounds, args.flood_threads, args.seconds) for limits in args.limits],
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Goal search through the FTS5 index versus a LIKE scan of the user's goals.
+
+Seeds a scratch SQLite database with millions of goals spread over many
+users, plus one heavy user with years of history, builds the search index,
+and runs the same word-prefix queries through the index and as LIKE scans
+of the user's goals, for typical users and for the heavy user. Reports
+seeding and index build time and per-query latency.
+
+    python -m benchmarks.bench_search --goals 2000000 --users 2000 --heavy-goals 100000
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks.common import latency_summary, use_scratch_database
+
+use_scratch_database()
+
+from app import app, GOAL_FIELDS  # noqa: E402
+from models import db, User, Goal  # noqa: E402
+import search  # noqa: E402
+
+LETTERS = 'abcdefghiklmnoprstuvwy'
+CHUNK = 50_000
+LIMIT = 20
+
+
+def vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choices(LETTERS, k=rng.randint(4, 9))))
+    return sorted(words)
+
+
+def seed(rng, words, users, goals, heavy_goals):
+    """Insert users and goals; user 1 is the heavy user. Returns seconds taken"""
+    start = time.perf_counter()
+    db.metadata.create_all(db.engine)
+    with db.engine.begin() as conn:
+        conn.execute(db.insert(User.__table__), [
+            {'id': i, 'username': f'bench_{i}', 'password_hash': '', 'is_guest': True}
+            for i in range(1, users + 1)])
+        owners = [1] * heavy_goals + [rng.randint(2, users) for _ in range(goals - heavy_goals)]
+        rng.shuffle(owners)
+        for offset in range(0, len(owners), CHUNK):
+            conn.execute(db.insert(Goal.__table__), [
+                {'text': ' '.join(rng.choices(words, k=rng.randint(2, 6))).capitalize(),
+                 'goal_type': 'daily', 'done': False, 'user_id': user_id}
+                for user_id in owners[offset:offset + CHUNK]])
+    return time.perf_counter() - start
+
+
+def like_query(user_id, words, columns):
+    query = db.select(*columns).filter_by(user_id=user_id)
+    for word in words:
+        query = query.where(Goal.text.like(f'%{word}%'))
+    return query.order_by(Goal.id)
+
+
+def run(rng, words, user_ids, queries):
+    """
+    like_page stops at the first LIMIT matches in id order, so it cannot
+    rank; like_all reads every match, as ranking them would require.
+    """
+    columns = [getattr(Goal, name) for name in GOAL_FIELDS]
+    timings = {'like_page': [], 'like_all': [], 'fts': []}
+    matches = dict.fromkeys(timings, 0)
+    for _ in range(queries):
+        user_id = rng.choice(user_ids)
+        terms = [word[:rng.randint(3, len(word))] for word in rng.sample(words, rng.choice((1, 1, 2)))]
+        for name, query in (('like_page', like_query(user_id, terms, columns).limit(LIMIT)),
+                            ('like_all', like_query(user_id, terms, columns)),
+                            ('fts', search.search_query(user_id, terms, columns, LIMIT))):
+            start = time.perf_counter()
+            rows = db.session.execute(query).all()
+            timings[name].append(time.perf_counter() - start)
+            matches[name] += len(rows)
+    return {name: dict(latency_summary(seconds), rows=matches[name])
+            for name, seconds in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--goals', type=int, default=2_000_000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--heavy-goals', type=int, default=100_000,
+                        help='Goals owned by user 1, out of --goals')
+    parser.add_argument('--words', type=int, default=5000, help='Vocabulary size')
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    words = vocabulary(rng, args.words)
+    with app.app_context():
+        seconds = seed(rng, words, args.users, args.goals, args.heavy_goals)
+        start = time.perf_counter()
+        with db.engine.begin() as conn:
+            search.rebuild(conn)
+        results = {
+            'goals': args.goals,
+            'users': args.users,
+            'seed_seconds': round(seconds, 1),
+            'index_build_seconds': round(time.perf_counter() - start, 1),
+            'typical_user': run(rng, words, list(range(2, args.users + 1)), args.queries),
+            'heavy_user': run(rng, words, [1], args.queries),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Cold start: import time and time to first request.
+
+Each run starts a fresh interpreter against a scratch database. It
+reports how long `import app`, create_app(), migrations and the first
+requests take, and the slowest imports according to `python -X
+importtime`. The first /api/progress.png request includes loading
+matplotlib.
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import use_scratch_database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter; prints phase timings in seconds as JSON
+CHILD = '''
+import json, time
+start = time.perf_counter()
+phases = {}
+import app as module
+phases['import'] = time.perf_counter() - start
+application = module.create_app()
+phases['create_app'] = time.perf_counter() - start
+with application.app_context():
+    module.migrations.upgrade()
+phases['migrations'] = time.perf_counter() - start
+client = application.test_client()
+client.get('/api/goals')
+phases['first_request'] = time.perf_counter() - start
+client.get('/api/progress.png')
+phases['first_progress_image'] = time.perf_counter() - start
+print(json.dumps(phases))
+'''
+
+IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+
+def child_env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    env['BCRYPT_WORKERS'] = '0'
+    return env
+
+
+def time_to_first_request(env):
+    use_scratch_database()
+    env = dict(env, DATABASE_URL=os.environ['DATABASE_URL'])
+    output = subprocess.run([sys.executable, '-c', CHILD], env=env, cwd=ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def import_profile(env, top):
+    """Cumulative microseconds of `import app` and its slowest top-level imports"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            env=env, cwd=ROOT, capture_output=True, text=True, check=True).stderr
+    total, children = None, []
+    for line in stderr.splitlines():
+        match = IMPORTTIME.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        if not indent:
+            # Lines are printed children first; keep only app's children
+            if name == 'app':
+                total = int(cumulative)
+                break
+            children = []
+        elif len(indent) == 2:
+            children.append((int(cumulative), name))
+    children.sort(reverse=True)
+    return total, {name: round(us / 1000, 1) for us, name in children[:top]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list')
+    args = parser.parse_args()
+
+    env = child_env()
+    runs = [time_to_first_request(env) for _ in range(args.runs)]
+    import_ms, slowest = import_profile(env, args.top)
+    results = {
+        'runs': args.runs,
+        # Milliseconds from the start of the child script to the end of each phase
+        'median_ms': {phase: round(statistics.median(run[phase] for run in runs) * 1000, 1)
+                      for phase in runs[0]},
+        'importtime_app_ms': round(import_ms / 1000, 1) if import_ms else None,
+        'slowest_imports_ms': slowest,
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Mixed read/write throughput of the goals table under each storage profile.
+
+Each worker thread loops over one user's goals: mostly get_goals-style
+reads, with create_goal/update_goal-style writes mixed in. Reports
+operations per second and how many operations failed with
+"database is locked".
+
+    python -m benchmarks.bench_storage --threads 8 --seconds 5
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.exc import OperationalError
+
+from models import db, User, Goal
+import storage
+
+users = User.__table__
+goals = Goal.__table__
+
+
+def make_engine(path, profile, threads):
+    uri = 'sqlite:///' + path
+    if profile == 'legacy':
+        # What app.py used before storage profiles: SQLAlchemy defaults
+        return create_engine(uri)
+    engine = create_engine(uri, **storage.engine_options(uri, pool_size=threads))
+    storage.apply_pragmas(engine, storage.STORAGE_PROFILES[profile])
+    return engine
+
+
+def seed(engine, user_count, goals_per_user):
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(users), [
+            {'id': i, 'username': f'bench_{i}', 'password_hash': '', 'is_guest': True}
+            for i in range(1, user_count + 1)
+        ])
+        conn.execute(insert(goals), [
+            {'text': f'goal {n}', 'goal_type': 'daily', 'done': False, 'user_id': i}
+            for i in range(1, user_count + 1) for n in range(goals_per_user)
+        ])
+
+
+def worker(engine, user_id, write_ratio, deadline, counts, lock):
+    ok = locked = 0
+    rng = random.Random(user_id)
+    while time.perf_counter() < deadline:
+        try:
+            if rng.random() < write_ratio:
+                with engine.begin() as conn:
+                    if rng.random() < 0.5:
+                        conn.execute(insert(goals).values(
+                            text='new', goal_type='daily', done=False, user_id=user_id))
+                    else:
+                        conn.execute(update(goals)
+                                     .where(goals.c.user_id == user_id, goals.c.goal_type == 'daily')
+                                     .values(done=rng.random() < 0.5))
+            else:
+                with engine.connect() as conn:
+                    conn.execute(select(goals).where(goals.c.user_id == user_id)).all()
+            ok += 1
+        except OperationalError as exc:
+            if 'locked' not in str(exc):
+                raise
+            locked += 1
+    with lock:
+        counts['ok'] += ok
+        counts['locked'] += locked
+
+
+def run(profile, threads, seconds, write_ratio, goals_per_user):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(os.path.join(tmp, 'bench.db'), profile, threads)
+        seed(engine, threads, goals_per_user)
+        counts, lock = {'ok': 0, 'locked': 0}, threading.Lock()
+        deadline = time.perf_counter() + seconds
+        pool = [threading.Thread(target=worker,
+                                 args=(engine, i + 1, write_ratio, deadline, counts, lock))
+                for i in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        engine.dispose()
+    return {
+        'profile': profile,
+        'ops_per_second': round(counts['ok'] / seconds, 1),
+        'locked_errors': counts['locked'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--profiles', nargs='+', default=['legacy', 'wal'])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--goals-per-user', type=int, default=200)
+    args = parser.parse_args()
+
+    results = [run(profile, args.threads, args.seconds, args.write_ratio, args.goals_per_user)
+               for profile in args.profiles]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Progress bar rendering: the original script versus year_progress.
+
+The original year_progress.py built a new pyplot figure for every image
+and drew the gradient as 100 Rectangle patches; legacy_render() below
+reproduces it. Each variant renders the same dates, and the batch case
+renders the year, month and week bars for every date with render_many.
+
+    python -m benchmarks.bench_year_progress --dates 30 --dpi 300
+"""
+from datetime import date, timedelta
+import argparse
+import io
+import json
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.dates as mdates  # noqa: E402
+import matplotlib.pyplot as plt  # noqa: E402
+from matplotlib.patches import Rectangle  # noqa: E402
+import numpy as np  # noqa: E402
+
+import year_progress  # noqa: E402
+
+
+def legacy_render(day, dpi):
+    """The year bar as the original script drew it"""
+    year_start, year_end = date(day.year, 1, 1), date(day.year, 12, 31)
+    total_days = (year_end - year_start).days + 1
+    days_elapsed = (day - year_start).days
+    percentage_complete = (days_elapsed / total_days) * 100
+
+    plt.style.use('default')
+    fig, ax = plt.subplots(figsize=(10, 2))
+    fig.patch.set_alpha(0.0)
+    ax.set_facecolor('none')
+    cmap = year_progress.CMAP
+    bar_width = days_elapsed / total_days
+    for i in np.linspace(0, bar_width, 100):
+        ax.add_patch(Rectangle((i * total_days, -0.25), total_days / 100, 0.5,
+                               color=cmap(i), linewidth=0))
+    ax.add_patch(Rectangle((days_elapsed, -0.25), total_days - days_elapsed, 0.5,
+                           color='#e3e6ee', alpha=0.22, linewidth=0))
+    ax.axvline(x=days_elapsed, color='#ff3b47', linestyle='--', alpha=0.85)
+    ax.xaxis.set_major_locator(mdates.MonthLocator())
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%b'))
+    ax.set_xlim(0, total_days)
+    ax.set_ylim(-0.5, 0.5)
+    ax.set_yticks([])
+    ax.set_title(
+        f"{day.year}: {percentage_complete:.2f}% | {days_elapsed}d elapsed | {total_days-days_elapsed}d left",
+        color='#2a3a5e', fontweight='bold'
+    )
+    ax.text(days_elapsed + 5, 0, f"Today: {day.strftime('%b %d')}",
+            va='center', ha='left', color='#ff3b47', fontweight='bold')
+    ax.text(5, 0, "Start: Jan 01", va='center', ha='left', fontsize=8, color='#4f8cff')
+    ax.text(total_days - 5, 0, "End: Dec 31", va='center', ha='right', fontsize=8, color='#ff6ec7')
+    for spine in ax.spines.values():
+        spine.set_visible(False)
+    plt.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi, transparent=True)
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def timed(func, images):
+    start = time.perf_counter()
+    sizes = func()
+    seconds = time.perf_counter() - start
+    return {
+        'images': images,
+        'seconds': round(seconds, 4),
+        'ms_per_image': round(seconds / images * 1000, 2),
+        'avg_bytes': round(sum(sizes) / len(sizes)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--dates', type=int, default=30)
+    parser.add_argument('--dpi', type=int, default=300)
+    args = parser.parse_args()
+
+    days = [date(2025, 1, 1) + timedelta(days=i * 365 // args.dates) for i in range(args.dates)]
+    count = len(days)
+    results = {
+        'dates': count,
+        'dpi': args.dpi,
+        'legacy_png': timed(lambda: [len(legacy_render(day, args.dpi)) for day in days], count),
+        'render_png': timed(lambda: [len(year_progress.render(day, dpi=args.dpi))
+                                     for day in days], count),
+        'render_png_lightweight': timed(lambda: [len(year_progress.render(day))
+                                                 for day in days], count),
+        'render_svg': timed(lambda: [len(year_progress.render(day, fmt='svg'))
+                                     for day in days], count),
+        'render_many_all_periods': timed(
+            lambda: [len(image) for image in
+                     year_progress.render_many(days, dpi=args.dpi).values()],
+            count * len(year_progress.PERIODS)),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""
+Helpers shared by the benchmark scripts.
+"""
+import os
+import tempfile
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values (pct in 0..100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def latency_summary(seconds):
+    """count/p50/p95/p99/max in milliseconds for a list of durations in seconds"""
+    return {
+        'count': len(seconds),
+        'p50_ms': round(percentile(seconds, 50) * 1000, 2) if seconds else None,
+        'p95_ms': round(percentile(seconds, 95) * 1000, 2) if seconds else None,
+        'p99_ms': round(percentile(seconds, 99) * 1000, 2) if seconds else None,
+        'max_ms': round(max(seconds) * 1000, 2) if seconds else None,
+    }
+
+
+def use_scratch_database():
+    """Point the app at a throwaway SQLite file; call before importing app"""
+    directory = tempfile.mkdtemp(prefix='goals-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(directory, 'bench.db')
+    return directory
@@ -0,0 +1,9 @@
+"""
+pytest runs every test script in one process, and the scripts that use
+`from app import app` share that application. Run it without rate limits
+so that how many guests and logins earlier scripts made does not matter;
+test_rate_limit.py passes its own RATE_LIMITS to create_app().
+"""
+import os
+
+os.environ.setdefault('RATE_LIMITS', '')
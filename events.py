@@ -0,0 +1,193 @@
+"""
+Goal change events for /api/goals/stream.
+
+Routes publish an event for every goal they create, update or delete,
+after committing, and each open stream of that user receives it. A broker
+is any object with publish(user_id, event) and subscribe(user_id) ->
+Subscription; EVENT_BROKER picks one of:
+
+  local   LocalBroker, in-process: only streams served by the same worker
+          see the event
+  table   TableBroker, which relays events through the goal_event table so
+          every worker sharing the database sees them. It stands in for a
+          shared broker such as Redis pub/sub in tests and small setups.
+
+Events are dicts with a 'type' ('created', 'updated', 'deleted' or
+'resync') and the user's goal revision where known. 'resync' means events
+were lost (a slow client, a cleanup that deleted goals in bulk) and the
+client should catch up with /api/goals/changes.
+"""
+from datetime import datetime, timedelta, timezone
+import json
+import queue
+import threading
+import time
+
+from models import db, GoalEvent
+
+BROKERS = ('local', 'table')
+RESYNC = {'type': 'resync'}
+
+
+class Subscription:
+    """Events for one stream, buffered up to maxsize"""
+
+    def __init__(self, broker, user_id, maxsize):
+        self.broker = broker
+        self.user_id = user_id
+        self._queue = queue.Queue(maxsize)
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # The client fell behind; replace the backlog with one resync
+            with self._queue.mutex:
+                self._queue.queue.clear()
+            self._queue.put_nowait(RESYNC)
+
+    def get(self, timeout=None):
+        """Next event, or None if none arrived within timeout seconds"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class LocalBroker:
+    """In-process pub/sub keyed by user id"""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.user_id, None)
+
+    def subscribers(self, user_id):
+        with self._lock:
+            return len(self._subscribers.get(user_id, ()))
+
+    def publish(self, user_id, event):
+        self.deliver(user_id, event)
+
+    def deliver(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def stop(self):
+        pass
+
+
+class TableBroker(LocalBroker):
+    """
+    Relays events through the goal_event table.
+
+    publish() inserts a row; one thread per process reads new rows every
+    poll_interval seconds and delivers them to that process's streams.
+    Rows older than retention seconds are deleted about once per retention
+    period. Delivery follows id order, which matches commit order only
+    while writes are serialized (SQLite); this is a test stand-in, not a
+    durable queue.
+    """
+
+    def __init__(self, engine, queue_size=100, poll_interval=0.2, retention=60, logger=None):
+        super().__init__(queue_size)
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.logger = logger
+        self.table = GoalEvent.__table__
+        self._last_trim = time.monotonic()
+        self._last_id = None  # set by the first poll; older events are not replayed
+        self._poll_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='goal-events', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def publish(self, user_id, event):
+        with self.engine.begin() as conn:
+            conn.execute(self.table.insert().values(
+                user_id=user_id, payload=json.dumps(event), created_at=datetime.now(timezone.utc)))
+
+    def poll(self):
+        """Deliver rows published since the last poll; returns how many"""
+        with self._poll_lock:
+            return self._poll()
+
+    def _poll(self):
+        if self._last_id is None:
+            with self.engine.connect() as conn:
+                self._last_id = conn.execute(db.select(db.func.max(self.table.c.id))).scalar() or 0
+            return 0
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                db.select(self.table.c.id, self.table.c.user_id, self.table.c.payload)
+                .where(self.table.c.id > self._last_id).order_by(self.table.c.id)
+            ).all()
+        if time.monotonic() - self._last_trim >= self.retention:
+            self._last_trim = time.monotonic()
+            with self.engine.begin() as conn:
+                conn.execute(self.table.delete().where(self.table.c.created_at <
+                             datetime.now(timezone.utc) - timedelta(seconds=self.retention)))
+        for row in rows:
+            self.deliver(row.user_id, json.loads(row.payload))
+        if rows:
+            self._last_id = rows[-1].id
+        return len(rows)
+
+    def _loop(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception:
+                if self.logger is not None:
+                    self.logger.exception("Goal event poll failed")
+
+
+def init_app(app, engine):
+    """Create the broker named by EVENT_BROKER as app.extensions['event_broker']"""
+    name = app.config['EVENT_BROKER']
+    if name not in BROKERS:
+        raise ValueError(f"EVENT_BROKER must be one of {', '.join(BROKERS)}, not {name!r}")
+    if name == 'local':
+        broker = LocalBroker(app.config['EVENT_QUEUE_SIZE'])
+    else:
+        broker = TableBroker(engine, app.config['EVENT_QUEUE_SIZE'],
+                             app.config['EVENT_POLL_INTERVAL'], logger=app.logger).start()
+    app.extensions['event_broker'] = broker
+    return broker
+
+
+def format_event(event, event_id=None):
+    """One Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f"event: {event['type']}")
+    lines.append(f'data: {json.dumps(event)}')
+    return '\n'.join(lines) + '\n\n'
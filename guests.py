@@ -0,0 +1,141 @@
+"""
+Expiry of abandoned guest accounts.
+
+Every visitor without a session gets a guest User row, including bots and
+one-off page hits. reap_guests() deletes guests that have not been seen
+for longer than a TTL, together with their goals and derived rows, in
+chunks that are committed one at a time so writers are never blocked for
+long.
+
+Activity is recorded in user.last_seen without a write per request:
+LastSeenTracker collects guest ids in memory and writes the latest
+timestamps with one UPDATE per flush interval. The TTL is measured in
+days and the flush interval in seconds, so at worst a guest looks a
+minute older than they are.
+
+GuestReaper runs flush + reap periodically on a daemon thread; the
+reap-guests CLI command does a single pass, e.g. from cron.
+"""
+from datetime import datetime, timezone
+import threading
+import time
+
+from models import db, User, Goal, GoalTombstone, GoalStats, GoalCompletionDay, RecurringGoal
+
+DEFAULT_TTL_DAYS = 30
+DEFAULT_CHUNK_SIZE = 500
+
+
+class LastSeenTracker:
+    """Coalesces last-seen updates in memory and writes them in batches"""
+
+    def __init__(self, flush_interval=60):
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def touch(self, user_id, engine=None):
+        """Record activity; flushes through engine when the interval is up"""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            self._pending[user_id] = now
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due and engine is not None:
+            self.flush(engine)
+
+    def pending(self):
+        with self._lock:
+            return set(self._pending)
+
+    def flush(self, engine):
+        """Write pending timestamps with one UPDATE; returns the number of users"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        statement = db.update(User.__table__).where(
+            User.__table__.c.id == db.bindparam('user_id')
+        ).values(last_seen=db.bindparam('seen'))
+        with engine.begin() as conn:
+            conn.execute(statement, [{'user_id': user_id, 'seen': seen}
+                                     for user_id, seen in pending.items()])
+        return len(pending)
+
+
+def reap_guests(ttl, chunk_size=DEFAULT_CHUNK_SIZE, pause=0, now=None, exclude=(),
+                on_deleted=None):
+    """
+    Delete guests not seen within ttl (a timedelta), with their goals.
+
+    Guests whose ids are in exclude (e.g. seen but not flushed yet) are
+    kept. Commits after every chunk of at most chunk_size guests, sleeping
+    pause seconds in between, and calls on_deleted(rows) with each chunk's
+    (id, guest_token) rows. Returns the number of guests deleted.
+    """
+    cutoff = (now or datetime.now(timezone.utc)) - ttl
+    expired = db.select(User.id, User.guest_token).where(
+        User.is_guest.is_(True), User.last_seen < cutoff
+    ).order_by(User.last_seen)
+    if exclude:
+        expired = expired.where(User.id.not_in(exclude))
+
+    deleted = 0
+    while True:
+        rows = db.session.execute(expired.limit(chunk_size)).all()
+        if rows:
+            ids = [row.id for row in rows]
+            # Foreign keys may not be enforced (legacy storage profile), so
+            # dependent rows are deleted explicitly
+            for model in (GoalTombstone, GoalCompletionDay, GoalStats, RecurringGoal, Goal):
+                db.session.execute(db.delete(model).where(model.user_id.in_(ids)),
+                                   execution_options={'synchronize_session': False})
+            db.session.execute(db.delete(User).where(User.id.in_(ids)),
+                               execution_options={'synchronize_session': False})
+        db.session.commit()
+        deleted += len(rows)
+        if rows and on_deleted is not None:
+            on_deleted(rows)
+        if len(rows) < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+class GuestReaper:
+    """Daemon thread that flushes last-seen times and reaps guests every interval"""
+
+    def __init__(self, app, tracker, interval, ttl, chunk_size=DEFAULT_CHUNK_SIZE, pause=0.05,
+                 on_deleted=None):
+        self.app = app
+        self.tracker = tracker
+        self.interval = interval
+        self.ttl = ttl
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.on_deleted = on_deleted
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='guest-reaper', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def run_once(self):
+        with self.app.app_context():
+            self.tracker.flush(db.engine)
+            return reap_guests(self.ttl, self.chunk_size, self.pause,
+                               exclude=self.tracker.pending(), on_deleted=self.on_deleted)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:
+                self.app.logger.exception("Guest reaper pass failed")
@@ -0,0 +1,90 @@
+"""
+Password hashing on a bounded worker pool.
+
+bcrypt is deliberately slow. Running it on the request thread means a burst
+of /login or /register calls takes every CPU the worker has, and goal
+requests queue behind it. PasswordHasher runs bcrypt on a small, fixed
+pool of threads (bcrypt releases the GIL while hashing) and caps how many
+hashes may wait for it. When the queue is full, HasherBusy is raised and
+the app answers 503 instead of piling up more work.
+
+Functions added to `listeners` are called as listener(operation, seconds)
+on the calling thread after each hash or check, with the time bcrypt
+itself took (excluding time spent waiting for a worker).
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import bcrypt
+
+DEFAULT_ROUNDS = 12
+
+listeners = []
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    return func(*args), time.perf_counter() - start
+
+
+class PasswordHasher:
+    def __init__(self, rounds=DEFAULT_ROUNDS, workers=2, queue_size=16):
+        """workers=0 hashes inline on the calling thread, with no queue"""
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = None
+        if workers:
+            self._executor = ThreadPoolExecutor(max_workers=workers,
+                                                thread_name_prefix='bcrypt')
+            self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def _run(self, func, *args):
+        if self._executor is None:
+            result, elapsed = _timed(func, *args)
+        else:
+            if not self._slots.acquire(blocking=False):
+                raise HasherBusy()
+            try:
+                future = self._executor.submit(_timed, func, *args)
+            except BaseException:
+                self._slots.release()
+                raise
+            future.add_done_callback(lambda _: self._slots.release())
+            result, elapsed = future.result()
+        for listener in listeners:
+            listener(func.__name__, elapsed)
+        return result
+
+    def hash(self, password):
+        salt = bcrypt.gensalt(self.rounds)
+        return self._run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+    def check(self, password, password_hash):
+        return self._run(bcrypt.checkpw, password.encode('utf-8'),
+                         password_hash.encode('utf-8'))
+
+    def needs_rehash(self, password_hash):
+        """True if password_hash was made with a different work factor"""
+        # $2b$12$<salt+hash>
+        return int(password_hash.split('$')[2]) != self.rounds
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+hasher = PasswordHasher()
+
+
+def configure(rounds=DEFAULT_ROUNDS, workers=2, queue_size=16):
+    """Replace the shared hasher used by User.set_password/check_password"""
+    global hasher
+    previous, hasher = hasher, PasswordHasher(rounds, workers, queue_size)
+    previous.shutdown()
+    return hasher
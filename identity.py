@@ -0,0 +1,119 @@
+"""
+Cached user identities.
+
+Resolving who a request belongs to used to cost a query on every API call:
+the guest token lookup in get_current_user_id and User.query.get in the
+Flask-Login user loader. IdentityCache keeps a lightweight, read-only
+snapshot of the user keyed by guest token and by user id. Routes that
+modify a user load the ORM object explicitly and invalidate the entry.
+
+Entries are per process; the TTL bounds how long another worker can serve
+a stale profile after an update.
+"""
+from datetime import datetime
+
+from flask_login import UserMixin
+
+from cache import TTLCache
+
+
+class Identity(UserMixin):
+    """Read-only snapshot of a User row, usable as Flask-Login's current_user"""
+
+    def __init__(self, id, username, display_name, timezone, is_guest,
+                 guest_token, created_at):
+        self.id = id
+        self.username = username
+        self.display_name = display_name
+        self.timezone = timezone
+        self.is_guest = is_guest
+        self.guest_token = guest_token
+        self.created_at = created_at
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.display_name, user.timezone,
+                   user.is_guest, user.guest_token, user.created_at)
+
+    def snapshot(self):
+        """JSON-safe copy for a server-side session (see sessions.py)"""
+        return {
+            'id': self.id,
+            'username': self.username,
+            'display_name': self.display_name,
+            'timezone': self.timezone,
+            'is_guest': self.is_guest,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+        }
+
+    @classmethod
+    def from_snapshot(cls, data):
+        created_at = data['created_at']
+        return cls(data['id'], data['username'], data['display_name'], data['timezone'],
+                   data['is_guest'], None,
+                   datetime.fromisoformat(created_at) if created_at else None)
+
+    def to_dict(self, include_sensitive=False):
+        # Same shape as User.to_dict
+        data = {
+            'id': self.id,
+            'username': self.username,
+            'display_name': self.display_name or self.username,
+            'timezone': self.timezone,
+            'is_guest': self.is_guest,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+        if include_sensitive and self.is_guest:
+            data['guest_token'] = self.guest_token
+        return data
+
+
+class IdentityCache:
+    """Identities by user id and by guest token, each an LRU with a TTL"""
+
+    def __init__(self, maxsize=4096, ttl=60):
+        self.by_id = TTLCache(maxsize, ttl)
+        self.by_guest_token = TTLCache(maxsize, ttl)
+
+    def get_user(self, user_id, loader):
+        """Identity for user_id, calling loader(user_id) -> User on a miss"""
+        identity = self.by_id.get(user_id)
+        if identity is None:
+            user = loader(user_id)
+            if user is None:
+                return None
+            identity = self.remember(user)
+        return identity
+
+    def get_guest(self, guest_token, loader):
+        """Identity for a guest token, calling loader(guest_token) -> User on a miss"""
+        identity = self.by_guest_token.get(guest_token)
+        if identity is None:
+            user = loader(guest_token)
+            if user is None:
+                return None
+            identity = self.remember(user)
+        return identity
+
+    def remember(self, user):
+        identity = Identity.from_user(user)
+        self.by_id.set(identity.id, identity)
+        if identity.is_guest and identity.guest_token:
+            self.by_guest_token.set(identity.guest_token, identity)
+        return identity
+
+    def invalidate(self, user_id=None, guest_token=None):
+        identity = self.by_id.pop(user_id) if user_id is not None else None
+        if identity is not None and identity.guest_token:
+            self.by_guest_token.pop(identity.guest_token)
+        if guest_token is not None:
+            identity = self.by_guest_token.pop(guest_token)
+            if identity is not None:
+                self.by_id.pop(identity.id)
+
+    def clear(self):
+        self.by_id.clear()
+        self.by_guest_token.clear()
+
+    def stats(self):
+        return {'by_id': self.by_id.stats(), 'by_guest_token': self.by_guest_token.stats()}
@@ -0,0 +1,260 @@
+"""
+Request metrics and slow-request profiling.
+
+Opt-in instrumentation (METRICS_ENABLED=1) that records, per route:
+
+  - request latency histograms,
+  - SQL statements and SQL time per request, from SQLAlchemy cursor events,
+  - bcrypt time, from hashing.listeners,
+  - hits, misses and entries of in-process caches such as the identity
+    cache, read from their stats() at scrape time,
+
+and serves them on /metrics in the Prometheus text format. Routes are
+labelled by URL rule (/api/goals/<int:goal_id>), never by raw path, so
+the number of series stays bounded.
+
+With PROFILE_SAMPLE_RATE > 0, that fraction of requests runs under
+cProfile; profiles of sampled requests slower than PROFILE_SLOW_MS are
+written to PROFILE_DIR as .prof files (pstats format, viewable with
+snakeviz or convertible to a flamegraph with flameprof).
+"""
+from collections import defaultdict
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+
+import hashing
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BCRYPT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with one series per label tuple"""
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values, value):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, list(counts), total, count)
+                            for labels, (counts, total, count) in self._series.items())
+        for label_values, counts, total, count in series:
+            labels = _labels(zip(self.labels, label_values))
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total:.6f}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter with one series per label tuple"""
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.append(f'{self.name}{{{_labels(zip(self.labels, label_values))}}} {value:g}')
+        return lines
+
+
+class CacheStats:
+    """Hits, misses and size of TTLCaches, read from cache.stats() on each scrape"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.caches = {}  # label -> TTLCache
+
+    def watch(self, name, cache):
+        self.caches[name] = cache
+
+    def clear(self):
+        # The caches own their counters; clearing the metrics leaves them alone
+        pass
+
+    def exposition(self):
+        stats = sorted((name, cache.stats()) for name, cache in self.caches.items())
+        lines = []
+        for key, kind, help in (('hits', 'counter', 'Cache lookups answered from the cache'),
+                                ('misses', 'counter', 'Cache lookups that found no live entry'),
+                                ('size', 'gauge', 'Entries held by the cache')):
+            name = f'{self.prefix}_{key}_total' if kind == 'counter' else f'{self.prefix}_{key}'
+            lines += [f'# HELP {name} {help}', f'# TYPE {name} {kind}']
+            lines += [f'{name}{{{_labels([("cache", cache)])}}} {values[key]}' for cache, values in stats]
+        return lines
+
+
+def _labels(pairs):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """Flask extension; metrics.init_app(app) switches instrumentation on"""
+
+    def __init__(self):
+        self.request_duration = Histogram(
+            'goals_request_duration_seconds', 'Request latency by route',
+            ('route', 'method', 'status'), LATENCY_BUCKETS)
+        self.request_queries = Histogram(
+            'goals_request_sql_queries', 'SQL statements issued per request',
+            ('route', 'method'), QUERY_COUNT_BUCKETS)
+        self.sql_queries = Counter(
+            'goals_sql_queries_total', 'SQL statements issued by requests', ('route', 'method'))
+        self.sql_seconds = Counter(
+            'goals_sql_seconds_total', 'Time spent executing SQL in requests', ('route', 'method'))
+        self.bcrypt_duration = Histogram(
+            'goals_bcrypt_duration_seconds', 'bcrypt time by operation',
+            ('operation',), BCRYPT_BUCKETS)
+        self.slow_profiles = Counter(
+            'goals_slow_request_profiles_total', 'Profiles written for slow requests', ('route',))
+        self.caches = CacheStats('goals_cache')
+        self._all = (self.request_duration, self.request_queries, self.sql_queries,
+                     self.sql_seconds, self.bcrypt_duration, self.slow_profiles, self.caches)
+
+    def init_app(self, app, *engines, caches=None):
+        app.config.setdefault('PROFILE_SAMPLE_RATE', 0.0)
+        app.config.setdefault('PROFILE_SLOW_MS', 500)
+        app.config.setdefault('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+        self.app_config = app.config
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/metrics', 'metrics', self.exposition_response)
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        for name, cache in (caches or {}).items():
+            self.caches.watch(name, cache)
+        if self._observe_bcrypt not in hashing.listeners:
+            hashing.listeners.append(self._observe_bcrypt)
+        app.extensions['metrics'] = self
+
+    def clear(self):
+        for metric in self._all:
+            metric.clear()
+
+    # Request hooks
+
+    def _before_request(self):
+        g.metrics_queries = 0
+        g.metrics_sql_seconds = 0.0
+        g.metrics_profiler = None
+        rate = self.app_config['PROFILE_SAMPLE_RATE']
+        if rate and random.random() < rate:
+            g.metrics_profiler = cProfile.Profile()
+            g.metrics_profiler.enable()
+        g.metrics_start = time.perf_counter()
+
+    def _after_request(self, response):
+        if 'metrics_start' not in g:
+            return response
+        elapsed = time.perf_counter() - g.pop('metrics_start')
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        method = request.method
+        self.request_duration.observe((route, method, str(response.status_code)), elapsed)
+        self.request_queries.observe((route, method), g.metrics_queries)
+        self.sql_queries.inc((route, method), g.metrics_queries)
+        self.sql_seconds.inc((route, method), g.metrics_sql_seconds)
+
+        profiler = g.pop('metrics_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            if elapsed * 1000 >= self.app_config['PROFILE_SLOW_MS']:
+                self._dump_profile(profiler, route, method, elapsed)
+        return response
+
+    def _teardown_request(self, error):
+        # A request that failed before after_request ran must not leave
+        # the profiler attached to this thread
+        profiler = g.pop('metrics_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+
+    def _dump_profile(self, profiler, route, method, elapsed):
+        directory = self.app_config['PROFILE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+        name = f'{time.strftime("%Y%m%dT%H%M%S")}-{method}-{slug}-{round(elapsed * 1000)}ms.prof'
+        profiler.dump_stats(os.path.join(directory, name))
+        self.slow_profiles.inc((route,))
+
+    # SQLAlchemy and bcrypt hooks
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_query_start'].pop()
+        if has_request_context() and 'metrics_start' in g:
+            g.metrics_queries += 1
+            g.metrics_sql_seconds += elapsed
+
+    def _observe_bcrypt(self, operation, seconds):
+        self.bcrypt_duration.observe(({'hashpw': 'hash', 'checkpw': 'check'}.get(operation, operation),),
+                                     seconds)
+
+    # Exposition
+
+    def exposition(self):
+        lines = []
+        for metric in self._all:
+            lines.extend(metric.exposition())
+        return '\n'.join(lines) + '\n'
+
+    def exposition_response(self):
+        return Response(self.exposition(), mimetype='text/plain; version=0.0.4')
+
+
+metrics = Metrics()
@@ -0,0 +1,140 @@
+"""
+Schema migrations for the goals database.
+
+db.create_all() only creates tables that are missing; it never adds an
+index or a column to a table that already exists, so databases created
+before a schema change would silently miss it. Each migration below runs
+exactly once, in order, and the number of applied migrations is recorded
+in the schema_version table.
+"""
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateColumn
+
+from models import db
+import search
+import stats
+
+MIGRATIONS = []
+
+# Part of the model metadata so db.drop_all() resets it along with the
+# tables it describes.
+schema_version = db.Table(
+    'schema_version',
+    db.Column('version', db.Integer, nullable=False),
+)
+
+
+def migration(func):
+    """Register a migration; the registration order is the apply order"""
+    MIGRATIONS.append(func)
+    return func
+
+
+def _add_column(conn, table_name, column_name):
+    """Add a column declared on a model, unless it already exists"""
+    table = db.metadata.tables[table_name]
+    existing = {column['name'] for column in inspect(conn).get_columns(table_name)}
+    if column_name in existing:
+        return
+    preparer = conn.dialect.identifier_preparer
+    column_ddl = CreateColumn(table.c[column_name]).compile(dialect=conn.dialect)
+    conn.exec_driver_sql(f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {column_ddl}')
+
+
+def _create_index(conn, table_name, index_name):
+    """Create an index declared on a model, unless it already exists"""
+    table = db.metadata.tables[table_name]
+    index = next(index for index in table.indexes if index.name == index_name)
+    index.create(conn, checkfirst=True)
+
+
+@migration
+def add_goal_lookup_indexes(conn):
+    """Composite index backing every per-user goal query"""
+    _create_index(conn, 'goal', 'ix_goal_user_type_done_completed')
+
+
+@migration
+def add_goal_retention_index(conn):
+    """Index for retention purges that run across all users"""
+    _create_index(conn, 'goal', 'ix_goal_type_done_completed')
+
+
+@migration
+def add_goal_pagination_indexes(conn):
+    """Indexes that return a user's goals in id order for keyset pagination"""
+    _create_index(conn, 'goal', 'ix_goal_user_id')
+    _create_index(conn, 'goal', 'ix_goal_user_type_id')
+
+
+@migration
+def add_goal_revisions(conn):
+    """Per-user revision counter and per-goal revision for incremental sync"""
+    _add_column(conn, 'user', 'goal_revision')
+    _add_column(conn, 'goal', 'revision')
+    _create_index(conn, 'goal', 'ix_goal_user_revision')
+
+
+@migration
+def backfill_goal_stats(conn):
+    """Fill the goal_stats and goal_completion_day aggregates from existing goals"""
+    stats.rebuild(conn)
+
+
+@migration
+def add_user_last_seen(conn):
+    """Last-seen time for expiring inactive guests; existing users start at created_at"""
+    _add_column(conn, 'user', 'last_seen')
+    users = db.metadata.tables['user']
+    conn.execute(users.update().where(users.c.last_seen.is_(None))
+                 .values(last_seen=users.c.created_at))
+    _create_index(conn, 'user', 'ix_user_guest_last_seen')
+
+
+@migration
+def add_goal_search(conn):
+    """Full-text index over goal text, kept in sync by triggers"""
+    search.rebuild(conn)
+
+
+@migration
+def add_user_next_rollover(conn):
+    """When the user's earliest recurring goal starts a new period"""
+    _add_column(conn, 'user', 'next_rollover')
+
+
+@migration
+def add_tombstone_retention(conn):
+    """Purged tombstone high-water mark per user, and the index purges use"""
+    _add_column(conn, 'user', 'tombstone_floor')
+    _create_index(conn, 'goal_tombstone', 'ix_goal_tombstone_deleted_at')
+
+
+@migration
+def add_purged_goal_stats(conn):
+    """Counts of purged goals kept in the aggregates, so rebuild() keeps them"""
+    _add_column(conn, 'goal_stats', 'purged')
+    _add_column(conn, 'goal_completion_day', 'purged')
+
+
+def current_version(conn):
+    version = conn.execute(db.select(schema_version.c.version)).scalar()
+    if version is None:
+        conn.execute(schema_version.insert().values(version=0))
+        version = 0
+    return version
+
+
+def upgrade(engine=None):
+    """Create missing tables and apply pending migrations; returns the number applied"""
+    engine = engine or db.engine
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        version = current_version(conn)
+        pending = MIGRATIONS[version:]
+        for func in pending:
+            func(conn)
+        if pending:
+            conn.execute(schema_version.update().values(version=len(MIGRATIONS)))
+    return len(pending)
+
@@ -0,0 +1,213 @@
+from flask_sqlalchemy import SQLAlchemy
+from flask_login import UserMixin
+from datetime import datetime, timezone
+import uuid
+
+import hashing
+from replicas import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# User model
+class User(UserMixin, db.Model):
+    __table_args__ = (
+        # Guest expiry: inactive guests, oldest first
+        db.Index('ix_user_guest_last_seen', 'is_guest', 'last_seen'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=True)  # Optional for now
+    password_hash = db.Column(db.String(128), nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    is_guest = db.Column(db.Boolean, default=False)
+    guest_token = db.Column(db.String(36), unique=True, nullable=True)  # For guest sessions
+
+    # Profile fields (basic with room for expansion)
+    display_name = db.Column(db.String(100), nullable=True)
+    timezone = db.Column(db.String(50), default='UTC')
+
+    # Bumped on every change to this user's goals (see revisions.py)
+    goal_revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Last request from a guest, written in batches (see guests.py)
+    last_seen = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    # Earliest next_rollover of the user's recurring goals (see recurring.py)
+    next_rollover = db.Column(db.DateTime, nullable=True)
+
+    # Highest revision whose tombstones may have been purged (see revisions.py)
+    tombstone_floor = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Relationships
+    goals = db.relationship('Goal', backref='user', lazy=True, cascade='all, delete-orphan')
+
+    def set_password(self, password):
+        """Hash and set password"""
+        self.password_hash = hashing.hasher.hash(password)
+
+    def check_password(self, password):
+        """Check if provided password matches hash"""
+        return hashing.hasher.check(password, self.password_hash)
+
+    def password_needs_rehash(self):
+        """True if the stored hash uses a different bcrypt cost than configured"""
+        return hashing.hasher.needs_rehash(self.password_hash)
+
+    @staticmethod
+    def new_guest_token():
+        return str(uuid.uuid4())
+
+    @classmethod
+    def create_guest(cls, guest_token=None):
+        """Create a guest user with a unique token"""
+        guest_token = guest_token or cls.new_guest_token()
+        guest_user = cls(
+            username=f'guest_{guest_token[:8]}',
+            password_hash='',  # Guests don't have passwords
+            is_guest=True,
+            guest_token=guest_token
+        )
+        return guest_user
+
+    def to_dict(self, include_sensitive=False):
+        data = {
+            'id': self.id,
+            'username': self.username,
+            'display_name': self.display_name or self.username,
+            'timezone': self.timezone,
+            'is_guest': self.is_guest,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+        if include_sensitive and self.is_guest:
+            data['guest_token'] = self.guest_token
+        return data
+
+# Goal model
+class Goal(db.Model):
+    # Every route filters by user_id first; the trailing columns let
+    # get_goals (user_id, goal_type) and cleanup_old_goals
+    # (user_id, goal_type, done, completed) resolve from the same index.
+    # The second index serves retention purges that run across all users.
+    # The last two keep each user's goals (optionally of one type) in id
+    # order, so keyset pages on /api/goals read only the rows they return.
+    __table_args__ = (
+        db.Index('ix_goal_user_type_done_completed', 'user_id', 'goal_type', 'done', 'completed'),
+        db.Index('ix_goal_type_done_completed', 'goal_type', 'done', 'completed'),
+        db.Index('ix_goal_user_id', 'user_id', 'id'),
+        db.Index('ix_goal_user_type_id', 'user_id', 'goal_type', 'id'),
+        db.Index('ix_goal_user_revision', 'user_id', 'revision'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    text = db.Column(db.String(500), nullable=False)
+    goal_type = db.Column(db.String(20), nullable=False)  # daily, weekly, monthly, yearly
+    done = db.Column(db.Boolean, default=False)
+    created = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    completed = db.Column(db.DateTime, nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # The owner's goal_revision when this goal last changed
+    revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'text': self.text,
+            'goal_type': self.goal_type,
+            'done': self.done,
+            'created': self.created.isoformat() if self.created else None,
+            'completed': self.completed.isoformat() if self.completed else None,
+            'user_id': self.user_id
+        }
+
+# Recurring goal: its instance goal is reused every period (recurring.py)
+class RecurringGoal(db.Model):
+    __tablename__ = 'recurring_goal'
+    __table_args__ = (
+        # Templates due for a new period, checked on every goal listing
+        db.Index('ix_recurring_goal_user_rollover', 'user_id', 'next_rollover'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    goal_id = db.Column(db.Integer, db.ForeignKey('goal.id', ondelete='CASCADE'),
+                        nullable=False, unique=True)
+    period = db.Column(db.String(20), nullable=False)  # daily, weekly, monthly, yearly
+    first_period = db.Column(db.Date, nullable=False)  # local start day of period 0
+    current_period = db.Column(db.Integer, nullable=False)  # period the instance stands for
+    next_rollover = db.Column(db.DateTime, nullable=False)  # UTC end of current_period
+    history = db.Column(db.LargeBinary, nullable=False, default=b'')  # bit i: period i done
+
+# Deleted goal marker, so /api/goals/changes can report deletions
+class GoalTombstone(db.Model):
+    __tablename__ = 'goal_tombstone'
+    __table_args__ = (
+        db.Index('ix_goal_tombstone_user_revision', 'user_id', 'revision'),
+        # Purging tombstones past their retention window
+        db.Index('ix_goal_tombstone_deleted_at', 'deleted_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    goal_id = db.Column(db.Integer, nullable=False)
+    revision = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+# Running per-user totals by goal type, kept up to date by stats.py
+class GoalStats(db.Model):
+    __tablename__ = 'goal_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    goal_type = db.Column(db.String(20), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    done = db.Column(db.Integer, nullable=False, default=0)
+    # Of those, completed goals deleted by retention purges
+    purged = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+# Goals completed per user, local calendar day and goal type (stats.py)
+class GoalCompletionDay(db.Model):
+    __tablename__ = 'goal_completion_day'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    goal_type = db.Column(db.String(20), primary_key=True)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    purged = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+# Server-side session data for SESSION_STORE=table (sessions.py)
+class UserSession(db.Model):
+    __tablename__ = 'user_session'
+    __table_args__ = (
+        # Ending every session of a user, and purging expired sessions
+        db.Index('ix_user_session_user_id', 'user_id'),
+        db.Index('ix_user_session_expires', 'expires'),
+    )
+
+    sid = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=True)
+    data = db.Column(db.Text, nullable=False)
+    expires = db.Column(db.DateTime, nullable=False)
+
+# Goal change events relayed between workers for EVENT_BROKER=table (events.py)
+class GoalEvent(db.Model):
+    __tablename__ = 'goal_event'
+    __table_args__ = (
+        db.Index('ix_goal_event_created_at', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+# Token buckets shared by every worker for RATE_LIMIT_STORE=table (ratelimit.py)
+class RateLimitBucket(db.Model):
+    __tablename__ = 'rate_limit_bucket'
+    __table_args__ = (
+        db.Index('ix_rate_limit_bucket_full_at', 'full_at'),
+    )
+
+    key = db.Column(db.String(255), primary_key=True)
+    tokens = db.Column(db.Float, nullable=False)
+    updated = db.Column(db.Float, nullable=False)  # Unix time of the last take
+    full_at = db.Column(db.Float, nullable=False)  # when the bucket is full again
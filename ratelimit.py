@@ -0,0 +1,187 @@
+"""
+Rate limiting for the requests that cost the most.
+
+A cookieless client makes ensure_user() insert a guest row, and /login and
+/register run bcrypt. A crawler or a credential-stuffing burst can keep
+the SQLite writer and every CPU busy that way, and goal traffic then
+queues behind it. Each of those paths calls check() with a named rule
+first, and a client over its limit gets 429 with Retry-After before any
+work is done. Requests of existing users never reach the limiter.
+
+Rules are token buckets. "login=10/minute" lets a client make 10 logins at
+once and then one every 6 seconds. RATE_LIMITS sets every rule:
+
+  login           /login, per client IP
+  login_username  /login, per username, whichever IP the attempts come from
+  register        /register and /api/user/convert-guest, per client IP
+  guest           guest users created by a first write, per client IP
+
+A rule left out of RATE_LIMITS is not limited; RATE_LIMITS="" turns rate
+limiting off. Buckets live in a store with take(key, limit); RATE_LIMIT_STORE
+picks one of:
+
+  memory  MemoryStore, per process: a client gets the limit once per worker
+  table   TableStore, in the rate_limit_bucket table, shared by every worker.
+          It stands in for a shared store such as Redis.
+
+Client IPs are request.remote_addr; behind a reverse proxy, set
+TRUSTED_PROXIES so it comes from X-Forwarded-For.
+"""
+from collections import OrderedDict, namedtuple
+import math
+import threading
+import time
+
+from flask import current_app, request
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, RateLimitBucket
+
+STORES = ('memory', 'table')
+DEFAULT_LIMITS = 'login=10/minute,login_username=5/minute,register=5/minute,guest=20/minute'
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+class Limit(namedtuple('Limit', ['capacity', 'rate'])):
+    """A bucket of capacity tokens, refilled at rate tokens per second"""
+
+    @classmethod
+    def parse(cls, value):
+        """Parse "10/minute" (10 at once, then 10 a minute)"""
+        count, _, period = value.partition('/')
+        if period.strip() not in PERIODS or int(count) < 1:
+            raise ValueError(f'Invalid rate limit {value!r}; use e.g. 10/minute')
+        return cls(int(count), int(count) / PERIODS[period.strip()])
+
+
+def parse_limits(value):
+    """Parse "login=10/minute,register=5/hour" into {'login': Limit(...), ...}"""
+    limits = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        name, _, limit = item.partition('=')
+        limits[name.strip()] = Limit.parse(limit)
+    return limits
+
+
+class RateLimited(Exception):
+    """Raised by check() when the client must wait retry_after seconds"""
+
+    def __init__(self, rule, retry_after):
+        super().__init__(rule, retry_after)
+        self.rule = rule
+        self.retry_after = retry_after
+
+
+class MemoryStore:
+    """Buckets in an LRU dict; only for a single worker process"""
+
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key, limit, now=None):
+        """Take a token from key's bucket; returns 0, or the seconds until one is available"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = limit.capacity
+            else:
+                tokens = min(limit.capacity, bucket[0] + (now - bucket[1]) * limit.rate)
+                self._buckets.move_to_end(key)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / limit.rate
+            # Evicting the least recently used bucket forgets at most a
+            # few tokens of debt from a client that has gone quiet
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class TableStore:
+    """Buckets in the rate_limit_bucket table of the primary database"""
+
+    table = RateLimitBucket.__table__
+
+    def take(self, key, limit, now=None):
+        """Take a token from key's bucket; returns 0, or the seconds until one is available"""
+        now = time.time() if now is None else now
+        key = key[:self.table.c.key.type.length]
+        c = self.table.c
+        # One atomic upsert: refill, then take a token only if one is there
+        refilled = db.case((c.tokens + (now - c.updated) * limit.rate >= limit.capacity, limit.capacity),
+                           else_=c.tokens + (now - c.updated) * limit.rate)
+        with db.engine.begin() as conn:
+            insert = postgresql.insert if conn.dialect.name == 'postgresql' else sqlite.insert
+            statement = insert(self.table).values(
+                key=key, tokens=limit.capacity - 1, updated=now,
+                full_at=now + 1 / limit.rate)
+            statement = statement.on_conflict_do_update(
+                index_elements=['key'],
+                set_={'tokens': refilled - 1, 'updated': now,
+                      'full_at': now + (limit.capacity - refilled + 1) / limit.rate},
+                where=refilled >= 1,
+            ).returning(c.tokens)
+            if conn.execute(statement).first() is not None:
+                return 0.0
+            tokens = conn.execute(db.select(refilled).where(c.key == key)).scalar()
+        return (1 - tokens) / limit.rate
+
+    def clear(self):
+        with db.engine.begin() as conn:
+            conn.execute(self.table.delete())
+
+    def purge_expired(self, now=None):
+        """Delete buckets that have refilled; they are the same as no bucket"""
+        with db.engine.begin() as conn:
+            return conn.execute(self.table.delete().where(
+                self.table.c.full_at <= (time.time() if now is None else now))).rowcount
+
+
+def init_app(app):
+    """The store named by RATE_LIMIT_STORE as app.extensions['rate_limit_store']"""
+    name = app.config['RATE_LIMIT_STORE']
+    if name not in STORES:
+        raise ValueError(f"RATE_LIMIT_STORE must be one of {', '.join(STORES)}, not {name!r}")
+    store = MemoryStore() if name == 'memory' else TableStore()
+    app.extensions['rate_limit_store'] = store
+    return store
+
+
+def reset(app):
+    """Empty every bucket of app's store, as after a restart"""
+    with app.app_context():
+        app.extensions['rate_limit_store'].clear()
+
+
+def client_ip():
+    return request.remote_addr or 'unknown'
+
+
+def check(rule, key):
+    """Charge key one request under rule; raises RateLimited when it is over the limit"""
+    limit = current_app.config['RATE_LIMITS'].get(rule)
+    if limit is None:
+        return
+    wait = current_app.extensions['rate_limit_store'].take(f'{rule}:{key}', limit)
+    if wait:
+        raise RateLimited(rule, wait)
+
+
+def retry_after(error):
+    """Retry-After header value: whole seconds, at least 1"""
+    return str(max(1, math.ceil(error.retry_after)))
@@ -0,0 +1,213 @@
+"""
+Recurring goals.
+
+A recurring goal is one row in recurring_goal plus one goal row, its
+instance, which is reused period after period instead of re-created. The
+period (daily, weekly, monthly or yearly) is counted in the owner's
+timezone (User.timezone); weeks start on Monday.
+
+Nothing runs at midnight. Each template stores next_rollover, the UTC
+moment its current period ends, and the first read of the user's goals
+after that moment rolls it over: if the instance was done, the period is
+recorded in the template's history, and the instance is reset to not
+done for the current period. user.next_rollover holds the earliest of
+them, so the goal listing learns whether anything is due from the user
+row it reads for the revision anyway, without another query.
+
+History is a bitmap, one bit per period since the template's first
+period (bit i of byte i // 8), so ten years of a daily goal take under
+500 bytes instead of 3,650 goal rows. The current period is recorded
+when it ends; completed_periods() reports it from the instance until then.
+
+Deleting the instance goal ends the recurrence: forget() deletes the
+template with it (so does the foreign key, where it is enforced) and
+moves user.next_rollover on to the remaining templates.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+
+from models import db, User, Goal, RecurringGoal
+import revisions
+import stats
+
+PERIODS = ('daily', 'weekly', 'monthly', 'yearly')
+
+
+def period_start(day, period):
+    """First local day of the period containing day"""
+    if period == 'daily':
+        return day
+    if period == 'weekly':
+        return day - timedelta(days=day.weekday())
+    if period == 'monthly':
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+
+def period_index(first, day, period):
+    """Number of periods between the period starting on first and the one containing day"""
+    day = period_start(day, period)
+    if period in ('daily', 'weekly'):
+        return (day - first).days // (1 if period == 'daily' else 7)
+    if period == 'monthly':
+        return (day.year - first.year) * 12 + day.month - first.month
+    return day.year - first.year
+
+
+def nth_period_start(first, index, period):
+    """First local day of period number index, counting from the period starting on first"""
+    if period in ('daily', 'weekly'):
+        return first + timedelta(days=index * (1 if period == 'daily' else 7))
+    if period == 'monthly':
+        months = first.month - 1 + index
+        return date(first.year + months // 12, months % 12 + 1, 1)
+    return date(first.year + index, 1, 1)
+
+
+def period_end(first, index, period, zone):
+    """UTC moment period number index ends (local midnight of the next period)"""
+    local = datetime.combine(nth_period_start(first, index + 1, period), time(), tzinfo=zone)
+    return local.astimezone(timezone.utc)
+
+
+def set_bit(history, index):
+    history = bytearray(history or b'')
+    if len(history) <= index // 8:
+        history.extend(bytes(index // 8 + 1 - len(history)))
+    history[index // 8] |= 1 << (index % 8)
+    return bytes(history)
+
+
+def bits(history):
+    """Indexes of the set bits, in order"""
+    return [byte_index * 8 + bit for byte_index, byte in enumerate(history or b'')
+            for bit in range(8) if byte >> bit & 1]
+
+
+def completed_periods(template, done):
+    """Start days of every completed period; done is the instance's current state"""
+    indexes = bits(template.history)
+    if done and template.current_period not in indexes:
+        indexes.append(template.current_period)
+    return [nth_period_start(template.first_period, index, template.period) for index in indexes]
+
+
+def to_dict(template, goal):
+    return {
+        'id': template.id,
+        'period': template.period,
+        'period_start': nth_period_start(
+            template.first_period, template.current_period, template.period).isoformat(),
+        'goal': goal.to_dict(),
+        'completed': [day.isoformat() for day in completed_periods(template, goal.done)],
+    }
+
+
+def create(user_id, text, period, zone, revision, now=None):
+    """Add a template and its instance for the current period; returns (template, goal)"""
+    now = now or datetime.now(timezone.utc)
+    first = period_start(stats.local_day(now, zone), period)
+    goal = Goal(text=text, goal_type=period, user_id=user_id, revision=revision)
+    db.session.add(goal)
+    db.session.flush()
+    template = RecurringGoal(user_id=user_id, goal_id=goal.id, period=period,
+                             first_period=first, current_period=0,
+                             next_rollover=period_end(first, 0, period, zone), history=b'')
+    db.session.add(template)
+    db.session.flush()
+    update_next_rollover(user_id)
+    return template, goal
+
+
+def update_next_rollover(user_id):
+    """Set user.next_rollover to the earliest next_rollover of the user's templates"""
+    db.session.execute(
+        db.update(User).where(User.id == user_id).values(next_rollover=db.select(
+            db.func.min(RecurringGoal.next_rollover)).filter_by(user_id=user_id).scalar_subquery()),
+        execution_options={'synchronize_session': False},
+    )
+
+
+def is_due(next_rollover, now=None):
+    """True if a user.next_rollover value has passed"""
+    if next_rollover is None:
+        return False
+    if next_rollover.tzinfo is None:
+        next_rollover = next_rollover.replace(tzinfo=timezone.utc)  # SQLite drops it
+    return next_rollover <= (now or datetime.now(timezone.utc))
+
+
+def due(user_id, now=None):
+    """True if one of user_id's templates has reached the end of its period"""
+    return is_due(db.session.execute(
+        db.select(User.next_rollover).filter_by(id=user_id)).scalar_one_or_none(), now)
+
+
+def roll_over(user_id, zone, now=None):
+    """
+    Start the current period of user_id's due templates.
+
+    Returns the instance goals that were reset. Templates whose instance is
+    gone (a database without foreign key enforcement) are deleted.
+    """
+    now = now or datetime.now(timezone.utc)
+    today = stats.local_day(now, zone)
+    rows = db.session.execute(
+        db.select(RecurringGoal, Goal).outerjoin(Goal, Goal.id == RecurringGoal.goal_id)
+        .filter(RecurringGoal.user_id == user_id, RecurringGoal.next_rollover <= now)
+    ).all()
+    if not rows:
+        # The templates that were due are gone with their goals; clear or
+        # move user.next_rollover so the listing stops checking
+        update_next_rollover(user_id)
+        return []
+    revision = revisions.bump(user_id)
+    delta = stats.StatsDelta(user_id, zone)
+    reset = []
+    for template, goal in rows:
+        if goal is None:
+            db.session.delete(template)
+            continue
+        done_in = None
+        if goal.done:
+            # Usually the period that just ended, unless a client ticked the
+            # goal off after the period ended but before this first read
+            done_in = template.current_period if goal.completed is None else max(0, period_index(
+                template.first_period, stats.local_day(goal.completed, zone), template.period))
+        template.current_period = period_index(template.first_period, today, template.period)
+        template.next_rollover = period_end(
+            template.first_period, template.current_period, template.period, zone)
+        if done_in == template.current_period:
+            continue  # already done for the new period
+        if done_in is not None:
+            template.history = set_bit(template.history, done_in)
+        # The completion stays on the statistics calendar; only the goal's
+        # current state is reset
+        delta.reset(goal.goal_type, goal.done)
+        goal.done = False
+        goal.completed = None
+        goal.revision = revision
+        reset.append(goal)
+    delta.apply()
+    db.session.flush()
+    update_next_rollover(user_id)
+    return reset
+
+
+def forget(user_id, goal_ids):
+    """Delete the templates of goals about to be deleted, and refresh user.next_rollover"""
+    deleted = db.session.execute(
+        db.delete(RecurringGoal).where(RecurringGoal.goal_id.in_(goal_ids)),
+        execution_options={'synchronize_session': False},
+    ).rowcount
+    if deleted:
+        update_next_rollover(user_id)
+
+
+def move(from_user_id, to_user_id):
+    """Hand a user's templates to another user, along with their goals"""
+    db.session.execute(
+        db.update(RecurringGoal).where(RecurringGoal.user_id == from_user_id)
+        .values(user_id=to_user_id),
+        execution_options={'synchronize_session': False},
+    )
+    update_next_rollover(to_user_id)
@@ -0,0 +1,98 @@
+"""
+Read replica routing.
+
+With DATABASE_REPLICA_URL set, init_app creates a second engine for the
+replica and RoutingSession sends SELECTs there while replica reads
+are switched on: for the whole of a route decorated with @replica_reads,
+or inside a `with reading_replica():` block. Everything else, including
+every flush and every UPDATE/DELETE, goes to the primary.
+
+Replicas lag behind the primary, so a client that has just written would
+not see its own change on the next read. After a successful write the
+session is pinned to the primary for REPLICA_LAG_SECONDS; replica reads
+are skipped for that client until the pin runs out.
+"""
+from contextlib import contextmanager
+from functools import wraps
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine
+
+DEFAULT_LAG_SECONDS = 5
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingSession(Session):
+    """db.session class that reads from the replica engine when asked to"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and _replica_reads_on()
+                and (clause is None or getattr(clause, 'is_select', False))):
+            replica = current_app.extensions.get('replica_engine')
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def init_app(app, uri, engine_options):
+    """Create the replica engine and pin writing clients to the primary"""
+    engine = create_engine(uri, **engine_options)
+    app.extensions['replica_engine'] = engine
+    app.after_request(pin_after_write)
+    return engine
+
+
+def _replica_reads_on():
+    return has_request_context() and g.get('replica_reads', False)
+
+
+def pinned_to_primary():
+    return session.get('primary_until', 0) > time.time()
+
+
+@contextmanager
+def reading_replica():
+    """Send the SELECTs in this block to the replica, unless pinned to the primary"""
+    if not has_request_context() or pinned_to_primary():
+        yield
+        return
+    previous = g.get('replica_reads', False)
+    g.replica_reads = True
+    try:
+        yield
+    finally:
+        g.replica_reads = previous
+
+
+@contextmanager
+def reading_primary():
+    """Send the SELECTs in this block to the primary, also inside a replica-read route"""
+    if not has_request_context():
+        yield
+        return
+    previous = g.get('replica_reads', False)
+    g.replica_reads = False
+    try:
+        yield
+    finally:
+        g.replica_reads = previous
+
+
+def replica_reads(view):
+    """Serve a read-only route from the replica, including streamed bodies"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not pinned_to_primary():
+            g.replica_reads = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def pin_after_write(response):
+    """after_request hook: keep a client that just wrote on the primary for a while"""
+    if request.method not in SAFE_METHODS and response.status_code < 400:
+        session['primary_until'] = time.time() + current_app.config['REPLICA_LAG_SECONDS']
+    return response
@@ -0,0 +1,81 @@
+"""
+Retention policies for completed goals.
+
+Each policy removes goals of one goal_type that were completed more than
+max_age ago. Each chunk of at most n expired ids is handled with set-based
+statements (one revision bump for the owners, one tombstone INSERT ... SELECT,
+an upsert of the purged counts in the statistics (see stats.purged), one
+DELETE ... WHERE id IN (...)) and committed on its own, so a large purge
+never holds the SQLite write lock for longer than one chunk takes.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+import time
+
+from models import db, Goal, RecurringGoal
+import revisions
+import stats
+
+RetentionPolicy = namedtuple('RetentionPolicy', ['goal_type', 'max_age'])
+
+# Completed daily goals have always been dropped after a week
+DEFAULT_RETENTION_DAYS = {'daily': 7}
+DEFAULT_CHUNK_SIZE = 500
+
+
+def parse_retention_days(value):
+    """Parse "daily=7,weekly=28" into {'daily': 7, 'weekly': 28}"""
+    days = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        goal_type, _, count = item.partition('=')
+        days[goal_type.strip()] = int(count)
+    return days
+
+
+def policies_from_config(config):
+    """Build the policy list from GOAL_RETENTION_DAYS ({goal_type: days})"""
+    days = config.get('GOAL_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+    return [RetentionPolicy(goal_type, timedelta(days=count))
+            for goal_type, count in days.items()]
+
+
+def purge_expired_goals(policies, user_id=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                        pause=0, now=None):
+    """
+    Delete completed goals older than their policy allows.
+
+    Limits the purge to one user when user_id is given, otherwise runs
+    across all users. Commits after every chunk of at most chunk_size rows
+    and sleeps pause seconds in between. Returns {goal_type: deleted}.
+    """
+    now = now or datetime.now(timezone.utc)
+    deleted = {}
+    for policy in policies:
+        expired = db.select(Goal.id).filter_by(
+            goal_type=policy.goal_type, done=True
+        ).where(Goal.completed < now - policy.max_age,
+                # Recurring goals keep their one goal row (see recurring.py)
+                Goal.id.not_in(db.select(RecurringGoal.goal_id)))
+        if user_id is not None:
+            expired = expired.filter_by(user_id=user_id)
+
+        deleted[policy.goal_type] = 0
+        while True:
+            ids = db.session.scalars(expired.limit(chunk_size)).all()
+            if ids:
+                revisions.bump_many(db.select(Goal.user_id).where(Goal.id.in_(ids)).distinct())
+                revisions.record_deletes(ids)
+                stats.purged(ids)
+                db.session.execute(
+                    db.delete(Goal).where(Goal.id.in_(ids)),
+                    execution_options={'synchronize_session': False},
+                )
+            db.session.commit()
+            deleted[policy.goal_type] += len(ids)
+            if len(ids) < chunk_size:
+                break
+            if pause:
+                time.sleep(pause)
+    return deleted
@@ -0,0 +1,124 @@
+"""
+Per-user goal revisions.
+
+Every change to a user's goals bumps user.goal_revision and stamps the
+changed goals with the new value; deleted goals leave a GoalTombstone
+carrying it. A client that remembers the last revision it saw can then
+ask for exactly the goals that changed since (see /api/goals/changes),
+and the revision doubles as the ETag of the goal listing.
+
+Callers bump and stamp inside their own transaction, so the revision and
+the change commit together.
+
+Tombstones are kept for TOMBSTONE_RETENTION_DAYS; purge_tombstones()
+deletes older ones and raises the owner's user.tombstone_floor to the
+highest revision it deleted. A client whose last revision is below the
+floor may have missed deletions, so /api/goals/changes sends it every
+goal with "resync": true instead of a delta.
+
+bump() raises UserGone when the user row no longer exists, e.g. a guest
+that another process reaped while this one still had it cached.
+"""
+from datetime import datetime, timezone
+import time
+
+from models import db, User, Goal, GoalTombstone
+
+DEFAULT_TOMBSTONE_RETENTION_DAYS = 30
+DEFAULT_CHUNK_SIZE = 500
+
+
+def current(user_id):
+    return db.session.execute(
+        db.select(User.goal_revision).filter_by(id=user_id)
+    ).scalar_one_or_none() or 0
+
+
+def state(user_id):
+    """(revision, tombstone floor) of user_id, in one query"""
+    row = db.session.execute(
+        db.select(User.goal_revision, User.tombstone_floor).filter_by(id=user_id)
+    ).one_or_none()
+    return (row.goal_revision or 0, row.tombstone_floor or 0) if row else (0, 0)
+
+
+class UserGone(Exception):
+    """Raised by bump() for a user id that has no user row (any more)"""
+
+    def __init__(self, user_id):
+        super().__init__(user_id)
+        self.user_id = user_id
+
+
+def bump(user_id):
+    """Advance user_id's revision and return the new value"""
+    revision = db.session.execute(
+        db.update(User).where(User.id == user_id)
+        .values(goal_revision=User.goal_revision + 1)
+        .returning(User.goal_revision),
+        execution_options={'synchronize_session': False},
+    ).scalar()
+    if revision is None:
+        raise UserGone(user_id)
+    return revision
+
+
+def bump_many(user_ids):
+    """Advance the revision of every user in user_ids with one statement"""
+    db.session.execute(
+        db.update(User).where(User.id.in_(user_ids))
+        .values(goal_revision=User.goal_revision + 1),
+        execution_options={'synchronize_session': False},
+    )
+
+
+def record_deletes(goal_ids):
+    """
+    Write tombstones for goal_ids at their owners' current revision.
+
+    Call after bumping the owners and before deleting the goals.
+    """
+    db.session.execute(
+        db.insert(GoalTombstone).from_select(
+            ['user_id', 'goal_id', 'revision', 'deleted_at'],
+            db.select(Goal.user_id, Goal.id, User.goal_revision,
+                      db.literal(datetime.now(timezone.utc), db.DateTime))
+            .join(User, User.id == Goal.user_id)
+            .where(Goal.id.in_(goal_ids)),
+        )
+    )
+
+
+def purge_tombstones(max_age, chunk_size=DEFAULT_CHUNK_SIZE, pause=0, now=None):
+    """
+    Delete tombstones older than max_age (a timedelta), raising each
+    owner's tombstone_floor first. Commits after every chunk of at most
+    chunk_size rows and sleeps pause seconds in between. Returns the
+    number deleted.
+    """
+    cutoff = (now or datetime.now(timezone.utc)) - max_age
+    expired = db.select(GoalTombstone.id, GoalTombstone.user_id, GoalTombstone.revision).where(
+        GoalTombstone.deleted_at < cutoff).order_by(GoalTombstone.id).limit(chunk_size)
+    users = User.__table__
+    deleted = 0
+    while True:
+        rows = db.session.execute(expired).all()
+        if rows:
+            floors = {}
+            for row in rows:
+                floors[row.user_id] = max(floors.get(row.user_id, 0), row.revision)
+            db.session.execute(
+                users.update().where(users.c.id == db.bindparam('owner'),
+                                     users.c.tombstone_floor < db.bindparam('floor'))
+                .values(tombstone_floor=db.bindparam('floor')),
+                [{'owner': owner, 'floor': floor} for owner, floor in floors.items()],
+            )
+            db.session.execute(db.delete(GoalTombstone).where(GoalTombstone.id.in_([row.id for row in rows])),
+                               execution_options={'synchronize_session': False})
+        db.session.commit()
+        deleted += len(rows)
+        if len(rows) < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+    return deleted
@@ -2,5 +2,8 @@
 # Install dependencies
 pip install -r requirements.txt
 
+# Minify, fingerprint and precompress static assets
+flask --app app build-assets
+
 # Run the Flask app
 python app.py
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""
+Full-text search over goal text for /api/goals/search.
+
+On SQLite the index is an FTS5 table, goal_fts, that borrows its rows from
+the goal table (content='goal') and stores only the index. It indexes
+text and user_id, so one MATCH both finds the words and restricts the
+result to one user without visiting other users' postings. Triggers on
+goal keep it in sync with every write, including the Core UPDATEs of the
+write-behind queue and the bulk deletes of retention and guest expiry.
+Toggling done does not touch the index. Extra indexes of every 2- and
+3-character prefix keep short prefixes from expanding into a scan of
+many terms.
+
+On PostgreSQL the same search runs on to_tsvector('simple', text),
+backed by a GIN expression index. Unlike the FTS5 tokenizer, it does not
+fold diacritics ("creme" does not find "Crème").
+
+Every word of the query matches as a prefix ("wal 5" finds "Walk 5k"),
+and results are ordered by relevance (bm25 or ts_rank), then id.
+"""
+import re
+
+from models import db, Goal
+
+FTS_TABLE = 'goal_fts'
+GIN_INDEX = 'ix_goal_text_search'
+MAX_TERMS = 16
+
+_fts = db.table(FTS_TABLE, db.column('rowid'))
+_fts_match = db.literal_column(FTS_TABLE)
+
+# The index is rebuilt from scratch, so a stale goal_fts left behind by
+# db.drop_all() (which knows nothing about it) never survives
+SQLITE_DDL = (
+    'DROP TRIGGER IF EXISTS goal_fts_insert',
+    'DROP TRIGGER IF EXISTS goal_fts_delete',
+    'DROP TRIGGER IF EXISTS goal_fts_update',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        text, user_id, content='goal', content_rowid='id', prefix='2 3',
+        tokenize='unicode61 remove_diacritics 2')""",
+    f"""CREATE TRIGGER goal_fts_insert AFTER INSERT ON goal BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text, user_id) VALUES (new.id, new.text, new.user_id);
+    END""",
+    f"""CREATE TRIGGER goal_fts_delete AFTER DELETE ON goal BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text, user_id)
+        VALUES ('delete', old.id, old.text, old.user_id);
+    END""",
+    f"""CREATE TRIGGER goal_fts_update AFTER UPDATE OF text, user_id ON goal BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text, user_id)
+        VALUES ('delete', old.id, old.text, old.user_id);
+        INSERT INTO {FTS_TABLE}(rowid, text, user_id) VALUES (new.id, new.text, new.user_id);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+)
+
+POSTGRESQL_DDL = (
+    f'DROP INDEX IF EXISTS {GIN_INDEX}',
+    f"CREATE INDEX {GIN_INDEX} ON goal USING gin (to_tsvector('simple', text))",
+)
+
+
+def terms(query):
+    """Words of a search query, split the way the FTS5 unicode61 tokenizer splits them"""
+    return re.findall(r'[^\W_]+', query or '')[:MAX_TERMS]
+
+
+def rebuild(conn):
+    """(Re)create the search index and its triggers, and index every goal"""
+    ddl = SQLITE_DDL if conn.dialect.name == 'sqlite' else POSTGRESQL_DDL
+    for statement in ddl:
+        conn.exec_driver_sql(statement)
+
+
+def search_query(user_id, words, columns, limit):
+    """Select columns of user_id's goals matching every word as a prefix, best first"""
+    if db.engine.dialect.name == 'sqlite':
+        # Terms are quoted so FTS5 operators (AND, NEAR, ^...) in the query
+        # are searched for as words
+        match = ' AND '.join([f'user_id : "{user_id}"'] + [f'text : "{word}"*' for word in words])
+        return (
+            db.select(*columns).join_from(_fts, Goal, Goal.id == _fts.c.rowid)
+            .where(_fts_match.op('MATCH')(match), Goal.user_id == user_id)
+            .order_by(db.func.bm25(_fts_match, 1.0, 0.0), Goal.id)
+            .limit(limit)
+        )
+    document = db.func.to_tsvector('simple', Goal.text)
+    tsquery = db.func.to_tsquery('simple', ' & '.join(f'{word.lower()}:*' for word in words))
+    return (
+        db.select(*columns).filter_by(user_id=user_id)
+        .where(document.bool_op('@@')(tsquery))
+        .order_by(db.func.ts_rank(document, tsquery).desc(), Goal.id)
+        .limit(limit)
+    )
@@ -0,0 +1,262 @@
+"""
+Server-side sessions.
+
+With Flask's cookie sessions every request deserializes the signed cookie,
+and the user loader then looks the user up again. SESSION_STORE=memory or
+SESSION_STORE=table keeps session data on the server instead: the cookie
+carries only a random session id, and the data lives in a MemoryStore (one
+process) or in the user_session table (shared by every worker).
+
+A server-side session also carries a compact snapshot of the logged-in
+user's identity, so current_user is rebuilt from the session without
+touching the user table. Sessions are indexed by user: a profile change
+drops the snapshot from all of that user's sessions, and a password change
+ends all of them except the one that made it.
+
+Session data is only written back when a request modifies it, and it
+expires PERMANENT_SESSION_LIFETIME after the last write.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+import secrets
+import threading
+
+from flask import current_app, session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SessionInterface
+from sqlalchemy.dialects import postgresql, sqlite
+
+from identity import Identity
+from models import db, UserSession
+
+BACKENDS = ('cookie', 'memory', 'table')
+
+# Same encoding as Flask's cookie sessions, so the same values round-trip
+serializer = TaggedJSONSerializer()
+
+
+def new_sid():
+    return secrets.token_urlsafe(32)
+
+
+class MemoryStore:
+    """Sessions in a dict; only for a single worker process"""
+
+    def __init__(self):
+        self._sessions = {}  # sid -> (user_id, payload, expires)
+        self._by_user = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._sessions.get(sid)
+        if entry is None:
+            return None
+        if entry[2] <= datetime.now(timezone.utc):
+            self.delete(sid)
+            return None
+        return serializer.loads(entry[1])
+
+    def save(self, sid, user_id, data, expires):
+        payload = serializer.dumps(data)
+        with self._lock:
+            self._forget(sid)
+            self._sessions[sid] = (user_id, payload, expires)
+            if user_id is not None:
+                self._by_user[user_id].add(sid)
+
+    def delete(self, sid):
+        with self._lock:
+            self._forget(sid)
+
+    def edit_user(self, user_id, edit):
+        """Apply edit(data) to every session of user_id"""
+        with self._lock:
+            for sid in self._by_user.get(user_id, ()):
+                _, payload, expires = self._sessions[sid]
+                data = serializer.loads(payload)
+                edit(data)
+                self._sessions[sid] = (user_id, serializer.dumps(data), expires)
+
+    def delete_user(self, user_id, keep=None):
+        """End every session of user_id except keep; returns the number ended"""
+        with self._lock:
+            sids = self._by_user.get(user_id, set()) - {keep}
+            for sid in sids:
+                self._forget(sid)
+        return len(sids)
+
+    def purge_expired(self):
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            expired = [sid for sid, entry in self._sessions.items() if entry[2] <= now]
+            for sid in expired:
+                self._forget(sid)
+        return len(expired)
+
+    def _forget(self, sid):
+        entry = self._sessions.pop(sid, None)
+        if entry is not None and entry[0] is not None:
+            sids = self._by_user[entry[0]]
+            sids.discard(sid)
+            if not sids:
+                del self._by_user[entry[0]]
+
+
+class TableStore:
+    """Sessions in the user_session table of the primary database"""
+
+    table = UserSession.__table__
+
+    def load(self, sid):
+        with db.engine.connect() as conn:
+            payload = conn.execute(db.select(self.table.c.data).where(
+                self.table.c.sid == sid, self.table.c.expires > datetime.now(timezone.utc)
+            )).scalar()
+        return serializer.loads(payload) if payload is not None else None
+
+    def save(self, sid, user_id, data, expires):
+        row = {'sid': sid, 'user_id': user_id, 'data': serializer.dumps(data), 'expires': expires}
+        with db.engine.begin() as conn:
+            insert = postgresql.insert if conn.dialect.name == 'postgresql' else sqlite.insert
+            statement = insert(self.table).values(row)
+            conn.execute(statement.on_conflict_do_update(
+                index_elements=['sid'],
+                set_={name: statement.excluded[name] for name in ('user_id', 'data', 'expires')},
+            ))
+
+    def delete(self, sid):
+        with db.engine.begin() as conn:
+            conn.execute(self.table.delete().where(self.table.c.sid == sid))
+
+    def edit_user(self, user_id, edit):
+        with db.engine.begin() as conn:
+            rows = conn.execute(db.select(self.table.c.sid, self.table.c.data)
+                                .where(self.table.c.user_id == user_id)).all()
+            updates = []
+            for sid, payload in rows:
+                data = serializer.loads(payload)
+                edit(data)
+                updates.append({'key': sid, 'payload': serializer.dumps(data)})
+            if updates:
+                conn.execute(self.table.update().where(self.table.c.sid == db.bindparam('key'))
+                             .values(data=db.bindparam('payload')), updates)
+
+    def delete_user(self, user_id, keep=None):
+        with db.engine.begin() as conn:
+            return conn.execute(self.table.delete().where(
+                self.table.c.user_id == user_id, self.table.c.sid != keep
+            )).rowcount
+
+    def purge_expired(self):
+        with db.engine.begin() as conn:
+            return conn.execute(self.table.delete().where(
+                self.table.c.expires <= datetime.now(timezone.utc)
+            )).rowcount
+
+
+class ServerSession(SecureCookieSession):
+    """Session data with the id it is stored under"""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        super().__init__(initial)
+        self.sid = sid
+        self.new = new
+        # Flask-Login's user id when the session was loaded
+        self.loaded_user_id = self.get('_user_id')
+        self.accessed = False
+
+
+class ServerSessionInterface(SessionInterface):
+    """Keeps session data in a store; the cookie holds only the session id"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        data = self.store.load(sid) if sid else None
+        if data is None:
+            return ServerSession(sid=new_sid(), new=True)
+        return ServerSession(data, sid=sid)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+                response.vary.add('Cookie')
+            return
+        if not session.modified:
+            return
+
+        user_id = session.get('_user_id')
+        if user_id != session.loaded_user_id and not session.new:
+            # Logging in or out moves the data to a fresh id, so an id
+            # obtained before login is useless afterwards
+            self.store.delete(session.sid)
+            session.sid = new_sid()
+        expires = datetime.now(timezone.utc) + app.permanent_session_lifetime
+        self.store.save(session.sid, int(user_id) if user_id else None, dict(session), expires)
+        response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                            httponly=httponly, domain=domain, path=path, secure=secure,
+                            samesite=samesite)
+        response.vary.add('Cookie')
+
+
+def init_app(app, backend):
+    """Switch app to server-side sessions for backend 'memory' or 'table'"""
+    if backend not in BACKENDS:
+        raise ValueError(f"SESSION_STORE must be one of {', '.join(BACKENDS)}, not {backend!r}")
+    if backend == 'cookie':
+        return None
+    store = MemoryStore() if backend == 'memory' else TableStore()
+    app.session_interface = ServerSessionInterface(store)
+    app.extensions['session_store'] = store
+    return store
+
+
+def _store():
+    return current_app.extensions.get('session_store')
+
+
+def cached_identity(user_id):
+    """The identity snapshot in the current server-side session, if it is user_id's"""
+    if _store() is None:
+        return None
+    snapshot = session.get('_identity')
+    if snapshot is None or snapshot['id'] != user_id:
+        return None
+    return Identity.from_snapshot(snapshot)
+
+
+def cache_identity(identity):
+    if _store() is not None:
+        session['_identity'] = identity.snapshot()
+
+
+def forget_identity(user_id):
+    """Drop user_id's identity snapshot from all of their sessions"""
+    store = _store()
+    if store is None:
+        return
+    session.pop('_identity', None)
+    store.edit_user(user_id, lambda data: data.pop('_identity', None))
+
+
+def end_other_sessions(user_id):
+    """Log user_id out everywhere but the current session"""
+    store = _store()
+    if store is None:
+        return 0
+    return store.delete_user(user_id, keep=session.sid)
@@ -0,0 +1,185 @@
+// Show current date/time
+function setDateTime() {
+  const now = new Date();
+  const options = { weekday: 'long', year: 'numeric', month: 'long', day: 'numeric',
+                    hour: '2-digit', minute: '2-digit', second: '2-digit' };
+  document.getElementById('datetime').textContent = now.toLocaleString(undefined, options);
+}
+
+// Generate life calendar
+function generateCalendar(birthDate, lifespanYears) {
+  const grid = document.getElementById('calendar-grid');
+  const now = new Date();
+  const birth = new Date(birthDate);
+
+  // Clear existing grid
+  grid.innerHTML = '';
+
+  let totalWeeksLived = 0;
+
+  // Create rows for each year of life
+  for (let year = 0; year < lifespanYears; year++) {
+    const yearStart = new Date(birth);
+    yearStart.setFullYear(birth.getFullYear() + year);
+
+    const yearEnd = new Date(birth);
+    yearEnd.setFullYear(birth.getFullYear() + year + 1);
+
+    // Calculate weeks in this year
+    const weeksInYear = Math.round((yearEnd - yearStart) / (1000 * 60 * 60 * 24 * 7));
+
+    // Create year container
+    const yearContainer = document.createElement('div');
+    yearContainer.className = 'calendar-year';
+
+    // Create week elements for this year
+    for (let week = 0; week < weeksInYear; week++) {
+      const weekStart = new Date(yearStart);
+      weekStart.setDate(yearStart.getDate() + (week * 7));
+
+      const weekEnd = new Date(weekStart);
+      weekEnd.setDate(weekStart.getDate() + 7);
+
+      const weekElement = document.createElement('div');
+      weekElement.className = 'calendar-week';
+
+      // Check if this week has been lived
+      if (weekEnd <= now) {
+        weekElement.classList.add('lived');
+        totalWeeksLived++;
+      } else if (weekStart <= now && now < weekEnd) {
+        weekElement.classList.add('current');
+        totalWeeksLived++;
+      } else {
+        weekElement.classList.add('remaining');
+      }
+
+      yearContainer.appendChild(weekElement);
+    }
+
+    grid.appendChild(yearContainer);
+  }
+
+  // Calculate total possible weeks
+  const lifespanEnd = new Date(birth);
+  lifespanEnd.setFullYear(birth.getFullYear() + lifespanYears);
+  const totalWeeks = Math.round((lifespanEnd - birth) / (1000 * 60 * 60 * 24 * 7));
+
+  // Update stats
+  const yearsLived = Math.floor(totalWeeksLived / 52.14); // Approximate
+  const yearsRemaining = lifespanYears - yearsLived;
+  const percentageLived = ((totalWeeksLived / totalWeeks) * 100).toFixed(1);
+
+  document.getElementById('weeks-lived').textContent = totalWeeksLived.toLocaleString();
+  document.getElementById('total-weeks').textContent = totalWeeks.toLocaleString();
+  document.getElementById('years-lived').textContent = yearsLived;
+  document.getElementById('years-remaining').textContent = yearsRemaining;
+  document.getElementById('percentage-lived').textContent = percentageLived + '%';
+}
+
+// Event listeners
+document.getElementById('update-calendar').addEventListener('click', function() {
+  const birthdate = document.getElementById('birthdate').value;
+  const lifespan = parseInt(document.getElementById('lifespan').value);
+  generateCalendar(birthdate, lifespan);
+});
+
+// Sidebar toggle functionality
+function initSidebarToggle() {
+  const sidebar = document.querySelector('.sidebar');
+  const toggleBtn = document.getElementById('sidebar-toggle');
+  const main = document.querySelector('main');
+
+  // Load saved state from localStorage
+  const isExpanded = localStorage.getItem('sidebarExpanded') === 'true';
+  if (isExpanded) {
+    sidebar.classList.add('expanded');
+    main.classList.add('expanded');
+  }
+
+  toggleBtn.addEventListener('click', () => {
+    sidebar.classList.toggle('expanded');
+    main.classList.toggle('expanded');
+    const expanded = sidebar.classList.contains('expanded');
+    localStorage.setItem('sidebarExpanded', expanded);
+  });
+}
+
+// User management (similar to index.html)
+let currentUser = null;
+
+async function loadCurrentUser() {
+  try {
+    const response = await fetch('/api/user/current');
+    if (response.ok) {
+      currentUser = await response.json();
+      updateUserInterface();
+    } else {
+      currentUser = { is_anonymous: true };
+      updateUserInterface();
+    }
+  } catch (error) {
+    console.error('Error loading user:', error);
+    currentUser = { is_anonymous: true };
+    updateUserInterface();
+  }
+}
+
+function updateUserInterface() {
+  const userInfo = document.getElementById('user-info');
+
+  if (currentUser && !currentUser.is_anonymous) {
+    const isGuest = currentUser.is_guest;
+    userInfo.innerHTML = `
+      <div class="username">${currentUser.display_name || currentUser.username}</div>
+      ${isGuest ? '<div class="guest-badge">GUEST</div>' : ''}
+      <div class="user-controls">
+        ${isGuest ? '<button class="user-btn" onclick="showConvertGuestDialog()">Sign Up</button>' : ''}
+        <button class="user-btn" onclick="logout()">Sign Out</button>
+      </div>
+    `;
+  } else {
+    userInfo.innerHTML = `
+      <div class="user-controls">
+        <button class="user-btn" onclick="window.location.href='/login'">Sign In</button>
+        <button class="user-btn" onclick="window.location.href='/register'">Sign Up</button>
+      </div>
+    `;
+  }
+}
+
+async function logout() {
+  try {
+    await fetch('/logout', { method: 'POST' });
+    currentUser = { is_anonymous: true };
+    updateUserInterface();
+  } catch (error) {
+    console.error('Error logging out:', error);
+  }
+}
+
+// Goal statistics for the current year
+async function loadGoalStats() {
+  try {
+    const response = await fetch('/api/stats');
+    if (!response.ok) return;
+    const stats = await response.json();
+    const completed = stats.completed_per_month.reduce((sum, count) => sum + count, 0);
+    document.getElementById('current-streak').textContent = stats.streaks.current;
+    document.getElementById('longest-streak').textContent = stats.streaks.longest;
+    document.getElementById('completed-this-year').textContent = completed.toLocaleString();
+  } catch (error) {
+    console.error('Error loading goal stats:', error);
+  }
+}
+
+// Initial setup
+initSidebarToggle();
+loadCurrentUser();
+loadGoalStats();
+setDateTime();
+
+// Generate initial calendar
+const defaultBirth = '1990-01-01';
+const defaultLifespan = 80;
+generateCalendar(defaultBirth, defaultLifespan);
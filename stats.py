@@ -0,0 +1,245 @@
+"""
+Per-user goal statistics, maintained incrementally.
+
+/api/stats needs completion rates per goal type, daily streaks and
+completions per week and month. Computing those from the goal table would
+read a user's whole history on every calendar page view, so two small
+aggregate tables are kept up to date as goals change:
+
+  goal_stats           (user_id, goal_type) -> total goals, goals done
+  goal_completion_day  (user_id, local day, goal_type) -> goals completed
+
+Routes describe their changes on a StatsDelta and apply it in the same
+transaction; a batch of changes becomes one upsert per table. Completion
+days are bucketed in the user's timezone at the time of completion.
+
+Retention purges leave the aggregates alone, so statistics keep the
+history of goals that have since been cleaned up; purged() also counts
+those goals in the purged columns. rebuild() starts from the purged counts
+and adds the goals that still exist, so it agrees with the incremental
+path. Goals purged before these tables existed are not in any count.
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from itertools import groupby
+from operator import itemgetter
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, User, Goal, GoalStats, GoalCompletionDay
+
+
+def user_zone(name):
+    """ZoneInfo for a User.timezone value, falling back to UTC"""
+    try:
+        return ZoneInfo(name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def local_day(moment, zone):
+    # SQLite hands datetimes back naive; they are stored in UTC
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(zone).date()
+
+
+class StatsDelta:
+    """Aggregate changes for one user, applied with one upsert per table"""
+
+    def __init__(self, user_id, zone):
+        self.user_id = user_id
+        self.zone = zone
+        self.totals = Counter()  # goal_type -> change in total
+        self.done = Counter()    # goal_type -> change in done
+        self.days = Counter()    # (day, goal_type) -> change in completed
+
+    def created(self, goal_type):
+        self.totals[goal_type] += 1
+
+    def deleted(self, goal_type, done, completed):
+        self.totals[goal_type] -= 1
+        if done:
+            self._complete(goal_type, completed, -1)
+
+    def changed(self, goal_type, was_done, was_completed, done, completed):
+        """A goal's done flag was set; completed is its new completion time"""
+        if was_done:
+            self._complete(goal_type, was_completed, -1)
+        if done:
+            self._complete(goal_type, completed, 1)
+
+    def reset(self, goal_type, was_done):
+        """A recurring goal started a new period; its past completion stays on the calendar"""
+        if was_done:
+            self.done[goal_type] -= 1
+
+    def _complete(self, goal_type, completed, step):
+        self.done[goal_type] += step
+        if completed is not None:
+            self.days[(local_day(completed, self.zone), goal_type)] += step
+
+    def apply(self, executor=None):
+        executor = executor or db.session
+        type_rows = [
+            {'user_id': self.user_id, 'goal_type': goal_type,
+             'total': self.totals[goal_type], 'done': self.done[goal_type]}
+            for goal_type in set(self.totals) | set(self.done)
+            if self.totals[goal_type] or self.done[goal_type]
+        ]
+        day_rows = [
+            {'user_id': self.user_id, 'day': day, 'goal_type': goal_type, 'completed': count}
+            for (day, goal_type), count in self.days.items() if count
+        ]
+        _increment(executor, GoalStats, ['user_id', 'goal_type'], ['total', 'done'], type_rows)
+        _increment(executor, GoalCompletionDay, ['user_id', 'day', 'goal_type'], ['completed'], day_rows)
+
+
+def _increment(executor, model, keys, counters, rows):
+    """INSERT rows, adding to the counters of rows that already exist"""
+    if not rows:
+        return
+    dialect = executor.get_bind().dialect if hasattr(executor, 'get_bind') else executor.dialect
+    insert = postgresql.insert if dialect.name == 'postgresql' else sqlite.insert
+    statement = insert(model)
+    statement = statement.on_conflict_do_update(
+        index_elements=keys,
+        set_={name: getattr(model, name) + getattr(statement.excluded, name) for name in counters},
+    )
+    executor.execute(statement, rows)
+
+
+def move(from_user_id, to_user_id):
+    """Hand a user's aggregates to another user with no aggregates yet"""
+    for model in (GoalStats, GoalCompletionDay):
+        db.session.execute(
+            db.update(model).where(model.user_id == from_user_id).values(user_id=to_user_id),
+            execution_options={'synchronize_session': False},
+        )
+
+
+def purged(goal_ids, executor=None):
+    """Count completed goals about to be deleted by a retention purge as purged"""
+    executor = executor or db.session
+    rows = executor.execute(
+        db.select(Goal.user_id, Goal.goal_type, Goal.completed, User.timezone)
+        .join(User, User.id == Goal.user_id)
+        .where(Goal.id.in_(goal_ids), Goal.done.is_(True), Goal.completed.is_not(None))
+    ).all()
+    types, days = Counter(), Counter()
+    for user_id, goal_type, completed_at, zone_name in rows:
+        types[(user_id, goal_type)] += 1
+        days[(user_id, local_day(completed_at, user_zone(zone_name)), goal_type)] += 1
+    # A missing row is inserted with the purged goals as its whole history
+    _increment(executor, GoalStats, ['user_id', 'goal_type'], ['purged'], [
+        {'user_id': user_id, 'goal_type': goal_type, 'total': count, 'done': count, 'purged': count}
+        for (user_id, goal_type), count in types.items()
+    ])
+    _increment(executor, GoalCompletionDay, ['user_id', 'day', 'goal_type'], ['purged'], [
+        {'user_id': user_id, 'day': day, 'goal_type': goal_type, 'completed': count, 'purged': count}
+        for (user_id, day, goal_type), count in days.items()
+    ])
+
+
+def rebuild(executor=None, user_ids=None):
+    """Recompute the aggregates of user_ids (default: all users) from their goals and purged counts"""
+    executor = executor or db.session
+    for model, baseline in ((GoalStats, {'total': GoalStats.purged, 'done': GoalStats.purged}),
+                            (GoalCompletionDay, {'completed': GoalCompletionDay.purged})):
+        delete = db.delete(model).where(model.purged == 0)
+        update = db.update(model).values(baseline)
+        if user_ids is not None:
+            delete = delete.where(model.user_id.in_(user_ids))
+            update = update.where(model.user_id.in_(user_ids))
+        executor.execute(delete)
+        executor.execute(update)
+
+    totals = db.select(
+        Goal.user_id, Goal.goal_type, db.func.count(),
+        db.func.sum(db.case((Goal.done.is_(True), 1), else_=0)),
+    ).group_by(Goal.user_id, Goal.goal_type)
+    if user_ids is not None:
+        totals = totals.where(Goal.user_id.in_(user_ids))
+    _increment(executor, GoalStats, ['user_id', 'goal_type'], ['total', 'done'], [
+        {'user_id': user_id, 'goal_type': goal_type, 'total': total, 'done': done}
+        for user_id, goal_type, total, done in executor.execute(totals)
+    ])
+
+    # Days depend on each user's timezone, so they are counted in Python,
+    # one user at a time in user_id order
+    completed = db.select(Goal.user_id, Goal.goal_type, Goal.completed, User.timezone).join(
+        User, User.id == Goal.user_id
+    ).where(Goal.done.is_(True), Goal.completed.is_not(None)).order_by(Goal.user_id)
+    if user_ids is not None:
+        completed = completed.where(Goal.user_id.in_(user_ids))
+    rows = executor.execute(completed.execution_options(yield_per=1000))
+
+    for user_id, user_rows in groupby(rows, key=itemgetter(0)):
+        days = Counter()
+        for _, goal_type, completed_at, zone_name in user_rows:
+            days[(local_day(completed_at, user_zone(zone_name)), goal_type)] += 1
+        _increment(executor, GoalCompletionDay, ['user_id', 'day', 'goal_type'], ['completed'], [
+            {'user_id': user_id, 'day': day, 'goal_type': goal_type, 'completed': count}
+            for (day, goal_type), count in days.items()
+        ])
+
+
+def streaks(days, today):
+    """(current, longest) runs of consecutive days in the set `days`"""
+    longest = run = 0
+    previous = None
+    for day in sorted(days):
+        run = run + 1 if previous == day - timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+
+    # Today's streak is still alive if yesterday was completed
+    current = 0
+    day = today if today in days else today - timedelta(days=1)
+    while day in days:
+        current += 1
+        day -= timedelta(days=1)
+    return current, longest
+
+
+def summary(user_id, zone, year=None):
+    """The /api/stats payload for one user; user_id None (no user row yet) reads nothing"""
+    today = datetime.now(zone).date()
+    year = year or today.year
+
+    totals, days = [], []
+    if user_id is not None:
+        totals = db.session.execute(
+            db.select(GoalStats.goal_type, GoalStats.total, GoalStats.done).filter_by(user_id=user_id))
+        days = db.session.execute(
+            db.select(GoalCompletionDay.day, GoalCompletionDay.goal_type, GoalCompletionDay.completed)
+            .filter_by(user_id=user_id).where(GoalCompletionDay.completed > 0))
+
+    by_type = {}
+    for goal_type, total, done in totals:
+        by_type[goal_type] = {
+            'total': total,
+            'done': done,
+            'completion_rate': round(done / total, 4) if total else 0.0,
+        }
+
+    daily_days = set()
+    per_week, per_month = [0] * 53, [0] * 12
+    year_start = date(year, 1, 1)
+    for day, goal_type, completed in days:
+        if goal_type == 'daily':
+            daily_days.add(day)
+        if day.year == year:
+            per_week[(day - year_start).days // 7] += completed
+            per_month[day.month - 1] += completed
+
+    current, longest = streaks(daily_days, today)
+    return {
+        'year': year,
+        'by_type': by_type,
+        'streaks': {'current': current, 'longest': longest},
+        # Weeks are counted from January 1: week 1 is Jan 1-7
+        'completed_per_week': per_week,
+        'completed_per_month': per_month,
+    }
@@ -0,0 +1,59 @@
+"""
+Storage profiles: connection pragmas and pool sizing for the goals database.
+
+SQLite's defaults (rollback journal, synchronous=FULL, no busy timeout)
+make every writer block every reader, which shows up as "database is
+locked" errors as soon as create_goal/update_goal run concurrently. The
+'wal' profile lets readers proceed during a write and makes writers wait
+for the lock instead of failing. Pragmas are applied to every new
+connection, since most of them are per-connection settings.
+
+Other databases (DATABASE_URL=postgresql+psycopg2://...) ignore the
+pragmas; only the pool settings apply to them.
+"""
+from sqlalchemy import event
+
+STORAGE_PROFILES = {
+    # SQLite defaults, kept for comparison benchmarks
+    'legacy': {},
+    'wal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',    # fsync at checkpoints only; safe with WAL
+        'busy_timeout': 5000,       # milliseconds to wait for the write lock
+        'cache_size': -20000,       # negative means KiB, so ~20 MB of page cache
+        'mmap_size': 268435456,     # 256 MB of memory-mapped reads
+        'foreign_keys': 'ON',
+    },
+}
+DEFAULT_PROFILE = 'wal'
+
+
+def engine_options(uri, pool_size, max_overflow=None, pool_timeout=10, pool_recycle=-1):
+    """SQLALCHEMY_ENGINE_OPTIONS sized for pool_size concurrent request threads"""
+    if uri in ('sqlite://', 'sqlite:///:memory:'):
+        # In-memory databases use a single-connection pool that takes no sizing
+        return {}
+    options = {
+        'pool_size': pool_size,
+        'max_overflow': pool_size if max_overflow is None else max_overflow,
+        'pool_timeout': pool_timeout,
+        'pool_recycle': pool_recycle,
+    }
+    if not uri.startswith('sqlite'):
+        # Server connections can be dropped by the server or a proxy while
+        # idle in the pool; check them before handing them out
+        options['pool_pre_ping'] = True
+    return options
+
+
+def apply_pragmas(engine, pragmas):
+    """Run PRAGMA name = value on every new connection made by engine"""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
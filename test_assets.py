@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test script for the fingerprinted, precompressed static asset pipeline
+"""
+import gzip
+import os
+import re
+import shutil
+import tempfile
+
+import brotli
+
+from app import create_app
+import assets
+
+
+def test_assets():
+    app = create_app()
+    scratch = tempfile.mkdtemp(prefix='goals-assets-')
+    app.static_folder = shutil.copytree(app.static_folder, os.path.join(scratch, 'static'),
+                                        ignore=shutil.ignore_patterns(assets.DIST))
+    client = app.test_client()
+
+    app.extensions['asset_manifest'] = {}
+    page = client.get('/').get_data(as_text=True)
+    assert '/static/css/style.css' in page and '/static/js/index.js' in page
+    print("✓ Without a build, pages link the source assets")
+
+    docs = os.path.join(scratch, 'docs')
+    result = app.test_cli_runner().invoke(args=['build-assets', '--docs', docs])
+    assert result.exit_code == 0, result.output
+    manifest = app.extensions['asset_manifest']
+    assert sorted(manifest) == sorted(assets.SOURCES)
+    assert manifest == assets.load_manifest(app.static_folder)
+    for source, built in manifest.items():
+        assert re.fullmatch(r'dist/(css|js)/\w+\.[0-9a-f]{10}\.(css|js)', built), built
+        path = os.path.join(app.static_folder, built)
+        with open(path, 'rb') as f:
+            content = f.read()
+        assert len(content) < os.path.getsize(os.path.join(app.static_folder, source))
+        with open(path + '.gz', 'rb') as f:
+            assert gzip.decompress(f.read()) == content
+        with open(path + '.br', 'rb') as f:
+            assert brotli.decompress(f.read()) == content
+    print("✓ Assets are minified, fingerprinted and precompressed")
+
+    page = client.get('/').get_data(as_text=True)
+    assert f"/static/{manifest['css/style.css']}" in page
+    assert f"/static/{manifest['js/index.js']}" in page
+    assert f"/static/{manifest['js/calendar.js']}" in client.get('/calendar').get_data(as_text=True)
+    print("✓ url_for('static', ...) emits the fingerprinted names")
+
+    url = f"/static/{manifest['css/style.css']}"
+    with open(os.path.join(app.static_folder, manifest['css/style.css']), 'rb') as f:
+        content = f.read()
+    for accept, encoding, decode in (('gzip, deflate, br', 'br', brotli.decompress),
+                                     ('gzip', 'gzip', gzip.decompress),
+                                     ('', None, bytes)):
+        response = client.get(url, headers={'Accept-Encoding': accept})
+        assert response.status_code == 200
+        assert response.content_encoding == encoding
+        assert response.mimetype == 'text/css'
+        assert 'immutable' in response.headers['Cache-Control']
+        assert 'Accept-Encoding' in response.vary
+        assert decode(response.get_data()) == content
+        response.close()
+    print("✓ The static route serves the accepted encoding with immutable caching")
+
+    response = client.get('/static/css/style.css')
+    assert response.status_code == 200 and 'immutable' not in response.headers.get('Cache-Control', '')
+    response.close()
+    print("✓ Unfingerprinted files are served as before")
+
+    with open(os.path.join(docs, 'index.html'), encoding='utf-8') as f:
+        published = f.read()
+    assert f'href="static/{manifest["css/style.css"]}"' in published
+    assert f'src="static/{manifest["js/index.js"]}"' in published
+    assert os.path.isfile(os.path.join(docs, 'static', manifest['js/index.js'] + '.br'))
+    print("✓ The docs site is rendered with relative fingerprinted URLs")
+
+    shutil.rmtree(scratch)
+    print("\n🎉 Asset pipeline tests passed!")
+
+
+if __name__ == "__main__":
+    test_assets()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test script for the batch goal endpoint
+"""
+from app import app, db, identities
+import migrations
+from test_query_plan import capture_queries
+
+
+def test_batch_goals():
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+        identities.clear()
+    print("✓ Database tables recreated")
+
+    client = app.test_client()
+    other = app.test_client()
+    foreign = other.post('/api/goals', json={'text': 'Not yours', 'goal_type': 'daily'}).get_json()
+    existing = client.post('/api/goals', json={'text': 'Existing', 'goal_type': 'weekly'}).get_json()
+    doomed = client.post('/api/goals', json={'text': 'Doomed', 'goal_type': 'weekly'}).get_json()
+
+    operations = [{'op': 'create', 'text': f'Imported {i}', 'goal_type': 'daily'} for i in range(200)]
+    operations += [
+        {'op': 'update', 'id': existing['id'], 'done': True},
+        {'op': 'update', 'id': existing['id'], 'text': 'Renamed'},
+        {'op': 'delete', 'id': doomed['id']},
+        {'op': 'delete', 'id': foreign['id']},
+        {'op': 'create', 'text': 'No type'},
+        {'op': 'rename'},
+    ]
+    with capture_queries() as statements:
+        response = client.post('/api/goals/batch', json={'operations': operations})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert len(results) == len(operations)
+    print(f"✓ {len(operations)} operations answered with per-item results")
+
+    assert [r['status'] for r in results[:200]] == [201] * 200
+    assert results[0]['goal']['text'] == 'Imported 0' and results[199]['goal']['text'] == 'Imported 199'
+    assert results[200]['status'] == 200 and results[201]['goal']['text'] == 'Renamed'
+    assert results[201]['goal']['done'] is True and results[201]['goal']['completed']
+    assert results[202]['status'] == 204
+    assert results[203]['status'] == 404, "Other users' goals must stay invisible"
+    assert results[204]['status'] == 400 and results[205]['status'] == 400
+    print("✓ Creates, updates, deletes and errors reported per item")
+
+    goals = client.get('/api/goals').get_json()
+    assert len(goals) == 201
+    assert doomed['id'] not in {goal['id'] for goal in goals}
+    assert len(other.get('/api/goals').get_json()) == 1
+    print("✓ Batch applied to the caller's goals only")
+
+    writes = [s for s, _ in statements if s.startswith(('INSERT', 'UPDATE', 'DELETE'))]
+    # Revision, goals, tombstones and the statistics upserts
+    assert len(writes) <= 6, f"Batch issued {len(writes)} write statements"
+    print(f"✓ Batch ran as {len(statements)} statements in one transaction")
+
+    assert client.post('/api/goals/batch', json={'operations': 'nope'}).status_code == 400
+    print("✓ Malformed batches are rejected")
+
+    print("\n🎉 Batch endpoint tests passed!")
+
+
+if __name__ == "__main__":
+    test_batch_goals()
@@ -2,7 +2,7 @@
 """
 Test script for the goals database system
 """
-from app import app, db, Goal
+from app import app, db, User, Goal
 from datetime import datetime, timezone
 
 def test_database():
@@ -11,23 +11,28 @@ def test_database():
         db.create_all()
         print("✓ Database tables created")
 
+        # Goals need a real owner now that foreign keys are enforced
+        test_user = User.create_guest()
+        db.session.add(test_user)
+        db.session.commit()
+
         # Create test goals
         daily_goal = Goal(
             text="Complete morning workout",
             goal_type="daily",
-            user_id="test_user"
+            user_id=test_user.id
         )
 
         weekly_goal = Goal(
             text="Read 3 chapters of a book",
             goal_type="weekly",
-            user_id="test_user"
+            user_id=test_user.id
         )
 
         yearly_goal = Goal(
             text="Learn a new programming language",
             goal_type="yearly",
-            user_id="test_user"
+            user_id=test_user.id
         )
 
         db.session.add_all([daily_goal, weekly_goal, yearly_goal])
@@ -35,13 +40,13 @@ def test_database():
         print("✓ Test goals created")
 
         # Query goals
-        all_goals = Goal.query.filter_by(user_id="test_user").all()
+        all_goals = Goal.query.filter_by(user_id=test_user.id).all()
         print(f"✓ Found {len(all_goals)} goals in database")
 
         # Test goal types
-        daily_goals = Goal.query.filter_by(goal_type="daily", user_id="test_user").all()
-        weekly_goals = Goal.query.filter_by(goal_type="weekly", user_id="test_user").all()
-        yearly_goals = Goal.query.filter_by(goal_type="yearly", user_id="test_user").all()
+        daily_goals = Goal.query.filter_by(goal_type="daily", user_id=test_user.id).all()
+        weekly_goals = Goal.query.filter_by(goal_type="weekly", user_id=test_user.id).all()
+        yearly_goals = Goal.query.filter_by(goal_type="yearly", user_id=test_user.id).all()
 
         print(f"  - Daily goals: {len(daily_goals)}")
         print(f"  - Weekly goals: {len(weekly_goals)}")
@@ -65,5 +70,23 @@ def test_database():
 
         print("\n🎉 Database system test completed successfully!")
 
+def test_storage_profile():
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            print(f"✓ Storage profile skipped ({db.engine.dialect.name} has no pragmas)")
+            return
+        with db.engine.connect() as conn:
+            pragmas = app.config['SQLITE_PRAGMAS']
+            journal_mode = conn.exec_driver_sql('PRAGMA journal_mode').scalar()
+            foreign_keys = conn.exec_driver_sql('PRAGMA foreign_keys').scalar()
+            busy_timeout = conn.exec_driver_sql('PRAGMA busy_timeout').scalar()
+
+        if pragmas.get('journal_mode') == 'WAL':
+            assert journal_mode == 'wal'
+            assert foreign_keys == 1
+            assert busy_timeout == pragmas['busy_timeout']
+        print(f"✓ Storage profile applied (journal_mode={journal_mode})")
+
 if __name__ == "__main__":
-    test_database()
\ No newline at end of file
+    test_database()
+    test_storage_profile()
\ No newline at end of file
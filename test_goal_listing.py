@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test script for paginated, projected and streamed goal listings
+"""
+import json
+
+from app import app, db, identities
+import migrations
+
+
+def test_goal_listing():
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+        identities.clear()
+    print("✓ Database tables recreated")
+
+    client = app.test_client()
+    client.post('/api/goals/batch', json={'operations': [
+        {'op': 'create', 'text': f'Goal {i}', 'goal_type': 'daily' if i % 2 else 'weekly'}
+        for i in range(25)
+    ]})
+    everything = client.get('/api/goals').get_json()
+    assert len(everything) == 25 and set(everything[0]) == {
+        'id', 'text', 'goal_type', 'done', 'created', 'completed', 'user_id'}
+    print("✓ Unpaginated listing keeps its original shape")
+
+    # Keyset pages cover every goal exactly once, in order
+    pages, cursor = [], None
+    while True:
+        url = '/api/goals?limit=10' + (f'&cursor={cursor}' if cursor else '')
+        page = client.get(url).get_json()
+        pages.append(page['goals'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [goal['id'] for page in pages for goal in page] == [goal['id'] for goal in everything]
+    print("✓ Cursor pagination walks all goals in three pages")
+
+    daily = client.get('/api/goals?type=daily&limit=5').get_json()
+    assert all(goal['goal_type'] == 'daily' for goal in daily['goals'])
+    assert daily['next_cursor'] == daily['goals'][-1]['id']
+    print("✓ Pagination combines with the type filter")
+
+    projected = client.get('/api/goals?fields=text,done&limit=3').get_json()['goals']
+    assert all(set(goal) == {'id', 'text', 'done'} for goal in projected)
+    assert client.get('/api/goals?fields=text,password_hash').status_code == 400
+    print("✓ Field projection returns only the requested columns")
+
+    response = client.get('/api/goals?format=ndjson&fields=text')
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line['text'] for line in lines] == [goal['text'] for goal in everything]
+    print("✓ NDJSON export streams one goal per line")
+
+    print("\n🎉 Goal listing tests passed!")
+
+
+if __name__ == "__main__":
+    test_goal_listing()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for /api/goals/search and the full-text index behind it
+"""
+from app import create_app, db, identities, Goal
+import migrations
+
+
+def texts(response):
+    assert response.status_code == 200, response.get_json()
+    return [goal['text'] for goal in response.get_json()['goals']]
+
+
+def check_index(app):
+    """SQLite: the FTS5 index matches the goal table row for row"""
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            with db.engine.begin() as conn:
+                conn.exec_driver_sql("INSERT INTO goal_fts(goal_fts, rank) VALUES ('integrity-check', 1)")
+
+
+def test_goal_search():
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+    identities.clear()
+    print("✓ Database tables recreated")
+
+    client, other = app.test_client(), app.test_client()
+    ids = {}
+    for text in ('Walk 5k', 'Read a book', 'Walking the dog', 'Book flights'):
+        ids[text] = client.post('/api/goals', json={'text': text, 'goal_type': 'daily'}).get_json()['id']
+    other.post('/api/goals', json={'text': 'Walk to work', 'goal_type': 'daily'})
+
+    assert sorted(texts(client.get('/api/goals/search?q=wal'))) == ['Walk 5k', 'Walking the dog']
+    assert texts(client.get('/api/goals/search?q=WALK+dog')) == ['Walking the dog']
+    assert texts(other.get('/api/goals/search?q=walk')) == ['Walk to work']
+    print("✓ Every word matches as a prefix, only among the user's own goals")
+
+    client.post('/api/goals', json={'text': 'Book book book', 'goal_type': 'daily'})
+    assert texts(client.get('/api/goals/search?q=book'))[0] == 'Book book book'
+    assert texts(client.get('/api/goals/search?q=book&limit=1')) == ['Book book book']
+    print("✓ Results are ranked by relevance and limited")
+
+    for query in ('"walk', 'NEAR(walk', 'walk AND', '^walk*', 'user_id:1'):
+        texts(client.get('/api/goals/search', query_string={'q': query}))
+    assert client.get('/api/goals/search?q=').status_code == 400
+    assert client.get('/api/goals/search?q=%20*%20').status_code == 400
+    assert app.test_client().get('/api/goals/search?q=walk').get_json() == {'goals': []}
+    print("✓ Query syntax is treated as plain words; empty queries are rejected")
+
+    client.put(f"/api/goals/{ids['Walk 5k']}", json={'text': 'Run 10k'})
+    client.put(f"/api/goals/{ids['Walking the dog']}", json={'done': True})
+    client.delete(f"/api/goals/{ids['Read a book']}")
+    client.post('/api/goals/batch', json={'operations': [
+        {'op': 'create', 'text': 'Run a marathon', 'goal_type': 'yearly'},
+        {'op': 'delete', 'id': ids['Book flights']},
+    ]})
+    assert sorted(texts(client.get('/api/goals/search?q=run'))) == ['Run 10k', 'Run a marathon']
+    assert texts(client.get('/api/goals/search?q=walk')) == ['Walking the dog']
+    assert texts(client.get('/api/goals/search?q=book')) == ['Book book book']
+    with app.app_context():
+        db.session.execute(db.delete(Goal).where(Goal.text.like('Run%')))
+        db.session.commit()
+    assert texts(client.get('/api/goals/search?q=run')) == []
+    check_index(app)
+    print("✓ Creates, edits, deletes and bulk deletes keep the index in sync")
+
+    result = app.test_cli_runner().invoke(args=['rebuild-search'])
+    assert result.exit_code == 0, result.output
+    assert texts(client.get('/api/goals/search?q=walk')) == ['Walking the dog']
+    check_index(app)
+    print("✓ rebuild-search recreates the index")
+
+    print("\n🎉 Goal search tests passed!")
+
+
+def test_search_with_write_behind():
+    app = create_app({'WRITE_BEHIND': True, 'WRITE_BEHIND_INTERVAL': 3600})
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+    identities.clear()
+    client = app.test_client()
+    goal = client.post('/api/goals', json={'text': 'Swim', 'goal_type': 'daily'}).get_json()
+    client.put(f"/api/goals/{goal['id']}", json={'text': 'Cycle'})
+    assert texts(client.get('/api/goals/search?q=cyc')) == ['Cycle']
+    app.extensions['write_behind'].stop()
+    print("✓ Search sees the user's queued updates")
+
+
+if __name__ == "__main__":
+    test_goal_search()
+    test_search_with_write_behind()
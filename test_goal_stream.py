@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script for the /api/goals/stream Server-Sent Events channel
+"""
+import json
+import time
+
+from app import create_app, db, identities
+import migrations
+
+CONFIG = {'STREAM_KEEPALIVE': 0.02, 'STREAM_MAX_SECONDS': 10,
+          'BCRYPT_ROUNDS': 4, 'BCRYPT_WORKERS': 0}
+
+
+class EventReader:
+    """Reads Server-Sent Events from a streamed test client response"""
+
+    def __init__(self, response):
+        self.response = response
+        self.chunks = response.iter_encoded()
+
+    def next_event(self, timeout=5):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            chunk = next(self.chunks).decode()
+            fields = {}
+            for line in chunk.strip().splitlines():
+                name, _, value = line.partition(':')
+                if name:  # lines starting with ':' are keepalive comments
+                    fields[name] = value.strip()
+            if 'event' in fields:
+                return fields.get('id'), fields['event'], json.loads(fields['data'])
+        raise AssertionError("No event within the timeout")
+
+    def close(self):
+        self.response.close()
+
+
+def login(client, username, register=False):
+    path = '/register' if register else '/login'
+    response = client.post(path, json={'username': username, 'password': 'secret123'})
+    assert response.status_code in (200, 201), response.get_json()
+
+
+def reset(app):
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+    identities.clear()
+
+
+def test_goal_stream():
+    app = create_app(CONFIG)
+    broker = app.extensions['event_broker']
+    reset(app)
+    assert app.test_client().get('/api/goals/stream').status_code == 204
+    print("✓ Visitors without a user row get 204")
+
+    laptop, phone = app.test_client(), app.test_client()
+    login(laptop, 'streamer', register=True)
+    login(phone, 'streamer')
+    user_id = laptop.get('/api/user/current').get_json()['id']
+    response = phone.get('/api/goals/stream', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+    stream = EventReader(response)
+    assert broker.subscribers(user_id) == 1
+
+    goal = laptop.post('/api/goals', json={'text': 'Swim', 'goal_type': 'daily'}).get_json()
+    event_id, kind, data = stream.next_event()
+    assert kind == 'created' and data['goal'] == goal and event_id == str(data['revision'])
+    laptop.put(f"/api/goals/{goal['id']}", json={'done': True})
+    event_id, kind, data = stream.next_event()
+    assert kind == 'updated' and data['goal']['done']
+    last_seen = int(event_id)
+    laptop.delete(f"/api/goals/{goal['id']}")
+    _, kind, data = stream.next_event()
+    assert kind == 'deleted' and data['id'] == goal['id']
+    print("✓ Create, update and delete reach the user's other session")
+
+    batch = laptop.post('/api/goals/batch', json={'operations': [
+        {'op': 'create', 'text': 'Run', 'goal_type': 'weekly'},
+        {'op': 'create', 'text': 'Row', 'goal_type': 'weekly'},
+    ]}).get_json()
+    kinds = [stream.next_event()[1:] for _ in range(2)]
+    assert [data['goal']['text'] for _, data in kinds] == ['Run', 'Row']
+    print("✓ Batch operations are pushed one event per goal")
+
+    stranger = app.test_client()
+    stranger_goal = stranger.post('/api/goals', json={'text': 'Not yours', 'goal_type': 'daily'}).get_json()
+    stranger.put(f"/api/goals/{stranger_goal['id']}", json={'done': True})
+    stranger.delete(f"/api/goals/{stranger_goal['id']}")
+    run = batch['results'][0]['goal']['id']
+    laptop.put(f'/api/goals/{run}', json={'text': 'Run far'})
+    _, kind, data = stream.next_event()
+    assert data['goal']['text'] == 'Run far', "Another user's goal leaked into the stream"
+    time.sleep(0.05)
+    assert next(stream.chunks) == b': keepalive\n\n'
+    stream.close()
+    assert broker.subscribers(user_id) == 0
+    print("✓ Streams carry only the user's events, with keepalives, and unsubscribe on close")
+
+    response = phone.get('/api/goals/stream', headers={'Last-Event-ID': str(last_seen)}, buffered=False)
+    stream = EventReader(response)
+    _, kind, data = stream.next_event()
+    assert kind == 'changes' and data['deleted'] == [goal['id']]
+    assert sorted(g['text'] for g in data['goals']) == ['Row', 'Run far']
+    stream.close()
+    print("✓ Reconnecting with Last-Event-ID replays missed changes")
+
+    print("\n🎉 Goal stream tests passed!")
+
+
+def test_table_broker_across_workers():
+    config = dict(CONFIG, EVENT_BROKER='table', EVENT_POLL_INTERVAL=0.02)
+    first, second = create_app(config), create_app(config)
+    reset(first)
+    for app in (first, second):
+        app.extensions['event_broker'].poll()  # start from the current end of the table
+
+    writer, reader = first.test_client(), second.test_client()
+    login(writer, 'multiworker', register=True)
+    login(reader, 'multiworker')
+    stream = EventReader(reader.get('/api/goals/stream', buffered=False))
+    writer.post('/api/goals', json={'text': 'Across workers', 'goal_type': 'daily'})
+    _, kind, data = stream.next_event()
+    assert kind == 'created' and data['goal']['text'] == 'Across workers'
+    stream.close()
+    for app in (first, second):
+        app.extensions['event_broker'].stop()
+    print("✓ The table broker delivers events published by another worker")
+
+
+if __name__ == "__main__":
+    test_goal_stream()
+    test_table_broker_across_workers()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test script for goal revisions, conditional GET and incremental sync
+"""
+from datetime import datetime, timedelta, timezone
+
+from app import app, db, identities, Goal, GoalTombstone
+import migrations
+
+
+def test_goal_sync():
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+        identities.clear()
+    print("✓ Database tables recreated")
+
+    client = app.test_client()
+    first = client.post('/api/goals', json={'text': 'First', 'goal_type': 'daily'}).get_json()
+    second = client.post('/api/goals', json={'text': 'Second', 'goal_type': 'daily'}).get_json()
+
+    # Conditional GET
+    listing = client.get('/api/goals')
+    etag = listing.headers['ETag']
+    assert listing.headers['Cache-Control'] == 'private, no-cache'
+    assert client.get('/api/goals', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/goals?type=daily', headers={'If-None-Match': etag}).status_code == 200
+    print("✓ Unchanged listing answers 304 Not Modified")
+
+    client.put(f"/api/goals/{first['id']}", json={'done': True})
+    changed = client.get('/api/goals', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    print("✓ A goal update changes the ETag")
+
+    # Incremental sync
+    baseline = client.get('/api/goals/changes?since=0').get_json()
+    assert len(baseline['goals']) == 2 and baseline['deleted'] == []
+    since = baseline['revision']
+    assert client.get(f'/api/goals/changes?since={since}').get_json() == {
+        'revision': since, 'goals': [], 'deleted': []}
+
+    client.delete(f"/api/goals/{second['id']}")
+    client.post('/api/goals/batch', json={'operations': [
+        {'op': 'create', 'text': 'Third', 'goal_type': 'weekly'},
+        {'op': 'update', 'id': first['id'], 'text': 'First, renamed'},
+    ]})
+    changes = client.get(f'/api/goals/changes?since={since}').get_json()
+    assert changes['revision'] == since + 2
+    assert sorted(goal['text'] for goal in changes['goals']) == ['First, renamed', 'Third']
+    assert changes['deleted'] == [second['id']]
+    print("✓ Changes since a revision include updates, creates and tombstones")
+
+    # Retention purges leave tombstones too
+    since = changes['revision']
+    with app.app_context():
+        Goal.query.filter_by(id=first['id']).update(
+            {'completed': datetime.now(timezone.utc) - timedelta(days=30)})
+        db.session.commit()
+    assert client.post('/api/goals/cleanup').get_json() == {'deleted': 1}
+    changes = client.get(f'/api/goals/changes?since={since}').get_json()
+    assert changes['deleted'] == [first['id']] and changes['revision'] == since + 1
+    print("✓ Retention purges are reported as deletions")
+
+    # Tombstones past their retention window are purged
+    latest = changes['revision']
+    with app.app_context():
+        GoalTombstone.query.update({'deleted_at': datetime.now(timezone.utc) - timedelta(days=40)})
+        db.session.commit()
+    result = app.test_cli_runner().invoke(args=['purge-goals', '--pause', '0'])
+    assert '2 tombstone(s) older than 30 days deleted' in result.output, result.output
+    with app.app_context():
+        assert GoalTombstone.query.count() == 0
+    resync = client.get(f'/api/goals/changes?since={since}').get_json()
+    assert resync['resync'] is True and resync['deleted'] == []
+    assert [goal['text'] for goal in resync['goals']] == ['Third']
+    assert client.get(f'/api/goals/changes?since={latest}').get_json() == {
+        'revision': latest, 'goals': [], 'deleted': []}
+    assert client.get('/api/goals/changes?since=0').get_json()['deleted'] == []
+    print("✓ Changes from before purged tombstones are a full resync")
+
+    assert client.get('/api/goals/changes').status_code == 400
+    assert client.get(f"/api/goals/changes?since={changes['revision'] + 1}").status_code == 400
+    print("✓ Missing or future revisions are rejected")
+
+    print("\n🎉 Goal sync tests passed!")
+
+
+if __name__ == "__main__":
+    test_goal_sync()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test script for streaming goal export and import, over HTTP and the CLI
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+
+from app import create_app, db, identities, Goal
+import migrations
+import transfer
+
+
+def exported(client, fmt='ndjson'):
+    response = client.get(f'/api/goals/export?format={fmt}')
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == f'attachment; filename=goals.{fmt}'
+    body = response.get_data(as_text=True)
+    if fmt == 'csv':
+        return list(csv.DictReader(io.StringIO(body)))
+    return [json.loads(line) for line in body.splitlines()]
+
+
+def test_goal_transfer():
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+    identities.clear()
+    print("✓ Database tables recreated")
+
+    assert app.test_client().get('/api/goals/export').get_data() == b''
+    print("✓ Visitors without goals get an empty export")
+
+    source = app.test_client()
+    source.post('/register', json={'username': 'source', 'password': 'secret123'})
+    for text, goal_type in (('Walk, then "run"', 'daily'), ('Read a book', 'weekly'), ('Ski', 'yearly')):
+        goal = source.post('/api/goals', json={'text': text, 'goal_type': goal_type}).get_json()
+        if goal_type == 'daily':
+            source.put(f"/api/goals/{goal['id']}", json={'done': True})
+    records = exported(source)
+    assert [r['text'] for r in records] == ['Walk, then "run"', 'Read a book', 'Ski']
+    assert set(records[0]) == set(transfer.FIELDS)
+    assert records[0]['done'] is True and records[0]['completed']
+    rows = exported(source, 'csv')
+    assert [row['text'] for row in rows] == [r['text'] for r in records]
+    print("✓ Goals export as NDJSON and CSV")
+
+    target = app.test_client()
+    target.post('/register', json={'username': 'target', 'password': 'secret123'})
+    ndjson = ''.join(json.dumps(r) + '\n' for r in records)
+    summary = target.post('/api/goals/import?dry_run=1', data=ndjson).get_json()
+    assert summary == {'imported': 3, 'rejected': 0, 'dry_run': True, 'errors': []}
+    assert target.get('/api/goals').get_json() == []
+    print("✓ A dry run validates without writing")
+
+    revision = target.get('/api/goals/changes?since=0').get_json()['revision']
+    assert target.post('/api/goals/import', data=ndjson).get_json()['imported'] == 3
+    copies = exported(target)
+    fields = ('text', 'goal_type', 'done', 'created', 'completed')
+    assert [{f: r[f] for f in fields} for r in copies] == [{f: r[f] for f in fields} for r in records]
+    assert target.get('/api/goals/changes?since=0').get_json()['revision'] > revision
+    assert [g['text'] for g in target.get('/api/goals/search?q=read').get_json()['goals']] == ['Read a book']
+    daily = target.get('/api/stats').get_json()['by_type']['daily']
+    assert daily['total'] == 1 and daily['done'] == 1
+    print("✓ An NDJSON import round-trips and updates revisions, search and statistics")
+
+    csv_body = source.get('/api/goals/export?format=csv').get_data()
+    response = target.post('/api/goals/import', data=csv_body, content_type='text/csv')
+    assert response.get_json()['imported'] == 3
+    assert len(target.get('/api/goals').get_json()) == 6
+    print("✓ A CSV import round-trips")
+
+    body = '\n'.join([
+        json.dumps({'text': 'Fine', 'goal_type': 'daily'}),
+        '{not json',
+        json.dumps({'goal_type': 'daily'}),
+        '',
+        json.dumps({'text': 'Late', 'goal_type': 'daily', 'done': 'maybe'}),
+        json.dumps({'text': 'When', 'goal_type': 'daily', 'created': 'yesterday'}),
+        '[1, 2]',
+    ]) + '\n'
+    summary = app.test_client().post('/api/goals/import', data=body).get_json()
+    assert summary['imported'] == 1 and summary['rejected'] == 5
+    assert [error['line'] for error in summary['errors']] == [2, 3, 5, 6, 7]
+    assert summary['errors'][0]['error'] == 'Invalid JSON'
+    assert app.test_client().post('/api/goals/import?format=xml', data='').status_code == 400
+    print("✓ Invalid lines are skipped and reported by line number")
+
+    with app.app_context():
+        user_id = Goal.query.filter_by(text='Fine').one().user_id
+        lines = (json.dumps({'text': f'Goal {n}', 'goal_type': 'daily'}) for n in range(25))
+        commits = []
+        original = db.session.commit
+        db.session.commit = lambda: (commits.append(1), original())
+        try:
+            result = transfer.import_goals(transfer.parse(lines, 'ndjson'), user_id, batch_size=10)
+        finally:
+            db.session.commit = original
+        assert result.imported == 25 and len(commits) == 3
+        assert Goal.query.filter_by(user_id=user_id).count() == 26
+    print("✓ Imports commit one transaction per batch")
+
+    scratch = tempfile.mkdtemp(prefix='goals-transfer-')
+    backup = os.path.join(scratch, 'backup.csv')
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=['export-goals']).exit_code != 0
+    result = runner.invoke(args=['export-goals', '--all-users', '--format', 'csv', '--output', backup])
+    assert result.exit_code == 0, result.output
+    with open(backup, newline='', encoding='utf-8') as f:
+        backed_up = list(csv.DictReader(f))
+    assert {row['username'] for row in backed_up} >= {'source', 'target'}
+    result = runner.invoke(args=['export-goals', '--user', 'source'])
+    assert [json.loads(line)['text'] for line in result.output.splitlines()] == [r['text'] for r in records]
+    print("✓ The CLI exports one user or every user with usernames")
+
+    result = runner.invoke(args=['import-goals', backup, '--all-users', '--dry-run'])
+    assert result.exit_code == 0, result.output
+    assert f"{len(backed_up)} goal(s) would be imported" in result.output
+    for record in records:
+        assert source.delete(f"/api/goals/{record['id']}").status_code == 204
+    with open(backup, 'a', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerow(['nobody', '', 'Lost', 'daily', '', '', ''])
+    result = runner.invoke(args=['import-goals', backup, '--all-users', '--batch-size', '2'])
+    assert result.exit_code == 0, result.output
+    assert "rejected" in result.output and "Unknown user 'nobody'" in result.output
+    assert [r['text'] for r in exported(source)] == [r['text'] for r in records]
+    print("✓ The CLI imports a backup into each goal's user by username")
+
+    for name in os.listdir(scratch):
+        os.remove(os.path.join(scratch, name))
+    os.rmdir(scratch)
+    print("\n🎉 Goal transfer tests passed!")
+
+
+if __name__ == "__main__":
+    test_goal_transfer()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test script for last-seen tracking and expiry of inactive guests
+"""
+from datetime import datetime, timedelta, timezone
+
+from app import app, db, identities, last_seen, User, Goal
+from models import GoalStats, RecurringGoal
+from test_query_plan import capture_queries
+import guests
+import migrations
+
+
+def test_guest_expiry():
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+        identities.clear()
+        last_seen.flush(db.engine)
+    print("✓ Database tables recreated")
+
+    stale, active = app.test_client(), app.test_client()
+    for client in (stale, active):
+        client.post('/api/goals', json={'text': 'Hello', 'goal_type': 'daily'})
+        client.post('/api/goals/recurring', json={'text': 'Stretch', 'period': 'daily'})
+        client.get('/api/goals')
+    stale_id = stale.get('/api/user/current').get_json()['id']
+    active_id = active.get('/api/user/current').get_json()['id']
+    assert last_seen.pending() == {stale_id, active_id}
+    print("✓ Guest activity is collected in memory")
+
+    with app.app_context(), capture_queries() as statements:
+        assert last_seen.flush(db.engine) == 2
+    assert len([s for s, _ in statements if s.startswith('UPDATE')]) <= 1
+    print("✓ Pending last-seen times written in one batch")
+
+    # The stale guest was last seen two months ago
+    long_ago = datetime.now(timezone.utc) - timedelta(days=60)
+    with app.app_context():
+        User.query.filter_by(id=stale_id).update({'last_seen': long_ago})
+        db.session.commit()
+        registered = User(username='kept_user', password_hash='', last_seen=long_ago)
+        db.session.add(registered)
+        db.session.commit()
+
+        # As on the legacy storage profile, which does not enforce foreign keys
+        sqlite = db.engine.dialect.name == 'sqlite'
+        if sqlite:
+            db.session.connection().exec_driver_sql('PRAGMA foreign_keys=OFF')
+        forgotten = []
+        try:
+            deleted = guests.reap_guests(timedelta(days=30), chunk_size=1,
+                                         on_deleted=forgotten.extend)
+        finally:
+            if sqlite:
+                db.session.connection().exec_driver_sql('PRAGMA foreign_keys=ON')
+        assert deleted == 1 and [row.id for row in forgotten] == [stale_id]
+        assert db.session.get(User, stale_id) is None
+        assert Goal.query.filter_by(user_id=stale_id).count() == 0
+        assert GoalStats.query.filter_by(user_id=stale_id).count() == 0
+        assert RecurringGoal.query.filter_by(user_id=stale_id).count() == 0
+        assert db.session.get(User, active_id) and db.session.get(User, registered.id)
+    print("✓ Inactive guests are deleted with their goals; others are kept")
+
+    # Reaped by "another process": this process still has the guest cached
+    response = stale.post('/api/goals', json={'text': 'Back again', 'goal_type': 'daily'})
+    assert response.status_code == 201
+    assert response.get_json()['user_id'] not in (stale_id, active_id, registered.id)
+    print("✓ A write from a guest reaped elsewhere starts a new guest")
+
+    # A guest seen since the last flush is never reaped
+    with app.app_context():
+        User.query.filter_by(id=active_id).update({'last_seen': long_ago})
+        db.session.commit()
+    active.get('/api/goals')
+    result = app.test_cli_runner().invoke(args=['reap-guests', '--ttl-days', '30'])
+    assert '0 inactive guest(s) deleted' in result.output, result.output
+    with app.app_context():
+        assert db.session.get(User, active_id).last_seen > long_ago.replace(tzinfo=None)
+    print("✓ reap-guests flushes pending activity before deleting")
+
+    print("\n🎉 Guest expiry tests passed!")
+
+
+if __name__ == "__main__":
+    test_guest_expiry()
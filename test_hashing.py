@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test script for pooled password hashing
+"""
+import threading
+
+from app import app, db, identities, User
+import hashing
+import migrations
+
+
+def test_password_hashing():
+    previous = hashing.hasher
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+        identities.clear()
+        print("✓ Database tables recreated")
+
+        hashing.configure(rounds=4, workers=1, queue_size=0)
+        user = User(username='hashed_user')
+        user.set_password('secret123')
+        db.session.add(user)
+        db.session.commit()
+        assert user.password_hash.startswith('$2b$04$')
+        assert user.check_password('secret123') and not user.check_password('wrong')
+        print("✓ Hashing runs on the pool with the configured cost")
+
+    try:
+        # Raising the cost upgrades the stored hash on the next login
+        hashing.configure(rounds=5, workers=1, queue_size=0)
+        client = app.test_client()
+        response = client.post('/login', json={'username': 'hashed_user', 'password': 'secret123'})
+        assert response.status_code == 200
+        with app.app_context():
+            assert User.query.filter_by(username='hashed_user').one().password_hash.startswith('$2b$05$')
+        print("✓ Login rehashes passwords made with an old cost")
+
+        # With the only worker busy and no queue, logins are turned away
+        started, release = threading.Event(), threading.Event()
+
+        def occupy():
+            started.set()
+            release.wait()
+
+        blocker = threading.Thread(target=hashing.hasher._run, args=(occupy,))
+        blocker.start()
+        started.wait()
+        response = client.post('/login', json={'username': 'hashed_user', 'password': 'secret123'})
+        release.set()
+        blocker.join()
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        print("✓ Full hashing queue answers 503 with Retry-After")
+    finally:
+        hashing.configure(previous.rounds, previous.workers, previous.queue_size)
+
+    print("\n🎉 Password hashing tests passed!")
+
+
+if __name__ == "__main__":
+    test_password_hashing()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test script for the identity cache behind guest and logged-in lookups
+"""
+from app import app, db, identities
+import migrations
+from test_query_plan import capture_queries
+
+
+def count_queries(client, path, **kwargs):
+    with capture_queries() as statements:
+        response = client.get(path, **kwargs)
+    return len(statements), response
+
+
+def test_identity_cache():
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+        identities.clear()
+    print("✓ Database tables recreated")
+
+    # Guest: the first write creates the guest, later requests hit the cache
+    guest = app.test_client()
+    guest.post('/api/goals', json={'text': 'Cached', 'goal_type': 'daily'})
+    queries, response = count_queries(guest, '/api/goals')
+    # Revision lookup (for the ETag) plus the goals themselves
+    assert queries == 2, f"Guest goal listing took {queries} queries"
+    assert identities.by_guest_token.hits >= 1
+    queries, response = count_queries(guest, '/api/goals', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304 and queries == 1
+    print("✓ Cached guest lookup: /api/goals revalidates with one query")
+
+    # Logged-in user: the user loader is served from the cache
+    member = app.test_client()
+    member.post('/register', json={'username': 'cached_user', 'password': 'secret123'})
+    member.get('/api/goals')
+    queries, _ = count_queries(member, '/api/goals')
+    assert queries == 2, f"Member goal listing took {queries} queries"
+    print("✓ Cached user loader: no user lookup on /api/goals")
+
+    # Profile updates are visible immediately
+    member.put('/api/user/profile', json={'display_name': 'Renamed'})
+    _, response = count_queries(member, '/api/user/current')
+    assert response.get_json()['display_name'] == 'Renamed'
+    print("✓ Profile update invalidates the cached identity")
+
+    # Converting a guest drops its token from the cache
+    token = guest.get('/api/user/current').get_json()['guest_token']
+    guest.post('/api/user/convert-guest', json={'username': 'converted', 'password': 'secret123'})
+    assert identities.by_guest_token.get(token) is None
+    _, response = count_queries(guest, '/api/user/current')
+    user = response.get_json()
+    assert user['username'] == 'converted' and not user['is_guest']
+    print("✓ Guest conversion invalidates the cached guest token")
+
+    stats = identities.stats()
+    assert stats['by_id']['hits'] > 0 and stats['by_id']['misses'] > 0
+    print(f"✓ Cache counters: {stats}")
+
+    print("\n🎉 Identity cache tests passed!")
+
+
+if __name__ == "__main__":
+    test_identity_cache()
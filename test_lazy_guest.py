@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test script for session-only guests that are persisted on their first write
+"""
+from app import app, db, identities, User
+import migrations
+from test_query_plan import capture_queries
+
+
+def test_lazy_guest():
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+        identities.clear()
+    print("✓ Database tables recreated")
+
+    visitor = app.test_client()
+    with capture_queries() as statements:
+        assert visitor.get('/api/goals').get_json() == []
+        assert visitor.get('/api/goals?limit=10').get_json() == {'goals': [], 'next_cursor': None}
+        assert visitor.get('/api/goals?format=ndjson').get_data() == b''
+        assert visitor.get('/api/goals/changes?since=0').get_json() == {
+            'revision': 0, 'goals': [], 'deleted': []}
+        assert visitor.get('/api/stats').get_json()['by_type'] == {}
+        assert visitor.post('/api/goals/cleanup').get_json() == {'deleted': 0}
+        assert visitor.put('/api/goals/1', json={'done': True}).status_code == 404
+        current = visitor.get('/api/user/current').get_json()
+    assert statements == [], f"Reads for a new visitor ran {len(statements)} queries"
+    assert current['is_guest'] and current['id'] is None
+    with app.app_context():
+        assert User.query.count() == 0
+    print("✓ Reads for a session-only guest return empty results without the database")
+
+    goal = visitor.post('/api/goals', json={'text': 'First write', 'goal_type': 'daily'}).get_json()
+    persisted = visitor.get('/api/user/current').get_json()
+    assert persisted['guest_token'] == current['guest_token'] and persisted['id'] == goal['user_id']
+    assert [g['id'] for g in visitor.get('/api/goals').get_json()] == [goal['id']]
+    print("✓ The first write persists the guest under its session token")
+
+    # Signing up straight from a session-only guest
+    converted = app.test_client()
+    converted.get('/api/goals')
+    response = converted.post('/api/user/convert-guest',
+                              json={'username': 'lazy_convert', 'password': 'secret123'})
+    assert response.status_code == 200 and not response.get_json()['is_guest']
+    cleaned = app.test_client()
+    cleaned.post('/api/goals/cleanup')
+    response = cleaned.post('/api/user/convert-guest',
+                            json={'username': 'lazy_cleanup', 'password': 'secret123'})
+    assert response.status_code == 200
+    registered = app.test_client()
+    registered.get('/api/goals')
+    response = registered.post('/register', json={'username': 'lazy_register', 'password': 'secret123'})
+    assert response.status_code == 201
+    assert registered.get('/api/user/current').get_json()['username'] == 'lazy_register'
+    with app.app_context():
+        assert User.query.filter_by(is_guest=True).count() == 1
+    print("✓ Session-only guests can convert or register, also after only a cleanup")
+
+    print("\n🎉 Lazy guest tests passed!")
+
+
+if __name__ == "__main__":
+    test_lazy_guest()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script for request metrics and slow-request profiling
+"""
+import os
+import re
+import tempfile
+
+from app import create_app, db, identities
+from metrics import metrics
+import hashing
+import migrations
+
+
+def test_metrics():
+    profile_dir = tempfile.mkdtemp(prefix='goals-profiles-')
+    previous = hashing.hasher
+    app = create_app({
+        'METRICS_ENABLED': True,
+        'PROFILE_SAMPLE_RATE': 1.0,
+        'PROFILE_SLOW_MS': 0,
+        'PROFILE_DIR': profile_dir,
+        'BCRYPT_ROUNDS': 4,
+        'BCRYPT_WORKERS': 1,
+    })
+    try:
+        with app.app_context():
+            db.drop_all()
+            migrations.upgrade()
+            identities.clear()
+        metrics.clear()
+        print("✓ Database tables recreated")
+
+        client = app.test_client()
+        goal = client.post('/api/goals', json={'text': 'Measure', 'goal_type': 'daily'}).get_json()
+        client.get('/api/goals')
+        client.put(f"/api/goals/{goal['id']}", json={'done': True})
+        client.post('/register', json={'username': 'metrics_user', 'password': 'secret123'})
+        client.get('/api/stats')
+        client.get('/api/stats')
+        client.get('/no/such/page')
+
+        response = client.get('/metrics')
+        assert response.status_code == 200 and response.mimetype == 'text/plain'
+        text = response.get_data(as_text=True)
+        assert '# TYPE goals_request_duration_seconds histogram' in text
+        assert 'goals_request_duration_seconds_count{route="/api/goals",method="GET",status="200"} 1' in text
+        assert 'route="/api/goals/<int:goal_id>",method="PUT",status="200"' in text
+        assert 'route="unmatched",method="GET",status="404"' in text
+        print("✓ Latency histograms labelled by route rule")
+
+        queries = re.search(r'^goals_sql_queries_total\{route="/api/goals",method="GET"\} (\d+)$',
+                            text, re.MULTILINE)
+        assert queries and int(queries.group(1)) >= 1
+        assert 'goals_sql_seconds_total{route="/api/goals",method="GET"}' in text
+        print("✓ SQL statements and time counted per request")
+
+        assert 'goals_bcrypt_duration_seconds_count{operation="hash"} 1' in text
+        print("✓ bcrypt time recorded")
+
+        by_id = identities.stats()['by_id']
+        assert by_id['hits'] >= 1
+        assert '# TYPE goals_cache_hits_total counter' in text
+        assert f'goals_cache_hits_total{{cache="identity_by_id"}} {by_id["hits"]}' in text
+        assert f'goals_cache_misses_total{{cache="identity_by_id"}} {by_id["misses"]}' in text
+        assert 'goals_cache_size{cache="identity_by_guest_token"}' in text
+        print("✓ Identity cache hits and misses exported")
+
+        profiles = os.listdir(profile_dir)
+        assert any('-GET-api_goals-' in name for name in profiles)
+        assert all(name.endswith('ms.prof') for name in profiles)
+        print(f"✓ {len(profiles)} slow request profile(s) written")
+    finally:
+        hashing.configure(previous.rounds, previous.workers, previous.queue_size)
+
+    print("\n🎉 Metrics tests passed!")
+
+
+if __name__ == "__main__":
+    test_metrics()
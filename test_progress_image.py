@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Test script for the /api/progress.<format> image endpoint
+"""
+from app import app, db, identities, progress_images
+import migrations
+
+
+def test_progress_image():
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+        identities.clear()
+    progress_images.clear()
+    print("✓ Database tables recreated")
+
+    client = app.test_client()
+    response = client.get('/api/progress.png')
+    assert response.status_code == 200 and response.mimetype == 'image/png'
+    assert response.data.startswith(b'\x89PNG')
+    assert response.headers['Cache-Control'].startswith('private, max-age=')
+    etag = response.headers['ETag']
+    print("✓ PNG rendered with ETag and Cache-Control until local midnight")
+
+    before = progress_images.stats()
+    assert client.get('/api/progress.png').data == response.data
+    assert client.get('/api/progress.png', headers={'If-None-Match': etag}).status_code == 304
+    after = progress_images.stats()
+    assert after['hits'] == before['hits'] + 1 and after['size'] == before['size']
+    print("✓ Repeat requests are served from the cache or answered 304")
+
+    svg = client.get('/api/progress.svg?period=week&size=small')
+    assert svg.mimetype == 'image/svg+xml' and b'Week' in svg.data
+    assert client.get('/api/progress.svg?period=week&size=small&tz=Pacific/Kiritimati').status_code == 200
+    assert client.get('/api/progress.gif').status_code == 404
+    assert client.get('/api/progress.png?period=decade').status_code == 404
+    print("✓ Formats, periods, sizes and timezones are selectable")
+
+    # Logged-in users get their own timezone's date
+    client.post('/register', json={'username': 'progress_user', 'password': 'secret123'})
+    client.put('/api/user/profile', json={'timezone': 'Pacific/Kiritimati'})
+    kiritimati = client.get('/api/progress.png').headers['ETag']
+    client.put('/api/user/profile', json={'timezone': 'Pacific/Pago_Pago'})
+    pago_pago = client.get('/api/progress.png').headers['ETag']
+    assert kiritimati != pago_pago, "UTC+14 and UTC-11 are never on the same date"
+    print("✓ The image follows the user's timezone")
+
+    print("\n🎉 Progress image tests passed!")
+
+
+if __name__ == "__main__":
+    test_progress_image()
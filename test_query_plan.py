@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Query plan audit: drives every route through the test client, records each
+SQL statement it issues and runs EXPLAIN QUERY PLAN on it. Fails if any
+statement has to scan a whole table instead of using an index.
+"""
+from contextlib import contextmanager
+import re
+
+from sqlalchemy import event
+
+from app import app, db, identities
+import migrations
+
+# "SCAN goal" or "SCAN user USING COVERING INDEX ..." both visit every row
+FULL_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)(\w+)')
+
+
+@contextmanager
+def capture_queries():
+    """Collect (statement, parameters) for every statement sent to the engine"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def full_table_scans(statements):
+    """Return (statement, plan detail) for every plan step that scans a table"""
+    scans = []
+    with app.app_context(), db.engine.connect() as conn:
+        for statement, parameters in statements:
+            if not statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue
+            plan = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+            for row in plan:
+                detail = row[-1]
+                if FULL_SCAN.match(detail):
+                    scans.append((statement, detail))
+    return scans
+
+
+def exercise_routes(client):
+    """Hit every route the frontend uses, as a guest and as a registered user"""
+    # Guest flow
+    client.get('/api/goals')
+    client.get('/api/user/current')
+    created = client.post('/api/goals', json={'text': 'Walk', 'goal_type': 'daily'}).get_json()
+    client.get('/api/goals?type=daily')
+    client.get('/api/goals?limit=1&fields=text,done')
+    client.get(f"/api/goals?type=daily&limit=1&cursor={created['id']}")
+    client.get('/api/goals?format=ndjson').get_data()
+    client.get('/api/goals/changes?since=1')
+    client.put(f"/api/goals/{created['id']}", json={'done': True})
+    client.post('/api/goals/batch', json={'operations': [
+        {'op': 'create', 'text': 'Stretch', 'goal_type': 'daily'},
+        {'op': 'update', 'id': created['id'], 'text': 'Walk far'},
+        {'op': 'delete', 'id': created['id'] + 1},
+    ]})
+    client.post('/api/goals/cleanup')
+    client.get('/api/stats')
+    client.post('/api/user/convert-guest', json={'username': 'plan_convert', 'password': 'secret123'})
+    client.put('/api/user/profile', json={'display_name': 'Planner'})
+    client.post('/logout')
+
+    # Registration migrating a guest's goals, then login
+    client.post('/api/goals', json={'text': 'Read', 'goal_type': 'weekly'})
+    client.post('/register', json={'username': 'plan_register', 'password': 'secret123'})
+    client.post('/logout')
+    client.post('/login', json={'username': 'plan_register', 'password': 'secret123'})
+    goals = client.get('/api/goals').get_json()
+    client.delete(f"/api/goals/{goals[0]['id']}")
+    client.post('/logout')
+
+
+def test_query_plans():
+    with app.app_context():
+        if db.engine.dialect.name != 'sqlite':
+            print("✓ Query plan audit skipped (EXPLAIN QUERY PLAN is SQLite's)")
+            return
+        db.drop_all()
+        migrations.upgrade()
+        identities.clear()
+    print("✓ Database tables recreated")
+
+    # No ANALYZE: without table statistics SQLite plans as if every table
+    # were large, which is the case this audit guards against. Requests run
+    # outside an app context so each one gets its own flask.g, and with it
+    # its own Flask-Login user.
+    client = app.test_client()
+    with capture_queries() as statements:
+        exercise_routes(client)
+    print(f"✓ Captured {len(statements)} statements from the routes")
+
+    scans = full_table_scans(statements)
+    for statement, detail in scans:
+        print(f"✗ {detail}\n    {statement}")
+    assert not scans, f"{len(scans)} statement(s) scan a whole table"
+    print("✓ Every route query is served by an index")
+
+if __name__ == "__main__":
+    test_query_plans()
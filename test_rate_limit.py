@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Test script for token-bucket rate limits on guest creation, logins and registrations
+"""
+import time
+
+from app import create_app, db, identities, User, Goal
+from models import RateLimitBucket
+import hashing
+import migrations
+import ratelimit
+
+LIMITS = 'login=3/minute,login_username=2/minute,register=1/minute,guest=2/minute'
+
+
+def from_ip(app, address):
+    client = app.test_client()
+    client.environ_base['REMOTE_ADDR'] = address
+    return client
+
+
+def check_store(store, now):
+    limit = ratelimit.Limit.parse('2/second')
+    assert limit == ratelimit.Limit(2, 2.0)
+    assert store.take('k', limit, now) == 0 and store.take('k', limit, now) == 0
+    assert store.take('k', limit, now) == 0.5
+    assert store.take('k', limit, now + 0.25) == 0.25, "Denied requests take no token"
+    assert store.take('k', limit, now + 0.5) == 0
+    assert store.take('other', limit, now + 0.5) == 0
+    assert store.take('k', limit, now + 10) == 0 and store.take('k', limit, now + 10) == 0
+    assert store.take('k', limit, now + 10) > 0, "Buckets hold at most capacity tokens"
+
+
+def test_limits():
+    assert ratelimit.parse_limits(' login=10/minute, register=5/hour,') == {
+        'login': ratelimit.Limit(10, 10 / 60), 'register': ratelimit.Limit(5, 5 / 3600)}
+    assert ratelimit.parse_limits('') == {}
+    for bad in ('login=10', 'login=10/fortnight', 'login=0/minute'):
+        try:
+            ratelimit.parse_limits(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f'{bad!r} was accepted')
+    print("✓ RATE_LIMITS parses into token buckets")
+
+    check_store(ratelimit.MemoryStore(), 1000.0)
+    store = ratelimit.MemoryStore(max_keys=2)
+    for key in 'abc':
+        store.take(key, ratelimit.Limit(1, 1.0), 0.0)
+    assert len(store) == 2
+    print("✓ MemoryStore refills, caps and evicts buckets")
+
+
+def test_rate_limits():
+    app = create_app({'RATE_LIMITS': ratelimit.parse_limits(LIMITS)})
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+    identities.clear()
+    print("✓ Database tables recreated")
+
+    guests = [from_ip(app, '10.0.0.1') for _ in range(3)]
+    for guest in guests[:2]:
+        assert guest.post('/api/goals', json={'text': 'Walk', 'goal_type': 'daily'}).status_code == 201
+    response = guests[2].post('/api/goals', json={'text': 'Walk', 'goal_type': 'daily'})
+    assert response.status_code == 429
+    assert 1 <= int(response.headers['Retry-After']) <= 30
+    assert guests[2].get('/api/goals').status_code == 200, "Reads create no guest"
+    with app.app_context():
+        assert User.query.filter_by(is_guest=True).count() == 2
+    print("✓ Guest creation is limited per IP, with 429 and Retry-After")
+
+    for _ in range(5):
+        assert guests[0].post('/api/goals', json={'text': 'Read', 'goal_type': 'daily'}).status_code == 201
+    assert from_ip(app, '10.0.0.2').post(
+        '/api/goals', json={'text': 'Walk', 'goal_type': 'daily'}).status_code == 201
+    print("✓ Existing guests and other IPs are not affected")
+
+    assert from_ip(app, '10.0.0.3').post(
+        '/register', json={'username': 'limited', 'password': 'secret123'}).status_code == 201
+    assert from_ip(app, '10.0.0.3').post(
+        '/register', json={'username': 'limited2', 'password': 'secret123'}).status_code == 429
+    assert from_ip(app, '10.0.0.4').post(
+        '/register', json={'username': 'limited2', 'password': 'secret123'}).status_code == 201
+    print("✓ Registrations are limited per IP")
+
+    hashes = []
+    listener = lambda operation, seconds: hashes.append(operation)
+    hashing.listeners.append(listener)
+    try:
+        statuses = [from_ip(app, f'10.0.1.{n}').post(
+            '/login', json={'username': 'limited', 'password': 'wrong'}).status_code for n in range(3)]
+        assert statuses == [401, 401, 429], statuses
+        assert len(hashes) == 2, "A limited login runs no bcrypt"
+        other = from_ip(app, '10.0.1.0').post('/login', json={'username': 'limited2', 'password': 'secret123'})
+        assert other.status_code == 200
+        print("✓ Logins are limited per username across IPs, before hashing")
+
+        attacker = from_ip(app, '10.0.2.1')
+        statuses = [attacker.post('/login', json={'username': f'user{n}', 'password': 'x'}).status_code
+                    for n in range(4)]
+        assert statuses == [401, 401, 401, 429], statuses
+        print("✓ Logins are limited per IP across usernames")
+    finally:
+        hashing.listeners.remove(listener)
+
+    proxied = create_app({'RATE_LIMITS': ratelimit.parse_limits('register=1/minute'), 'TRUSTED_PROXIES': 1})
+    for address, expected in (('203.0.113.1', 409), ('203.0.113.1', 429), ('203.0.113.2', 409)):
+        response = proxied.test_client().post('/register', json={'username': 'limited', 'password': 'secret123'},
+                                              headers={'X-Forwarded-For': address})
+        assert response.status_code == expected, (address, response.status_code)
+    print("✓ Behind TRUSTED_PROXIES, clients are told apart by X-Forwarded-For")
+
+    ratelimit.reset(app)
+    assert from_ip(app, '10.0.0.1').post('/api/goals', json={'text': 'Walk', 'goal_type': 'daily'}).status_code == 201
+    print("✓ reset() empties the buckets")
+
+    unlimited = create_app({'RATE_LIMITS': {}})
+    for n in range(5):
+        response = unlimited.test_client().post('/api/goals', json={'text': 'Walk', 'goal_type': 'daily'})
+        assert response.status_code == 201
+    print("✓ RATE_LIMITS=\"\" turns limiting off")
+
+
+def test_table_store():
+    config = {'RATE_LIMITS': ratelimit.parse_limits('guest=1/minute'), 'RATE_LIMIT_STORE': 'table'}
+    first, second = create_app(config), create_app(config)
+    with first.app_context():
+        db.drop_all()
+        migrations.upgrade()
+        check_store(first.extensions['rate_limit_store'], time.time())
+    identities.clear()
+    print("✓ TableStore refills, caps and denies like MemoryStore")
+
+    assert from_ip(first, '10.0.3.1').post(
+        '/api/goals', json={'text': 'Walk', 'goal_type': 'daily'}).status_code == 201
+    assert from_ip(second, '10.0.3.1').post(
+        '/api/goals', json={'text': 'Walk', 'goal_type': 'daily'}).status_code == 429
+    with first.app_context():
+        assert Goal.query.count() == 1
+    print("✓ Workers sharing the table share the limits")
+
+    with first.app_context():
+        store = first.extensions['rate_limit_store']
+        store.take('stale', ratelimit.Limit(5, 5.0), time.time() - 10)
+        assert store.purge_expired() >= 1
+        assert db.session.get(RateLimitBucket, 'guest:10.0.3.1') is not None
+    result = first.test_cli_runner().invoke(args=['purge-rate-limits'])
+    assert result.exit_code == 0 and 'bucket(s) deleted' in result.output
+    print("✓ Refilled buckets are purged")
+
+    print("\n🎉 Rate limit tests passed!")
+
+
+if __name__ == "__main__":
+    test_limits()
+    test_rate_limits()
+    test_table_store()
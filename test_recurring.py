@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test script for recurring goals and their lazily started periods
+"""
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from app import create_app, db, identities, User, Goal, RecurringGoal
+import migrations
+import recurring
+from test_sessions import statements_on
+
+
+def shift_back(app, template_id, periods=1, move_completed=True):
+    """Pretend the template and its goal's completion are periods days older, so the period has ended"""
+    with app.app_context():
+        template = db.session.get(RecurringGoal, template_id)
+        template.first_period -= timedelta(days=periods)
+        goal = db.session.get(Goal, template.goal_id)
+        if goal.completed and move_completed:
+            goal.completed -= timedelta(days=periods)
+        template.next_rollover = datetime.now(timezone.utc) - timedelta(seconds=1)
+        db.session.flush()
+        recurring.update_next_rollover(template.user_id)
+        db.session.commit()
+
+
+def test_periods():
+    day = date(2024, 2, 29)  # a Thursday
+    assert [recurring.period_start(day, period) for period in recurring.PERIODS] == [
+        day, date(2024, 2, 26), date(2024, 2, 1), date(2024, 1, 1)]
+    first = date(2023, 11, 1)
+    assert recurring.period_index(first, day, 'monthly') == 3
+    assert recurring.nth_period_start(first, 3, 'monthly') == date(2024, 2, 1)
+    assert recurring.nth_period_start(first, 14, 'monthly') == date(2025, 1, 1)
+    assert recurring.period_index(date(2024, 2, 19), day, 'weekly') == 1
+    assert recurring.period_index(day - timedelta(days=400), day, 'daily') == 400
+    print("✓ Periods are counted by local calendar day, week, month and year")
+
+    new_york = ZoneInfo('America/New_York')
+    assert recurring.period_end(date(2024, 3, 9), 0, 'daily', new_york) == datetime(
+        2024, 3, 10, 5, tzinfo=timezone.utc)
+    assert recurring.period_end(date(2024, 3, 10), 0, 'daily', new_york) == datetime(
+        2024, 3, 11, 4, tzinfo=timezone.utc)
+    print("✓ Periods end at local midnight, across DST changes")
+
+    history = b''
+    for index in (0, 3, 9, 3650):
+        history = recurring.set_bit(history, index)
+    assert recurring.bits(history) == [0, 3, 9, 3650]
+    assert len(history) == 457
+    print("✓ Ten years of daily history fit in 457 bytes")
+
+
+def test_recurring_goals():
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+        engine = db.engine
+    identities.clear()
+    print("✓ Database tables recreated")
+
+    client = app.test_client()
+    client.get('/api/goals')
+    client.post('/register', json={'username': 'recurring', 'password': 'secret123'})
+    assert client.post('/api/goals/recurring', json={'text': 'Stretch', 'period': 'hourly'}).status_code == 400
+    created = client.post('/api/goals/recurring', json={'text': 'Stretch', 'period': 'daily'})
+    assert created.status_code == 201
+    stretch = created.get_json()
+    goal_id = stretch['goal']['id']
+    assert stretch['goal']['goal_type'] == 'daily' and stretch['completed'] == []
+    assert [g['id'] for g in client.get('/api/goals').get_json()] == [goal_id]
+    print("✓ A recurring goal lists its instance among the user's goals")
+
+    with statements_on(engine) as statements:
+        client.get('/api/goals')
+    assert len(statements) == 2, f"Listing took {len(statements)} statements"
+    print("✓ Listing costs no extra query while no period has ended")
+
+    client.put(f'/api/goals/{goal_id}', json={'done': True})
+    today = date.fromisoformat(client.get('/api/goals/recurring').get_json()[0]['period_start'])
+    assert client.get('/api/goals/recurring').get_json()[0]['completed'] == [today.isoformat()]
+    shift_back(app, stretch['id'])
+    goals = client.get('/api/goals').get_json()
+    assert [(g['id'], g['done'], g['completed']) for g in goals] == [(goal_id, False, None)]
+    listing = client.get('/api/goals/recurring').get_json()
+    assert listing[0]['completed'] == [(today - timedelta(days=1)).isoformat()]
+    assert listing[0]['period_start'] == today.isoformat()
+    with app.app_context():
+        assert Goal.query.count() == 1
+    daily = client.get('/api/stats').get_json()['by_type']['daily']
+    assert daily['total'] == 1 and daily['done'] == 0
+    print("✓ The first read of a new period records the last one and resets the goal")
+
+    shift_back(app, stretch['id'], periods=3)
+    client.get('/api/goals')
+    completed = client.get('/api/goals/recurring').get_json()[0]['completed']
+    assert completed == [(today - timedelta(days=4)).isoformat()], "Missed periods are not done"
+    print("✓ Periods without a read are recorded as missed")
+
+    client.put(f'/api/goals/{goal_id}', json={'done': True})
+    shift_back(app, stretch['id'], move_completed=False)  # ticked off after the period ended
+    changes = client.get('/api/goals/changes?since=0').get_json()
+    assert changes['goals'][0]['done'], "Done before the first read of the new period counts for it"
+    completed = client.get('/api/goals/recurring').get_json()[0]['completed']
+    assert completed == [(today - timedelta(days=5)).isoformat(), today.isoformat()]
+    print("✓ A goal ticked off in the new period before any read stays done")
+
+    assert client.post('/api/goals/cleanup').get_json() == {'deleted': 0}
+    with app.app_context():
+        goal = db.session.get(Goal, goal_id)
+        goal.completed = datetime.now(timezone.utc) - timedelta(days=30)
+        db.session.commit()
+    client.post('/api/goals/cleanup')
+    assert client.get('/api/goals/recurring').get_json()[0]['goal']['id'] == goal_id
+    print("✓ Retention purges leave recurring goals alone")
+
+    assert client.delete(f'/api/goals/{goal_id}').status_code == 204
+    assert client.get('/api/goals/recurring').get_json() == []
+    with app.app_context():
+        assert RecurringGoal.query.count() == 0
+        user = User.query.filter_by(username='recurring').one()
+        assert user.next_rollover is None
+    print("✓ Deleting the goal ends the recurrence")
+
+    batched = client.post('/api/goals/recurring', json={'text': 'Floss', 'period': 'daily'}).get_json()
+    client.post('/api/goals/batch', json={'operations': [{'op': 'delete', 'id': batched['goal']['id']}]})
+    with app.app_context():
+        assert db.session.get(User, user.id).next_rollover is None
+        # As left behind by a template deleted along with its goal elsewhere
+        db.session.get(User, user.id).next_rollover = datetime.now(timezone.utc) - timedelta(seconds=1)
+        db.session.commit()
+    client.get('/api/goals')
+    with statements_on(engine) as statements:
+        client.get('/api/goals')
+    assert len(statements) == 2, f"Listing took {len(statements)} statements"
+    print("✓ Without templates left, the listing stops checking for rollovers")
+
+    guest = app.test_client()
+    weekly = guest.post('/api/goals/recurring', json={'text': 'Long run', 'period': 'weekly'}).get_json()
+    guest.post('/register', json={'username': 'converted', 'password': 'secret123'})
+    listing = guest.get('/api/goals/recurring').get_json()
+    assert [template['id'] for template in listing] == [weekly['id']]
+    print("✓ Registering keeps the guest's recurring goals")
+
+    print("\n🎉 Recurring goal tests passed!")
+
+
+if __name__ == "__main__":
+    test_periods()
+    test_recurring_goals()
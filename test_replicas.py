@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test script for read replica routing and database configuration
+"""
+import os
+import tempfile
+
+from app import create_app, db, identities, User, Goal
+import hashing
+import migrations
+import storage
+
+
+def seed(engine, display_name, goal_text):
+    """The same user on both databases, with data that tells them apart"""
+    with engine.begin() as conn:
+        conn.execute(db.insert(User).values(
+            id=1, username='reader', password_hash=hashing.hasher.hash('secret123'),
+            is_guest=False, display_name=display_name))
+        conn.execute(db.insert(Goal).values(text=goal_text, goal_type='daily', user_id=1))
+
+
+def goal_texts(client):
+    return [goal['text'] for goal in client.get('/api/goals').get_json()]
+
+
+def test_engine_options():
+    options = storage.engine_options('postgresql+psycopg2://db/goals', 4, pool_recycle=300)
+    assert options == {'pool_size': 4, 'max_overflow': 4, 'pool_timeout': 10,
+                       'pool_recycle': 300, 'pool_pre_ping': True}
+    assert storage.engine_options('sqlite://', 4) == {}
+    assert 'pool_pre_ping' not in storage.engine_options('sqlite:////tmp/goals.db', 4)
+    print("✓ Pool settings come from configuration")
+
+
+def test_replica_routing():
+    replica_path = os.path.join(tempfile.mkdtemp(prefix='goals-replica-'), 'replica.db')
+    app = create_app({
+        'DATABASE_REPLICA_URI': 'sqlite:///' + replica_path,
+        'REPLICA_LAG_SECONDS': 0,
+        'DB_POOL_SIZE': 2,
+        'BCRYPT_ROUNDS': 4,
+        'BCRYPT_WORKERS': 0,
+    })
+    with app.app_context():
+        primary, replica = db.engine, app.extensions['replica_engine']
+        assert primary.pool.size() == 2
+        db.drop_all()
+        migrations.upgrade(primary)
+        migrations.upgrade(replica)
+        seed(primary, 'On primary', 'Primary goal')
+        seed(replica, 'On replica', 'Replica goal')
+        identities.clear()
+    print("✓ Primary and replica databases seeded")
+
+    client = app.test_client()
+    assert client.post('/login', json={'username': 'reader', 'password': 'secret123'}).status_code == 200
+    assert goal_texts(client) == ['Replica goal']
+    identities.clear()  # login cached the user it read from the primary
+    assert client.get('/api/user/current').get_json()['display_name'] == 'On replica'
+    print("✓ Goal listing and user loader read from the replica")
+
+    created = client.post('/api/goals', json={'text': 'Written', 'goal_type': 'daily'})
+    assert created.status_code == 201
+    with app.app_context():
+        assert db.session.scalars(db.select(Goal.text).order_by(Goal.id)).all() == [
+            'Primary goal', 'Written']
+    assert goal_texts(client) == ['Replica goal']
+    print("✓ Writes go to the primary")
+
+    app.config['REPLICA_LAG_SECONDS'] = 60
+    client.post('/api/goals', json={'text': 'Pinned', 'goal_type': 'daily'})
+    assert goal_texts(client) == ['Primary goal', 'Written', 'Pinned']
+    print("✓ A client reads its own writes from the primary after writing")
+
+    os.remove(replica_path)
+
+
+if __name__ == "__main__":
+    test_engine_options()
+    test_replica_routing()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Test script for the goal retention engine
+"""
+from datetime import datetime, timedelta, timezone
+
+from app import app, db, identities, User, Goal
+import migrations
+from retention import RetentionPolicy, parse_retention_days, purge_expired_goals
+from test_query_plan import capture_queries, full_table_scans
+
+
+def add_goals(user, goal_type, count, completed_days_ago):
+    completed = None
+    if completed_days_ago is not None:
+        completed = datetime.now(timezone.utc) - timedelta(days=completed_days_ago)
+    db.session.add_all(
+        Goal(text=f'{goal_type} {i}', goal_type=goal_type, user_id=user.id,
+             done=completed is not None, completed=completed)
+        for i in range(count)
+    )
+
+
+def test_retention():
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+        identities.clear()
+        print("✓ Database tables recreated")
+
+        assert parse_retention_days('daily=7, weekly=28') == {'daily': 7, 'weekly': 28}
+        print("✓ Retention config parsed")
+
+        alice, bob = User.create_guest(), User.create_guest()
+        db.session.add_all([alice, bob])
+        db.session.flush()
+        for user in (alice, bob):
+            add_goals(user, 'daily', 7, completed_days_ago=10)   # expired
+            add_goals(user, 'daily', 2, completed_days_ago=1)    # recent
+            add_goals(user, 'daily', 2, completed_days_ago=None) # not done
+            add_goals(user, 'weekly', 4, completed_days_ago=40)  # expired
+            add_goals(user, 'weekly', 1, completed_days_ago=10)  # recent
+        db.session.commit()
+
+        policies = [RetentionPolicy('daily', timedelta(days=7)),
+                    RetentionPolicy('weekly', timedelta(days=28))]
+
+        # One user's purge leaves the other user's goals alone
+        deleted = purge_expired_goals(policies, user_id=alice.id, chunk_size=3)
+        assert deleted == {'daily': 7, 'weekly': 4}, deleted
+        assert Goal.query.filter_by(user_id=alice.id).count() == 5
+        assert Goal.query.filter_by(user_id=bob.id).count() == 16
+        print("✓ Per-user purge deletes only that user's expired goals")
+
+        # All-user purge, in chunks smaller than the backlog
+        with capture_queries() as statements:
+            deleted = purge_expired_goals(policies, chunk_size=2)
+        assert deleted == {'daily': 7, 'weekly': 4}, deleted
+        assert Goal.query.count() == 10
+        deletes = [s for s, _ in statements if s.startswith('DELETE')]
+        assert len(deletes) == 4 + 2, "Each chunk should be one DELETE statement"
+        print(f"✓ All-user purge ran as {len(deletes)} chunked DELETE statements")
+
+        if db.engine.dialect.name == 'sqlite':
+            assert not full_table_scans(statements), "Purge should be served by an index"
+            print("✓ All-user purge is served by an index")
+
+    # The route keeps its original contract
+    client = app.test_client()
+    goal = client.post('/api/goals', json={'text': 'Old', 'goal_type': 'daily'}).get_json()
+    with app.app_context():
+        Goal.query.filter_by(id=goal['id']).update(
+            {'done': True, 'completed': datetime.now(timezone.utc) - timedelta(days=8)})
+        db.session.commit()
+    assert client.post('/api/goals/cleanup').get_json() == {'deleted': 1}
+    print("✓ Cleanup route deletes the caller's expired goals")
+
+    print("\n🎉 Retention tests passed!")
+
+
+if __name__ == "__main__":
+    test_retention()
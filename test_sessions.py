@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test script for server-side sessions and their identity snapshots
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+
+from app import create_app, db, identities
+import migrations
+
+
+@contextmanager
+def statements_on(engine):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def session_id(client):
+    return client.get_cookie('session').value
+
+
+def check_store(backend):
+    app = create_app({'SESSION_STORE': backend, 'BCRYPT_ROUNDS': 4, 'BCRYPT_WORKERS': 0})
+    store = app.extensions['session_store']
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+        engine = db.engine
+    identities.clear()
+
+    laptop, phone = app.test_client(), app.test_client()
+    laptop.get('/api/goals')  # guest session
+    guest_sid = session_id(laptop)
+    assert laptop.post('/register', json={'username': 'sessions', 'password': 'secret123'}).status_code == 201
+    assert session_id(laptop) != guest_sid and len(session_id(laptop)) == 43
+    with app.app_context():
+        assert store.load(guest_sid) is None
+    print(f"✓ [{backend}] Cookie holds only a session id, replaced on login")
+
+    laptop.get('/api/user/current')  # snapshot taken into the session
+    identities.clear()
+    with statements_on(engine) as statements:
+        current = laptop.get('/api/user/current').get_json()
+    assert current['username'] == 'sessions' and not current['is_guest']
+    user_queries = [s for s in statements if 'user_session' not in s]
+    assert user_queries == [], f"current_user cost {len(user_queries)} user queries"
+    assert len(statements) == (0 if backend == 'memory' else 1)
+    print(f"✓ [{backend}] current_user hydrated from the session ({len(statements)} statements)")
+
+    phone.post('/login', json={'username': 'sessions', 'password': 'secret123'})
+    phone.get('/api/user/current')
+    laptop.put('/api/user/profile', json={'display_name': 'Renamed', 'timezone': 'Europe/Paris'})
+    current = phone.get('/api/user/current').get_json()
+    assert current['display_name'] == 'Renamed' and current['timezone'] == 'Europe/Paris'
+    print(f"✓ [{backend}] Profile change refreshes the snapshot in every session")
+
+    wrong = laptop.put('/api/user/password', json={'current_password': 'nope', 'new_password': 'better123'})
+    assert wrong.status_code == 403
+    assert laptop.put('/api/user/password', json={
+        'current_password': 'secret123', 'new_password': 'better123'}).status_code == 204
+    assert phone.get('/api/user/current').get_json() == {'is_anonymous': True}
+    assert laptop.get('/api/user/current').get_json()['username'] == 'sessions'
+    assert app.test_client().post('/login', json={
+        'username': 'sessions', 'password': 'better123'}).status_code == 200
+    print(f"✓ [{backend}] Password change logs out every other session")
+
+    with app.app_context():
+        expired = datetime.now(timezone.utc) - timedelta(seconds=1)
+        store.save('stale', None, {'guest_token': 'x'}, expired)
+        assert store.purge_expired() == 1
+        store.save('expired', None, {'guest_token': 'x'}, expired)
+        assert store.load('expired') is None
+    print(f"✓ [{backend}] Expired sessions are ignored and purged")
+
+    laptop.post('/logout')
+    assert laptop.get_cookie('session') is None
+    print(f"✓ [{backend}] Logout deletes the session")
+
+
+def test_memory_store():
+    check_store('memory')
+
+
+def test_table_store():
+    check_store('table')
+
+
+if __name__ == "__main__":
+    test_memory_store()
+    test_table_store()
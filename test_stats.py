@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for incrementally maintained goal statistics
+"""
+from datetime import date, datetime, timedelta, timezone
+
+from app import app, db, identities, Goal
+import migrations
+from retention import RetentionPolicy, purge_expired_goals
+import stats
+
+
+def test_goal_stats():
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+        identities.clear()
+    print("✓ Database tables recreated")
+
+    client = app.test_client()
+    walk = client.post('/api/goals', json={'text': 'Walk', 'goal_type': 'daily'}).get_json()
+    read = client.post('/api/goals', json={'text': 'Read', 'goal_type': 'daily'}).get_json()
+    plan = client.post('/api/goals', json={'text': 'Plan', 'goal_type': 'weekly'}).get_json()
+    client.put(f"/api/goals/{walk['id']}", json={'done': True})
+    client.post('/api/goals/batch', json={'operations': [
+        {'op': 'update', 'id': read['id'], 'done': True},
+        {'op': 'delete', 'id': plan['id']},
+        {'op': 'create', 'text': 'Review', 'goal_type': 'weekly'},
+    ]})
+
+    result = client.get('/api/stats').get_json()
+    assert result['by_type'] == {
+        'daily': {'total': 2, 'done': 2, 'completion_rate': 1.0},
+        'weekly': {'total': 1, 'done': 0, 'completion_rate': 0.0},
+    }
+    assert result['streaks'] == {'current': 1, 'longest': 1}
+    assert sum(result['completed_per_week']) == sum(result['completed_per_month']) == 2
+    print("✓ Creates, updates, deletes and batches keep the aggregates current")
+
+    client.put(f"/api/goals/{read['id']}", json={'done': False})
+    client.delete(f"/api/goals/{walk['id']}")
+    result = client.get('/api/stats').get_json()
+    assert result['by_type']['daily'] == {'total': 1, 'done': 0, 'completion_rate': 0.0}
+    assert result['streaks'] == {'current': 0, 'longest': 0}
+    print("✓ Undoing and deleting completed goals takes them back out")
+
+    # Backdated completions, then a rebuild from the goal table
+    with app.app_context():
+        user_id = db.session.get(Goal, read['id']).user_id
+        now = datetime.now(timezone.utc)
+        db.session.add_all(
+            Goal(text=f'Day {days}', goal_type='daily', user_id=user_id, done=True,
+                 completed=now - timedelta(days=days))
+            for days in (0, 1, 2, 5, 6, 7, 8)
+        )
+        db.session.commit()
+        stats.rebuild(user_ids=[user_id])
+        db.session.commit()
+    result = client.get('/api/stats').get_json()
+    assert result['by_type']['daily'] == {'total': 8, 'done': 7, 'completion_rate': 0.875}
+    assert result['streaks'] == {'current': 3, 'longest': 4}
+    print("✓ rebuild() backfills totals, days and streaks")
+
+    before = client.get('/api/stats').get_json()
+    with app.app_context():
+        deleted = purge_expired_goals([RetentionPolicy('daily', timedelta(days=4))], user_id=user_id)
+        assert deleted == {'daily': 4}
+    assert client.get('/api/stats').get_json() == before
+    with app.app_context():
+        stats.rebuild(user_ids=[user_id])
+        db.session.commit()
+    assert client.get('/api/stats').get_json() == before
+    print("✓ Purged goals stay in the statistics, also after a rebuild")
+
+    assert client.get('/api/stats?year=0').status_code == 400
+    assert sum(client.get('/api/stats?year=2001').get_json()['completed_per_month']) == 0
+    print("✓ Statistics are reported per year")
+
+    # Registration hands the guest's statistics over
+    client.post('/register', json={'username': 'stats_user', 'password': 'secret123'})
+    assert client.get('/api/stats').get_json()['by_type']['daily']['total'] == 8
+    print("✓ Registering keeps a guest's statistics")
+
+    assert stats.streaks({date(2024, 12, 31), date(2025, 1, 1)}, date(2025, 1, 2)) == (2, 2)
+    print("✓ Streaks run across years")
+
+    print("\n🎉 Goal statistics tests passed!")
+
+
+if __name__ == "__main__":
+    test_goal_stats()
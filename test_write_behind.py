@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test script for write-behind goal updates
+"""
+import time
+
+from app import create_app, db, identities, Goal
+import migrations
+from test_sessions import statements_on
+
+
+def stored(app, goal_id):
+    with app.app_context():
+        return db.session.get(Goal, goal_id).to_dict()
+
+
+def test_write_behind():
+    app = create_app({'WRITE_BEHIND': True, 'WRITE_BEHIND_INTERVAL': 3600,
+                      'WRITE_BEHIND_MAX_PENDING': 3})
+    queue = app.extensions['write_behind']
+    with app.app_context():
+        db.drop_all()
+        migrations.upgrade()
+        engine = db.engine
+    identities.clear()
+    print("✓ Database tables recreated")
+
+    client = app.test_client()
+    walk = client.post('/api/goals', json={'text': 'Walk', 'goal_type': 'daily'}).get_json()
+    read = client.post('/api/goals', json={'text': 'Read', 'goal_type': 'daily'}).get_json()
+    etag = client.get('/api/goals').headers['ETag']
+
+    with statements_on(engine) as statements:
+        for done in (True, False, True, False, True):
+            goal = client.put(f"/api/goals/{walk['id']}", json={'done': done}).get_json()
+        goal = client.put(f"/api/goals/{walk['id']}", json={'text': 'Walk 5k'}).get_json()
+    assert goal['done'] and goal['completed'] and goal['text'] == 'Walk 5k'
+    writes = [s for s in statements if not s.lstrip().upper().startswith('SELECT')]
+    assert writes == [], f"Toggles wrote {len(writes)} statements before the flush"
+    assert not stored(app, walk['id'])['done']
+    print("✓ Updates are acknowledged from memory without writing")
+
+    listing = client.get('/api/goals')
+    assert listing.headers['ETag'] != etag
+    assert [(g['text'], g['done']) for g in listing.get_json()] == [('Walk 5k', True), ('Read', False)]
+    page = client.get('/api/goals?limit=10&fields=done').get_json()['goals']
+    assert page[0] == {'id': walk['id'], 'done': True}
+    print("✓ The goal listing shows the user's own pending updates")
+
+    assert app.test_client().get('/api/goals').get_json() == []
+    with statements_on(engine) as statements:
+        assert queue.flush() == 1
+    updates = [s for s in statements if s.startswith('UPDATE goal ')]
+    assert len(updates) == 1, "Coalesced updates should be one UPDATE"
+    walked = stored(app, walk['id'])
+    assert walked['done'] and walked['text'] == 'Walk 5k'
+    assert goal['completed'].startswith(walked['completed'])
+    assert client.get('/api/stats').get_json()['by_type']['daily'] == {
+        'total': 2, 'done': 1, 'completion_rate': 0.5}
+    print("✓ A flush writes the last value of each goal, with statistics counted once")
+
+    client.put(f"/api/goals/{read['id']}", json={'done': True})
+    changes = client.get('/api/goals/changes?since=0').get_json()
+    assert [g['done'] for g in changes['goals']] == [True, True]
+    assert stored(app, read['id'])['done']
+    client.put(f"/api/goals/{read['id']}", json={'done': False})
+    assert client.delete(f"/api/goals/{read['id']}").status_code == 204
+    assert queue.pending(goal['user_id']) is None
+    print("✓ Other routes flush the user's pending updates first")
+
+    swim = client.post('/api/goals/recurring', json={'text': 'Swim', 'period': 'daily'}).get_json()
+    client.put(f"/api/goals/{swim['goal']['id']}", json={'done': True})
+    listed = client.get('/api/goals/recurring').get_json()
+    assert [template['goal']['done'] for template in listed] == [True]
+    assert queue.pending(goal['user_id']) is None
+    print("✓ Recurring goals show the user's pending toggles")
+
+    assert client.put('/api/goals/999999', json={'done': True}).status_code == 404
+    print("✓ Updates to unknown goals are rejected")
+
+    goal_ids = [client.post('/api/goals', json={'text': f'Goal {i}', 'goal_type': 'weekly'}).get_json()['id']
+                for i in range(3)]
+    for goal_id in goal_ids:
+        client.put(f'/api/goals/{goal_id}', json={'done': True})
+    deadline = time.monotonic() + 5
+    while not all(stored(app, goal_id)['done'] for goal_id in goal_ids) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert all(stored(app, goal_id)['done'] for goal_id in goal_ids)
+    print("✓ Reaching WRITE_BEHIND_MAX_PENDING flushes in the background")
+
+    client.put(f'/api/goals/{goal_ids[0]}', json={'done': False})
+    queue.stop()
+    assert not stored(app, goal_ids[0])['done']
+    print("✓ Stopping the queue flushes what is left")
+
+    print("\n🎉 Write-behind tests passed!")
+
+
+if __name__ == "__main__":
+    test_write_behind()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Test script for the year progress renderer
+"""
+from datetime import date
+
+import year_progress
+
+
+def test_year_progress():
+    p = year_progress.progress(date(2024, 12, 31))
+    assert (p.total_days, p.elapsed) == (366, 365)
+    assert year_progress.progress(date(2025, 2, 14), 'month')[2:6] == (
+        date(2025, 2, 1), date(2025, 2, 28), 28, 13)
+    assert year_progress.progress(date(2025, 6, 1), 'week').start == date(2025, 5, 26)
+    assert year_progress.summary_text(date(2025, 1, 1)) == "2025 is 0.0% complete. 365 days remaining.\n"
+    print("✓ Year, month and week progress computed")
+
+    png = year_progress.render(date(2025, 6, 1))
+    assert png.startswith(b'\x89PNG')
+    assert year_progress.render(date(2025, 6, 1)) == png, "Renders must be reproducible"
+    assert year_progress.render(date(2025, 6, 2)) != png
+    svg = year_progress.render(date(2025, 6, 1), period='month', fmt='svg')
+    assert svg.lstrip().startswith(b'<?xml') and b'June 2025' in svg
+    print("✓ PNG and SVG rendered from the cached figures")
+
+    days = [date(2025, 1, 1), date(2025, 3, 15)]
+    images = year_progress.render_many(days, periods=('year', 'week'), dpi=50)
+    assert sorted(images) == sorted((day, period) for day in days for period in ('year', 'week'))
+    assert all(image.startswith(b'\x89PNG') for image in images.values())
+    print("✓ Batch renders every date and period")
+
+    print("\n🎉 Year progress tests passed!")
+
+
+if __name__ == "__main__":
+    test_year_progress()
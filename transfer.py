@@ -0,0 +1,238 @@
+"""
+Bulk export and import of goals as NDJSON or CSV.
+
+Both directions stream. export_records() reads goals through a
+server-side cursor (yield_per), and the formatters turn them into lines
+one at a time, so an export never holds more than one chunk of rows.
+import_goals() consumes parsed records as they arrive, validates each
+one, and inserts the valid ones in bulk batches of batch_size rows with
+one transaction per batch. Memory stays bounded by the batch size
+whatever the size of the file.
+
+A record is {"text", "goal_type", "done", "created", "completed"}; "id"
+is exported for reference but imported goals get new ids. Exports of
+every user (admin mode, CLI only) add "username", and importing such a
+file adds each goal to the existing user with that username, so goals
+can move between instances whose accounts were migrated beforehand.
+"""
+import csv
+from datetime import datetime, timezone
+import io
+import json
+
+from models import db, User, Goal
+import revisions
+import stats
+
+FORMATS = ('ndjson', 'csv')
+MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+FIELDS = ('id', 'text', 'goal_type', 'done', 'created', 'completed')
+ADMIN_FIELDS = ('username',) + FIELDS
+DEFAULT_BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+MAX_TEXT_LENGTH = Goal.__table__.c.text.type.length
+MAX_TYPE_LENGTH = Goal.__table__.c.goal_type.type.length
+
+
+class RecordError(ValueError):
+    """A record that cannot be imported"""
+
+
+def export_records(user_id=None):
+    """Goal records of user_id, or of every user (with username) when None, in id order"""
+    columns = [getattr(Goal, name) for name in FIELDS]
+    if user_id is None:
+        query = db.select(User.username, *columns).join(User, User.id == Goal.user_id)
+    else:
+        query = db.select(*columns).filter_by(user_id=user_id)
+    rows = db.session.execute(query.order_by(Goal.id).execution_options(yield_per=EXPORT_CHUNK_SIZE))
+    for row in rows:
+        yield {name: value.isoformat() if isinstance(value, datetime) else value
+               for name, value in row._mapping.items()}
+
+
+def to_ndjson(records):
+    for record in records:
+        yield json.dumps(record) + '\n'
+
+
+def to_csv(records, fields):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    for record in records:
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_lines(fmt, user_id=None):
+    """Lines of an export of user_id's goals, or of every user's when None"""
+    records = export_records(user_id)
+    if fmt == 'ndjson':
+        return to_ndjson(records)
+    return to_csv(records, FIELDS if user_id is not None else ADMIN_FIELDS)
+
+
+def parse_ndjson(lines):
+    """(line number, record or RecordError) for each non-blank line"""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, RecordError('Invalid JSON')
+            continue
+        yield number, record if isinstance(record, dict) else RecordError('Not a JSON object')
+
+
+def parse_csv(lines):
+    """(line number, record) for each CSV row; the first line holds the column names"""
+    reader = csv.DictReader(lines)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def parse(lines, fmt):
+    return parse_ndjson(lines) if fmt == 'ndjson' else parse_csv(lines)
+
+
+def _boolean(value):
+    if isinstance(value, bool):
+        return value
+    if value in (None, ''):
+        return False
+    if isinstance(value, str) and value.strip().lower() in ('true', '1', 'yes'):
+        return True
+    if isinstance(value, str) and value.strip().lower() in ('false', '0', 'no'):
+        return False
+    raise RecordError(f'Invalid done value {value!r}')
+
+
+def _timestamp(value, name):
+    if value in (None, ''):
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise RecordError(f'Invalid {name} timestamp {value!r}') from None
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def validate(record):
+    """Column values for a Goal from an imported record; raises RecordError"""
+    text, goal_type = record.get('text'), record.get('goal_type')
+    if not isinstance(text, str) or not text.strip():
+        raise RecordError('Missing text')
+    if len(text) > MAX_TEXT_LENGTH:
+        raise RecordError(f'Text longer than {MAX_TEXT_LENGTH} characters')
+    if not isinstance(goal_type, str) or not goal_type or len(goal_type) > MAX_TYPE_LENGTH:
+        raise RecordError('Missing or invalid goal_type')
+    done = _boolean(record.get('done'))
+    completed = _timestamp(record.get('completed'), 'completed')
+    return {
+        'text': text,
+        'goal_type': goal_type,
+        'done': done,
+        'created': _timestamp(record.get('created'), 'created') or datetime.now(timezone.utc),
+        'completed': completed if done else None,
+    }
+
+
+class ImportResult:
+    """Counts of an import, and the first MAX_REPORTED_ERRORS rejected lines"""
+
+    def __init__(self, dry_run):
+        self.dry_run = dry_run
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+        self.user_ids = set()
+
+    def reject(self, line, error):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': str(error)})
+
+    def to_dict(self):
+        return {'imported': self.imported, 'rejected': self.rejected,
+                'dry_run': self.dry_run, 'errors': self.errors}
+
+
+def import_goals(records, user_id=None, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """
+    Import parsed (line, record) pairs for user_id, or by username when None.
+
+    Invalid records are rejected and reported; the others are inserted
+    batch_size at a time, committing after each batch. With dry_run
+    nothing is written, but every record is validated.
+    """
+    result = ImportResult(dry_run)
+    users = {}  # username -> user id (None if unknown), admin mode only
+    zones = {}  # user id -> timezone, for completion days in the statistics
+    if user_id is not None:
+        zones[user_id] = _zone(db.select(User.timezone).filter_by(id=user_id))
+    batch = []
+    for line, record in records:
+        try:
+            if isinstance(record, RecordError):
+                raise record
+            values = validate(record)
+            values['user_id'] = user_id if user_id is not None else _lookup_user(
+                users, zones, record.get('username'))
+        except RecordError as error:
+            result.reject(line, error)
+            continue
+        batch.append(values)
+        if len(batch) >= batch_size:
+            _insert_batch(batch, zones, result)
+            batch = []
+    if batch:
+        _insert_batch(batch, zones, result)
+    return result
+
+
+def _zone(query):
+    return stats.user_zone(db.session.execute(query).scalar_one_or_none())
+
+
+def _lookup_user(users, zones, username):
+    if not isinstance(username, str) or not username:
+        raise RecordError('Missing username')
+    if username not in users:
+        row = db.session.execute(
+            db.select(User.id, User.timezone).filter_by(username=username)).one_or_none()
+        users[username] = row.id if row else None
+        if row:
+            zones[row.id] = stats.user_zone(row.timezone)
+    if users[username] is None:
+        raise RecordError(f'Unknown user {username!r}')
+    return users[username]
+
+
+def _insert_batch(batch, zones, result):
+    """One transaction: bump each owner's revision, insert the goals, update statistics"""
+    if result.dry_run:
+        result.imported += len(batch)
+        return
+    owners = {}
+    for values in batch:
+        owners.setdefault(values['user_id'], []).append(values)
+    for owner, goals in owners.items():
+        revision = revisions.bump(owner)
+        delta = stats.StatsDelta(owner, zones[owner])
+        for values in goals:
+            values['revision'] = revision
+            delta.created(values['goal_type'])
+            if values['done']:
+                delta.changed(values['goal_type'], False, None, True, values['completed'])
+        delta.apply()
+    db.session.execute(db.insert(Goal), batch)
+    db.session.commit()
+    result.imported += len(batch)
+    result.user_ids.update(owners)
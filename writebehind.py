@@ -0,0 +1,190 @@
+"""
+Write-behind queue for goal updates.
+
+Toggling done is the most frequent request, and each one used to commit
+(and fsync) on its own. With WRITE_BEHIND=1, update_goal only records the
+change in memory and answers from there. Changes to the same goal are
+coalesced, the last write winning, and a background thread writes all
+pending changes in one transaction every WRITE_BEHIND_INTERVAL seconds,
+or sooner once WRITE_BEHIND_MAX_PENDING goals are waiting. stop() (also
+run at interpreter exit) flushes whatever is left.
+
+A user always reads their own writes: the goal listing overlays the
+user's pending changes, and every other route that reads or writes goals
+flushes that user's changes first (see settle()).
+
+Pending changes live in one process; a crash loses at most one interval
+of toggles.
+"""
+import atexit
+from datetime import datetime
+import itertools
+import threading
+
+from models import db, Goal
+import revisions
+import stats
+
+UPDATABLE = ('text', 'done', 'completed')
+
+
+class PendingUser:
+    """One user's queued goal changes"""
+
+    def __init__(self, zone):
+        self.zone = zone
+        self.goals = {}    # goal_id -> goal dict as returned to the client
+        self.changes = {}  # goal_id -> {column: value} not yet written
+        self.sequence = 0  # bumped on every change, for ETags
+
+
+class WriteBehindQueue:
+    """Coalesced goal changes per user, written by a background thread"""
+
+    def __init__(self, app, interval=0.5, max_pending=500):
+        self.app = app
+        self.interval = interval
+        self.max_pending = max_pending
+        self._users = {}
+        self._size = 0
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+        # Held from taking a batch until it is committed, so a flush for
+        # one user never returns while another flush still holds their writes
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name='write-behind', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        """Stop the flusher thread and write everything still pending"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.flush()
+
+    def update(self, user_id, goal_id, changes, zone, load):
+        """
+        Queue changes to a goal and return the goal as it will be stored.
+
+        load() returns the goal's dict when it is not pending yet, or None
+        if the user has no such goal; the result is None then as well.
+        """
+        with self._lock:
+            pending = self._users.get(user_id)
+            goal = pending.goals.get(goal_id) if pending else None
+        if goal is None:
+            goal = load()
+            if goal is None:
+                return None
+        with self._lock:
+            pending = self._users.setdefault(user_id, PendingUser(zone))
+            goal = pending.goals.setdefault(goal_id, goal)
+            if goal_id not in pending.changes:
+                pending.changes[goal_id] = {}
+                self._size += 1
+            pending.changes[goal_id].update(changes)
+            goal.update({name: value.isoformat() if isinstance(value, datetime) else value
+                         for name, value in changes.items()})
+            pending.sequence = next(self._sequence)
+            full = self._size >= self.max_pending
+            goal = dict(goal)
+        if full:
+            self._wake.set()
+        return goal
+
+    def pending(self, user_id):
+        """(sequence, {goal_id: goal dict}) of user_id's queued goals, or None"""
+        with self._lock:
+            pending = self._users.get(user_id)
+            if pending is None:
+                return None
+            return pending.sequence, {goal_id: dict(goal) for goal_id, goal in pending.goals.items()}
+
+    def settle(self, user_id):
+        """Write user_id's pending changes now"""
+        if user_id is not None:
+            self.flush([user_id])
+
+    def flush(self, user_ids=None):
+        """Write pending changes (of user_ids, default everyone) in one transaction"""
+        with self._flush_lock:
+            with self._lock:
+                keys = list(self._users) if user_ids is None else [
+                    user_id for user_id in user_ids if user_id in self._users]
+                batch = {user_id: self._users.pop(user_id) for user_id in keys}
+                self._size -= sum(len(pending.changes) for pending in batch.values())
+            if not batch:
+                return 0
+            with self.app.app_context():
+                try:
+                    for user_id, pending in batch.items():
+                        write_user(user_id, pending)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    self._restore(batch)
+                    raise
+            return sum(len(pending.changes) for pending in batch.values())
+
+    def _restore(self, batch):
+        # Put a failed batch back under any changes queued since
+        with self._lock:
+            for user_id, failed in batch.items():
+                pending = self._users.get(user_id)
+                if pending is None:
+                    self._users[user_id] = failed
+                    self._size += len(failed.changes)
+                    continue
+                for goal_id, changes in failed.changes.items():
+                    if goal_id not in pending.changes:
+                        self._size += 1
+                    pending.changes[goal_id] = {**changes, **pending.changes.get(goal_id, {})}
+                    pending.goals.setdefault(goal_id, failed.goals[goal_id])
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception("Write-behind flush failed; retrying next interval")
+
+
+def write_user(user_id, pending):
+    """Apply one user's coalesced changes with one revision and one UPDATE"""
+    rows = db.session.execute(
+        db.select(Goal.id, Goal.goal_type, Goal.text, Goal.done, Goal.completed)
+        .filter_by(user_id=user_id).where(Goal.id.in_(list(pending.changes)))
+    ).all()
+    if not rows:
+        return  # deleted (or moved to another user) in the meantime
+    revision = revisions.bump(user_id)
+    delta = stats.StatsDelta(user_id, pending.zone)
+    updates = []
+    for row in rows:
+        changes = pending.changes[row.id]
+        if 'done' in changes:
+            delta.changed(row.goal_type, row.done, row.completed,
+                          changes['done'], changes['completed'])
+        values = {name: changes.get(name, getattr(row, name)) for name in UPDATABLE}
+        updates.append({'goal_id': row.id, 'new_revision': revision,
+                        **{'new_' + name: value for name, value in values.items()}})
+    delta.apply()
+    db.session.execute(
+        db.update(Goal.__table__).where(Goal.__table__.c.id == db.bindparam('goal_id'))
+        .values(revision=db.bindparam('new_revision'),
+                **{name: db.bindparam('new_' + name) for name in UPDATABLE}),
+        updates,
+    )
@@ -1,82 +1,216 @@
-from datetime import datetime, date, timedelta
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import numpy as np
+"""
+Year, month and week progress bars.
+
+Renders the gradient progress bar published as docs/progress.png. The
+figure is built once per period and size and kept: each render only moves
+the bar, the today marker and the labels, then saves. The gradient is a
+slice of one precomputed image covering the elapsed part of the period,
+rather than a hundred Rectangle patches.
+
+    import year_progress
+    png = year_progress.render(date(2025, 6, 1))
+    svg = year_progress.render(period='month', fmt='svg')
+    images = year_progress.render_many(dates, periods=('year', 'week'))
+
+Run as a script to write docs/progress.png, docs/progress.svg and
+docs/progress.txt for today, as the update workflow does.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+import argparse
+import io
 import os
+import threading
 
-# Ensure docs folder exists (for GitHub Pages publishing)
-os.makedirs("docs", exist_ok=True)
-
-# Get current date
-current_date = datetime.now()
-
-# Define year start and end
-current_year = current_date.year
-year_start = date(current_year, 1, 1)
-year_end = date(current_year, 12, 31)
-
-# Calculate total days in the year and days elapsed
-total_days = (year_end - year_start).days + 1
-days_elapsed = (current_date.date() - year_start).days
-
-# Calculate percentage complete
-percentage_complete = (days_elapsed / total_days) * 100
-
-plt.style.use('default')
-fig, ax = plt.subplots(figsize=(10, 2))
-fig.patch.set_alpha(0.0)  # Transparent figure background
-ax.set_facecolor('none')  # Transparent axes background
-
-# Prettier gradient progress bar
-from matplotlib.patches import Rectangle
+import numpy as np
 from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.figure import Figure
+from matplotlib.patches import Rectangle
+
+PERIODS = ('year', 'month', 'week')
+FORMATS = ('png', 'svg')
+DEFAULT_SIZE = (10, 2)
+DEFAULT_DPI = 100
 
-# Gradient colors (improved: blue → teal → yellow → pink)
-cmap = LinearSegmentedColormap.from_list(
+# Gradient colors: blue → teal → yellow → pink
+CMAP = LinearSegmentedColormap.from_list(
     "progress", ["#4f8cff", "#00e6c3", "#ffe066", "#ff6ec7"]
 )
-bar_width = days_elapsed / total_days
-
-# Draw gradient bar
-for i in np.linspace(0, bar_width, 100):
-    ax.add_patch(Rectangle((i * total_days, -0.25), total_days / 100, 0.5,
-                           color=cmap(i), linewidth=0))
-
-# Draw remaining bar (faded, softer gray)
-ax.add_patch(Rectangle((days_elapsed, -0.25), total_days - days_elapsed, 0.5,
-                       color='#e3e6ee', alpha=0.22, linewidth=0))
-
-# Red line for today (make it a bit more vivid)
-ax.axvline(x=days_elapsed, color='#ff3b47', linestyle='--', alpha=0.85)
-
-# Format axis
-ax.xaxis.set_major_locator(mdates.MonthLocator())
-ax.xaxis.set_major_formatter(mdates.DateFormatter('%b'))
-ax.set_xlim(0, total_days)
-ax.set_ylim(-0.5, 0.5)
-ax.set_yticks([])
-ax.set_title(
-    f"{current_year}: {percentage_complete:.2f}% | {days_elapsed}d elapsed | {total_days-days_elapsed}d left",
-    color='#2a3a5e', fontweight='bold'
-)
-
-# Add annotations (improved colors)
-ax.text(days_elapsed + 5, 0, f"Today: {current_date.strftime('%b %d')}",
-        va='center', ha='left', color='#ff3b47', fontweight='bold')
-ax.text(5, 0, "Start: Jan 01", va='center', ha='left', fontsize=8, color='#4f8cff')
-ax.text(total_days - 5, 0, "End: Dec 31", va='center', ha='right', fontsize=8, color='#ff6ec7')
-
-# Remove legend for cleaner look
-
-# Remove spines
-for spine in ax.spines.values():
-    spine.set_visible(False)
-
-plt.tight_layout()
-
-# Save into docs folder for GitHub Pages
-fig.savefig("docs/progress.png", dpi=300, transparent=True)
-
-# Save text version as well
-with open("docs/progress.txt", "w") as f:
-    f.write(f"{current_year} is {percentage_complete:.1f}% complete. {total_days - days_elapsed} days remaining.\n")
+GRADIENT = np.linspace(0, 1, 512).reshape(1, -1)
+
+# No timestamps or version strings, so unchanged bars give identical files
+SAVE_METADATA = {'png': {'Software': None}, 'svg': {'Date': None, 'Creator': None}}
+
+Progress = namedtuple('Progress', 'period day start end total_days elapsed fraction')
+
+
+def progress(day=None, period='year'):
+    """How far `day` is through its year, month or (Monday-based) week"""
+    day = day or date.today()
+    if period == 'year':
+        start, end = date(day.year, 1, 1), date(day.year, 12, 31)
+    elif period == 'month':
+        start = day.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    elif period == 'week':
+        start = day - timedelta(days=day.weekday())
+        end = start + timedelta(days=6)
+    else:
+        raise ValueError(f"Unknown period {period!r}; expected one of {PERIODS}")
+    total_days = (end - start).days + 1
+    elapsed = (day - start).days
+    return Progress(period, day, start, end, total_days, elapsed, elapsed / total_days)
+
+
+def title(p):
+    name = {
+        'year': f"{p.start.year}",
+        'month': p.start.strftime('%B %Y'),
+        'week': f"Week {p.day.isocalendar()[1]}, {p.day.isocalendar()[0]}",
+    }[p.period]
+    return (f"{name}: {p.fraction * 100:.2f}% | {p.elapsed}d elapsed | "
+            f"{p.total_days - p.elapsed}d left")
+
+
+def summary_text(day=None):
+    """The one-line summary written to docs/progress.txt"""
+    p = progress(day)
+    return f"{p.start.year} is {p.fraction * 100:.1f}% complete. {p.total_days - p.elapsed} days remaining.\n"
+
+
+def _ticks(p):
+    """Tick positions (days from the period start) and labels"""
+    if p.period == 'year':
+        months = [date(p.start.year, month, 1) for month in range(1, 13)]
+        return [(m - p.start).days for m in months], [m.strftime('%b') for m in months]
+    if p.period == 'month':
+        offsets = range(0, p.total_days, 7)
+        return list(offsets), [(p.start + timedelta(days=i)).strftime('%d') for i in offsets]
+    offsets = range(7)
+    return list(offsets), [(p.start + timedelta(days=i)).strftime('%a') for i in offsets]
+
+
+class _Canvas:
+    """A progress figure whose static parts are drawn once and reused"""
+
+    def __init__(self, size):
+        self.lock = threading.Lock()
+        self.figure = Figure(figsize=size)
+        self.figure.patch.set_alpha(0.0)
+        ax = self.axes = self.figure.add_subplot()
+        ax.set_facecolor('none')
+        ax.set_ylim(-0.5, 0.5)
+        ax.set_yticks([])
+        for spine in ax.spines.values():
+            spine.set_visible(False)
+
+        # One gradient image; each render shows the slice for the elapsed part
+        self.gradient = ax.imshow(GRADIENT, cmap=CMAP, vmin=0, vmax=1, aspect='auto',
+                                  interpolation='bilinear', extent=(0, 1, -0.25, 0.25))
+        self.remaining = ax.add_patch(Rectangle((0, -0.25), 1, 0.5, color='#e3e6ee',
+                                                alpha=0.22, linewidth=0))
+        self.today_line = ax.axvline(x=0, color='#ff3b47', linestyle='--', alpha=0.85)
+        self.title = ax.set_title('', color='#2a3a5e', fontweight='bold')
+        self.today_label = ax.text(0, 0, '', va='center', ha='left', color='#ff3b47',
+                                   fontweight='bold')
+        self.start_label = ax.text(0, 0, '', va='center', ha='left', fontsize=8, color='#4f8cff')
+        self.end_label = ax.text(0, 0, '', va='center', ha='right', fontsize=8, color='#ff6ec7')
+        self._layout_done = False
+        self._period_shape = None
+
+    def update(self, p):
+        ax = self.axes
+        if self._period_shape != (p.period, p.start):
+            positions, labels = _ticks(p)
+            ax.set_xticks(positions, labels)
+            ax.set_xlim(0, p.total_days)
+            self._period_shape = (p.period, p.start)
+
+        columns = round(p.fraction * GRADIENT.shape[1])
+        self.gradient.set_visible(columns > 0)
+        if columns:
+            self.gradient.set_data(GRADIENT[:, :columns])
+            self.gradient.set_extent((0, p.elapsed, -0.25, 0.25))
+        self.remaining.set_x(p.elapsed)
+        self.remaining.set_width(p.total_days - p.elapsed)
+        self.today_line.set_xdata([p.elapsed, p.elapsed])
+        self.title.set_text(title(p))
+
+        # Offsets scaled from the year bar's 5 days, so labels sit alike in every period
+        margin = p.total_days / 73
+        self.today_label.set_position((p.elapsed + margin, 0))
+        self.today_label.set_text(f"Today: {p.day.strftime('%b %d')}")
+        self.start_label.set_position((margin, 0))
+        self.start_label.set_text(f"Start: {p.start.strftime('%b %d')}")
+        self.end_label.set_position((p.total_days - margin, 0))
+        self.end_label.set_text(f"End: {p.end.strftime('%b %d')}")
+
+        if not self._layout_done:
+            self.figure.tight_layout()
+            self._layout_done = True
+
+    def save(self, fmt, dpi):
+        buffer = io.BytesIO()
+        self.figure.savefig(buffer, format=fmt, dpi=dpi, transparent=True,
+                            metadata=SAVE_METADATA[fmt])
+        return buffer.getvalue()
+
+
+_canvases = {}
+_canvases_lock = threading.Lock()
+
+
+def _canvas(period, size):
+    key = (period, tuple(size))
+    with _canvases_lock:
+        canvas = _canvases.get(key)
+        if canvas is None:
+            canvas = _canvases[key] = _Canvas(size)
+        return canvas
+
+
+def render(day=None, period='year', fmt='png', dpi=DEFAULT_DPI, size=DEFAULT_SIZE):
+    """PNG or SVG bytes of the progress bar for `day` (default: today)"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {FORMATS}")
+    p = progress(day, period)
+    canvas = _canvas(period, size)
+    with canvas.lock:
+        canvas.update(p)
+        return canvas.save(fmt, dpi)
+
+
+def render_many(days, periods=PERIODS, fmt='png', dpi=DEFAULT_DPI, size=DEFAULT_SIZE):
+    """{(day, period): bytes} for every combination, reusing one figure per period"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {FORMATS}")
+    images = {}
+    for period in periods:
+        canvas = _canvas(period, size)
+        with canvas.lock:
+            for day in days:
+                canvas.update(progress(day, period))
+                images[(day, period)] = canvas.save(fmt, dpi)
+    return images
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write the year progress images to docs/')
+    parser.add_argument('--date', type=date.fromisoformat, default=None,
+                        help='Day to render (default: today)')
+    parser.add_argument('--output-dir', default='docs')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=list(FORMATS))
+    parser.add_argument('--dpi', type=int, default=300, help='PNG resolution')
+    args = parser.parse_args(argv)
+
+    # docs/ is published by GitHub Pages
+    os.makedirs(args.output_dir, exist_ok=True)
+    for fmt in args.formats:
+        with open(os.path.join(args.output_dir, f'progress.{fmt}'), 'wb') as f:
+            f.write(render(args.date, fmt=fmt, dpi=args.dpi))
+    with open(os.path.join(args.output_dir, 'progress.txt'), 'w') as f:
+        f.write(summary_text(args.date))
+
+
+if __name__ == '__main__':
+    main()